@@ -4,8 +4,9 @@ from re import I
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
-from .models import NDAAgreement, Project, UserProfile, PasswordReset, KYCVerificationLog, FarmerKYC,InvestorKYC, Opportunity
+from .models import AdminNotification, DirectUpload, EmailDeadLetter, NDAAgreement, OutboundEmail, Project, UserProfile, PasswordReset, KYCVerificationLog, FarmerKYC,InvestorKYC, Opportunity
 from django.utils.html import format_html
+from .signed_urls import get_signed_url
 
 
 class UserProfileInline(admin.StackedInline):
@@ -69,6 +70,32 @@ admin.site.register(User, UserAdmin)
 admin.site.register(KYCVerificationLog)
 admin.site.register(InvestorKYC)
 admin.site.register(FarmerKYC)
+admin.site.register(DirectUpload)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'to')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'updated_at', 'sent_at')
+    # Bodies can carry OTP codes and password reset links
+    exclude = ('body',)
+
+
+@admin.register(AdminNotification)
+class AdminNotificationAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'kind', 'created_at', 'digested_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('subject', 'message')
+    readonly_fields = ('created_at', 'digested_at')
+
+
+@admin.register(EmailDeadLetter)
+class EmailDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'attempts', 'queued_at', 'failed_at')
+    search_fields = ('subject', 'to', 'last_error')
+    readonly_fields = ('queued_at', 'failed_at')
 
 
 @admin.register(Opportunity)
@@ -104,10 +131,10 @@ class OpportunityAdmin(admin.ModelAdmin):
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ('title', 'farmer', 'status', 'target_amount', 'deadline', 'created_at')
-    list_filter = ('status', 'created_at', 'deadline')
+    list_display = ('title', 'farmer', 'status', 'watermark_status', 'target_amount', 'deadline', 'created_at')
+    list_filter = ('status', 'watermark_status', 'created_at', 'deadline')
     search_fields = ('title', 'farmer__username', 'email', 'brief', 'description')
-    readonly_fields = ('watermarked_proposal', 'created_at', 'updated_at')
+    readonly_fields = ('watermarked_proposal', 'watermark_status', 'watermark_attempts', 'watermark_error', 'created_at', 'updated_at')
     
     # def status_display(self, obj):
     #     return obj.get_status_display()
@@ -115,7 +142,8 @@ class ProjectAdmin(admin.ModelAdmin):
 
     def watermarked_link(self, obj):
         if obj.watermarked_proposal:
-            return format_html("<a href='{}'>Download</a>", obj.watermarked_proposal.url)
+            url, _ = get_signed_url(obj.watermarked_proposal.storage, obj.watermarked_proposal.name)
+            return format_html("<a href='{}'>Download</a>", url)
         return "No file"
     
     watermarked_link.short_description = "Watermarked Proposal" 
@@ -128,7 +156,8 @@ class ProjectAdmin(admin.ModelAdmin):
             'fields': ('target_amount', 'deadline')
         }),
         ('Media & Files', {
-            'fields': ('image_url', 'original_proposal', 'watermarked_proposal')
+            'fields': ('image_url', 'original_proposal', 'watermarked_proposal',
+                       'watermark_status', 'watermark_attempts', 'watermark_error')
         }),
         ('Status & Timestamps', {
             'fields': ('status', 'created_at', 'updated_at')
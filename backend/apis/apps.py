@@ -1,6 +1,27 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_migrate
 
 
 class ApisConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apis'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from . import authz, opportunities, search
+        from .models import FarmerKYC, InvestorKYC, Opportunity, UserProfile
+
+        pre_migrate.connect(search.create_search_extensions, sender=self)
+        for model in search.SEARCH_FIELDS:
+            post_save.connect(
+                search.refresh_search_vector,
+                sender=model,
+                dispatch_uid=f'search_vector_{model.__name__}'
+            )
+
+        post_save.connect(opportunities.opportunity_changed, sender=Opportunity, dispatch_uid='opportunity_changed_save')
+        post_delete.connect(opportunities.opportunity_changed, sender=Opportunity, dispatch_uid='opportunity_changed_delete')
+
+        for model in [get_user_model(), UserProfile, InvestorKYC, FarmerKYC]:
+            post_save.connect(authz.auth_state_changed, sender=model, dispatch_uid=f'auth_state_save_{model.__name__}')
+            post_delete.connect(authz.auth_state_changed, sender=model, dispatch_uid=f'auth_state_delete_{model.__name__}')
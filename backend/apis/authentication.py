@@ -0,0 +1,93 @@
+import logging
+
+from django.contrib.auth import get_user_model
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authz import (
+    CONTEXT_FIELDS, AuthContext, get_claims_version, load_auth_context,
+    peek_claims_version, set_auth_context,
+)
+
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+AUTHZ_CLAIM = 'authz'
+
+
+def stamp_claims(token, user_id, username):
+    """Embed the user's role/KYC context and the current claims version in ``token``"""
+    context = load_auth_context(user_id)
+    token['username'] = username
+    token[AUTHZ_CLAIM] = {
+        'v': get_claims_version(user_id),
+        **{field: getattr(context, field) for field in CONTEXT_FIELDS},
+    }
+    return token
+
+
+def issue_tokens(user):
+    """RefreshToken.for_user plus authorization claims (copied to its access token)"""
+    return stamp_claims(RefreshToken.for_user(user), user.pk, user.get_username())
+
+
+def context_from_claims(token):
+    """
+    Rebuild an AuthContext from a token's claims, or return None if the
+    token has none or they are older than the user's current version.
+    """
+    claims = token.get(AUTHZ_CLAIM)
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    if not claims or user_id is None:
+        return None
+
+    # An unknown version (evicted, or the cache is down) never matches
+    version = peek_claims_version(user_id)
+    if version is None or version != claims.get('v'):
+        return None
+
+    return AuthContext(user_id=user_id, **{field: claims.get(field) for field in CONTEXT_FIELDS})
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the token's authorization claims for
+    read-only requests, so neither the user row nor the profile/KYC rows
+    are loaded. ``request.user`` is then an unsaved User carrying only
+    id, username and the staff flags; views that need more of the user
+    must not use this class. Writes, tokens without claims and tokens
+    whose claims version is stale go through the normal database lookup.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        if request.method in SAFE_METHODS:
+            context = context_from_claims(validated_token)
+            if context is not None:
+                set_auth_context(request, context)
+                return self.get_claims_user(validated_token, context), validated_token
+
+        return self.get_user(validated_token), validated_token
+
+    def get_claims_user(self, validated_token, context):
+        user = User(
+            pk=context.user_id,
+            username=validated_token.get('username', ''),
+            is_staff=bool(context.is_staff),
+            is_superuser=bool(context.is_superuser),
+            is_active=True,
+        )
+        user._state.adding = False
+        return user
@@ -0,0 +1,190 @@
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+# Roles that act as project owners
+FARMER_ROLES = ['Farmer', 'Student', 'Entrepreneur']
+
+CONTEXT_FIELDS = [
+    'is_staff', 'is_superuser', 'profile_id', 'role',
+    'farmer_kyc_id', 'farmer_kyc_verified', 'investor_kyc_id', 'investor_kyc_verified',
+]
+
+
+class AuthContext:
+    """
+    Everything the permission classes and serializers need to know about
+    the requesting user's role and KYC state, loaded once per request.
+    """
+
+    def __init__(self, user_id=None, **values):
+        self.user_id = user_id
+        for field in CONTEXT_FIELDS:
+            setattr(self, field, values.get(field))
+
+    @property
+    def is_authenticated(self):
+        return self.user_id is not None
+
+    @property
+    def is_admin(self):
+        return bool(self.is_staff or self.is_superuser)
+
+    @property
+    def has_profile(self):
+        return self.profile_id is not None
+
+    @property
+    def has_farmer_kyc(self):
+        return self.farmer_kyc_id is not None
+
+    @property
+    def has_investor_kyc(self):
+        return self.investor_kyc_id is not None
+
+    @property
+    def is_farmer(self):
+        return self.role == 'Farmer'
+
+    def as_dict(self):
+        return {'user_id': self.user_id, **{field: getattr(self, field) for field in CONTEXT_FIELDS}}
+
+
+def _cache_key(user_id):
+    return f"authz:{user_id}"
+
+
+def load_auth_context(user_id):
+    """Build a user's context with one query joining profile and both KYC tables"""
+    timeout = settings.AUTH_CONTEXT_CACHE_TIMEOUT
+    if timeout:
+        try:
+            cached = cache.get(_cache_key(user_id))
+        except Exception as e:
+            logger.warning(f"Could not read cached auth context for user {user_id}: {e}")
+            cached = None
+        if cached is not None:
+            return AuthContext(**cached)
+
+    row = User.objects.filter(pk=user_id).values(
+        'is_staff', 'is_superuser',
+        'profile__id', 'profile__role',
+        'farmer_kyc__id', 'farmer_kyc__is_verified',
+        'investor_kyc__id', 'investor_kyc__is_verified',
+    ).first()
+    if row is None:
+        return AuthContext()
+
+    context = AuthContext(
+        user_id=user_id,
+        is_staff=row['is_staff'],
+        is_superuser=row['is_superuser'],
+        profile_id=row['profile__id'],
+        role=row['profile__role'],
+        farmer_kyc_id=row['farmer_kyc__id'],
+        farmer_kyc_verified=bool(row['farmer_kyc__is_verified']),
+        investor_kyc_id=row['investor_kyc__id'],
+        investor_kyc_verified=bool(row['investor_kyc__is_verified']),
+    )
+    if timeout:
+        try:
+            cache.set(_cache_key(user_id), context.as_dict(), timeout)
+        except Exception as e:
+            logger.warning(f"Could not cache auth context for user {user_id}: {e}")
+    return context
+
+
+def get_auth_context(request):
+    """
+    Return the request's AuthContext, building it on first use. It is
+    stored on the underlying HttpRequest so DRF and Django code share it.
+    """
+    http_request = getattr(request, '_request', request)
+    context = getattr(http_request, 'auth_context', None)
+    if context is None:
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            context = AuthContext()
+        else:
+            context = load_auth_context(user.pk)
+        set_auth_context(request, context)
+    return context
+
+
+def set_auth_context(request, context):
+    getattr(request, '_request', request).auth_context = context
+
+
+def _version_key(user_id):
+    return f"authz:version:{user_id}"
+
+
+def get_claims_version(user_id):
+    """
+    Current version of a user's token claims, created if missing. A new
+    counter starts from the clock so it never matches an evicted one.
+    None if the cache is unreachable; such claims are never trusted.
+    """
+    key = _version_key(user_id)
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, int(time.time() * 1000), None)
+            version = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Could not read claims version for user {user_id}: {e}")
+        return None
+    return version
+
+
+def peek_claims_version(user_id):
+    """Current claims version, or None if it is unknown"""
+    try:
+        return cache.get(_version_key(user_id))
+    except Exception as e:
+        logger.warning(f"Could not read claims version for user {user_id}: {e}")
+        return None
+
+
+def invalidate_auth_context(user_ids):
+    """
+    Drop cached contexts and bump the claims version so tokens carrying
+    the old role/KYC claims stop being trusted. Call this after queryset
+    updates that skip signals.
+
+    Never raises: if the cache is down, cached contexts still expire after
+    AUTH_CONTEXT_CACHE_TIMEOUT and claims aren't trusted while it is down.
+    """
+    try:
+        cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+        for user_id in user_ids:
+            try:
+                cache.incr(_version_key(user_id))
+            except ValueError:
+                # No version yet: nothing has been issued against one
+                pass
+    except Exception as e:
+        logger.warning(f"Could not invalidate auth context for users {list(user_ids)}: {e}")
+
+
+# User fields that the authorization context depends on
+USER_AUTH_FIELDS = {'is_staff', 'is_superuser', 'is_active', 'password', 'username'}
+
+
+def auth_state_changed(sender, instance, update_fields=None, **kwargs):
+    """post_save / post_delete hook for User, UserProfile and the KYC models"""
+    if isinstance(instance, User):
+        # Skip saves such as last_login updates that can't change permissions
+        if update_fields is not None and not USER_AUTH_FIELDS.intersection(update_fields):
+            return
+        user_id = instance.pk
+    else:
+        user_id = instance.user_id
+    invalidate_auth_context([user_id])
@@ -0,0 +1,210 @@
+import csv
+import io
+import json
+import logging
+import os
+import zipfile
+
+from django.conf import settings
+from django.utils import timezone
+from .models import FarmerKYC, InvestorKYC, NDAAgreement
+from .nda import get_nda_template, nda_is_current
+from .storage_fetch import fetch_many
+
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ['csv', 'jsonl']
+EXPORT_SECTIONS = ['nda', 'kyc']
+
+# verified filter values and the KYC is_verified state they select
+VERIFIED_FILTERS = {'all': None, 'verified': True, 'unverified': False}
+
+KYC_EXPORT_MODELS = {
+    'investor_kyc': InvestorKYC,
+    'farmer_kyc': FarmerKYC,
+}
+
+# Rows read per database round trip
+EXPORT_QUERY_CHUNK_SIZE = 500
+
+
+class _ZipStream:
+    """Write-only file object for ZipFile that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _export_fields(model):
+    """Column names for ``model``: every concrete field, files as their storage names"""
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _format_row(fields, row, export_format):
+    if export_format == 'jsonl':
+        return json.dumps(dict(zip(fields, row)), default=str) + '\n'
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(['' if value is None else value for value in row])
+    return buffer.getvalue()
+
+
+def _write_records(archive, stream, name, queryset, export_format):
+    """Write ``queryset`` as one CSV/JSON Lines member, reading and yielding in chunks"""
+    fields = _export_fields(queryset.model)
+    count = 0
+
+    with archive.open(name, 'w') as member:
+        if export_format == 'csv':
+            member.write(_format_row(fields, fields, 'csv').encode())
+
+        for row in queryset.values_list(*fields).iterator(chunk_size=EXPORT_QUERY_CHUNK_SIZE):
+            member.write(_format_row(fields, row, export_format).encode())
+            count += 1
+            if count % EXPORT_QUERY_CHUNK_SIZE == 0:
+                yield stream.drain()
+
+    yield stream.drain()
+    return count
+
+
+def _nda_files(ndas):
+    """
+    Yield ``(nda, pdf, signature, error)`` for ``ndas`` in order. Files are
+    fetched a batch at a time through the shared storage fetch pool, so at
+    most one batch of files is held in memory; outdated PDFs are rendered.
+    """
+    batch_size = 2 * settings.STORAGE_FETCH_WORKERS
+    batch = []
+    for nda in ndas:
+        batch.append(nda)
+        if len(batch) == batch_size:
+            yield from _fetch_nda_batch(batch)
+            batch = []
+    if batch:
+        yield from _fetch_nda_batch(batch)
+
+
+def _fetch_nda_batch(ndas):
+    names = []
+    for nda in ndas:
+        names.append(nda.signature.name)
+        if nda_is_current(nda):
+            names.append(nda.pdf.name)
+
+    # Every NDA file lives in MediaStorage; caching audit reads would only evict hot blobs
+    storage = NDAAgreement._meta.get_field('signature').storage
+    files, errors = fetch_many(storage, names, use_cache=False)
+
+    for nda in ndas:
+        failed = [str(errors[name]) for name in (nda.signature.name, nda.pdf.name) if name in errors]
+        if failed:
+            yield nda, None, None, '; '.join(failed)
+            continue
+
+        signature = files.get(nda.signature.name)
+        try:
+            pdf = files[nda.pdf.name] if nda_is_current(nda) else get_nda_template().render(nda, signature)
+        except Exception as e:
+            yield nda, None, None, str(e)
+            continue
+        yield nda, pdf, signature, None
+
+
+def filter_exports(submitted_after=None, submitted_before=None, verified=None):
+    """Querysets to export: NDAs by submission date, KYC records by date and verification state"""
+    ndas = NDAAgreement.objects.order_by('pk')
+    if submitted_after:
+        ndas = ndas.filter(submitted_at__gte=submitted_after)
+    if submitted_before:
+        ndas = ndas.filter(submitted_at__lt=submitted_before)
+
+    kyc = {}
+    for name, model in KYC_EXPORT_MODELS.items():
+        queryset = model.objects.order_by('pk')
+        if submitted_after:
+            queryset = queryset.filter(created_at__gte=submitted_after)
+        if submitted_before:
+            queryset = queryset.filter(created_at__lt=submitted_before)
+        if verified is not None:
+            queryset = queryset.filter(is_verified=verified)
+        kyc[name] = queryset
+
+    return ndas, kyc
+
+
+def stream_compliance_export(submitted_after=None, submitted_before=None, verified=None,
+                             sections=EXPORT_SECTIONS, export_format='csv'):
+    """
+    Generate a ZIP archive of NDA PDFs, signature images and NDA/KYC
+    metadata (CSV or JSON Lines) as a stream of byte chunks.
+
+    Records are read from the database in chunks and files are fetched
+    a batch at a time on the storage fetch pool, so memory stays bounded
+    however many records match.
+    A file that can't be fetched is listed in errors.txt instead of
+    failing the export.
+    """
+    ndas, kyc = filter_exports(submitted_after, submitted_before, verified)
+    counts = {}
+    errors = []
+
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        if 'nda' in sections:
+            counts['nda'] = yield from _write_records(archive, stream, f"nda/agreements.{export_format}", ndas, export_format)
+
+            files = _nda_files(
+                ndas.only('pk', 'full_name', 'email', 'company', 'date_signed', 'ip_address',
+                          'submitted_at', 'signature', 'pdf', 'pdf_template_version').iterator(chunk_size=EXPORT_QUERY_CHUNK_SIZE)
+            )
+            for nda, pdf, signature, error in files:
+                if error is not None:
+                    logger.warning(f"Compliance export: could not fetch files for NDA {nda.pk}: {error}")
+                    errors.append(f"nda {nda.pk}: {error}")
+                    continue
+
+                archive.writestr(f"nda/{nda.pk}/agreement.pdf", pdf)
+                if signature is not None:
+                    ext = os.path.splitext(nda.signature.name)[1] or '.png'
+                    archive.writestr(f"nda/{nda.pk}/signature{ext}", signature)
+                yield stream.drain()
+
+        if 'kyc' in sections:
+            for name, queryset in kyc.items():
+                counts[name] = yield from _write_records(archive, stream, f"kyc/{name}.{export_format}", queryset, export_format)
+
+        if errors:
+            archive.writestr('errors.txt', '\n'.join(errors) + '\n')
+
+        manifest = {
+            'generated_at': timezone.now().isoformat(),
+            'filters': {
+                'submitted_after': submitted_after.isoformat() if submitted_after else None,
+                'submitted_before': submitted_before.isoformat() if submitted_before else None,
+                'verified': verified,
+            },
+            'format': export_format,
+            'counts': counts,
+            'errors': len(errors),
+        }
+        archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+
+    yield stream.drain()
@@ -0,0 +1,203 @@
+import base64
+import binascii
+import heapq
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from backend.storage_backends import MediaStorage
+from .authz import invalidate_auth_context
+from .models import KYC_ADMIN_UPDATABLE_FIELDS, FarmerKYC, InvestorKYC, KYCVerificationLog, UserProfile
+from .serializers import FarmerKYCReviewSerializer, InvestorKYCReviewSerializer
+from .signed_urls import get_signed_urls
+
+
+# Review-queue sources by KYC type; the type name also breaks created_at ties
+QUEUE_SOURCES = {
+    'farmer': (FarmerKYC, FarmerKYCReviewSerializer),
+    'investor': (InvestorKYC, InvestorKYCReviewSerializer),
+}
+
+
+class InvalidCursor(Exception):
+    """Raised for a review-queue cursor that can't be decoded"""
+
+
+def encode_cursor(kyc_type, kyc):
+    raw = f"{kyc.created_at.isoformat()}|{kyc_type}|{kyc.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(encoded):
+    try:
+        created_at, kyc_type, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split('|', 2)
+        return datetime.fromisoformat(created_at), kyc_type, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Invalid cursor")
+
+
+def _after_cursor(queryset, kyc_type, cursor):
+    """Rows that sort after ``cursor`` in (created_at, kyc_type, id) order"""
+    created_at, cursor_type, pk = cursor
+    after = Q(created_at__gt=created_at)
+    if kyc_type > cursor_type:
+        after |= Q(created_at=created_at)
+    elif kyc_type == cursor_type:
+        after |= Q(created_at=created_at, pk__gt=pk)
+    return queryset.filter(after)
+
+
+def parse_submitted(value):
+    """Parse a submitted_before/after filter given as an ISO datetime or date"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            return None
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def pending_queue(kyc_type='all', role=None, submitted_before=None, submitted_after=None):
+    """Filtered querysets of unverified KYC submissions, keyed by KYC type"""
+    sources = {}
+    for name, (model, _) in QUEUE_SOURCES.items():
+        if kyc_type not in ('all', name):
+            continue
+        if role and name == 'investor' and role != 'Investor':
+            continue
+
+        queryset = model.objects.filter(is_verified=False).select_related('user')
+        if role and name == 'farmer':
+            queryset = queryset.filter(role=role)
+        if submitted_before:
+            queryset = queryset.filter(created_at__lt=submitted_before)
+        if submitted_after:
+            queryset = queryset.filter(created_at__gte=submitted_after)
+        sources[name] = queryset
+    return sources
+
+
+def review_queue_page(sources, cursor=None, page_size=50):
+    """
+    One page of the merged review queue, oldest submission first.
+    Each source is read with a keyset seek of at most ``page_size + 1``
+    rows and the results are merged in Python, so a page costs one
+    query per KYC type however deep into the queue it is.
+    Returns ``(items, next_cursor)`` where items are ``(kyc_type, kyc)``.
+    """
+    streams = []
+    for name, queryset in sources.items():
+        if cursor:
+            queryset = _after_cursor(queryset, name, cursor)
+        rows = queryset.order_by('created_at', 'pk')[:page_size + 1]
+        streams.append([((kyc.created_at, name, kyc.pk), name, kyc) for kyc in rows])
+
+    merged = [(name, kyc) for _, name, kyc in heapq.merge(*streams, key=lambda item: item[0])]
+    items = merged[:page_size]
+    next_cursor = encode_cursor(*items[-1]) if len(merged) > page_size else None
+    return items, next_cursor
+
+
+def serialize_review_items(items):
+    """Serialize a queue page, signing every file URL on it in one batch"""
+    names = [
+        field.name
+        for _, kyc in items
+        for field in (kyc.id_document, kyc.profile_picture)
+        if field
+    ]
+    file_urls = get_signed_urls(MediaStorage(), names)
+
+    data = []
+    for kyc_type, kyc in items:
+        serializer_class = QUEUE_SOURCES[kyc_type][1]
+        context = {'kyc_type': kyc_type, 'file_urls': file_urls}
+        data.append(serializer_class(kyc, context=context).data)
+    return data
+
+
+KYC_MODELS_BY_ROLE = {
+    'Investor': InvestorKYC,
+    'Farmer': FarmerKYC,
+}
+
+
+def apply_decision(kyc, action, allow_changes=False, now=None):
+    """Set the admin-updatable fields of ``kyc`` for an approve/reject/pending action"""
+    if action == 'approved':
+        kyc.is_verified = True
+        kyc.verification_date = now or timezone.now()
+        kyc.changes_allowed = allow_changes
+    else:
+        kyc.is_verified = False
+        kyc.verification_date = None
+        kyc.changes_allowed = False
+
+
+def bulk_verify(decisions, admin_user):
+    """
+    Apply many admin KYC decisions in one transaction: one read per KYC
+    type, one bulk_update per type and one bulk_create for the logs.
+    ``decisions`` is a list of ``{'user_id', 'action', 'allow_changes'}``.
+    Returns one result dict per decision, in the order given.
+    """
+    now = timezone.now()
+    user_ids = [decision['user_id'] for decision in decisions]
+
+    with transaction.atomic():
+        roles = dict(UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'role'))
+
+        kycs = {}
+        for role, model in KYC_MODELS_BY_ROLE.items():
+            ids = [user_id for user_id in user_ids if roles.get(user_id) == role]
+            if ids:
+                for kyc in model.objects.select_for_update().filter(user_id__in=ids):
+                    kycs[kyc.user_id] = kyc
+
+        results = []
+        updated = {model: [] for model in KYC_MODELS_BY_ROLE.values()}
+        logs = []
+
+        for decision in decisions:
+            user_id = decision['user_id']
+            action = decision['action']
+
+            if user_id not in roles:
+                results.append({'user_id': user_id, 'success': False, 'message': 'User profile not found'})
+                continue
+            if roles[user_id] not in KYC_MODELS_BY_ROLE:
+                results.append({'user_id': user_id, 'success': False, 'message': 'Invalid user role'})
+                continue
+            kyc = kycs.get(user_id)
+            if kyc is None:
+                results.append({'user_id': user_id, 'success': False, 'message': 'KYC not found'})
+                continue
+
+            apply_decision(kyc, action, decision.get('allow_changes', False), now)
+            kyc.updated_at = now
+            updated[type(kyc)].append(kyc)
+            logs.append(KYCVerificationLog(user_id=user_id, action=action, admin_user=admin_user))
+
+            results.append({
+                'user_id': user_id,
+                'success': True,
+                'action': action,
+                'is_verified': kyc.is_verified,
+                'verification_date': kyc.verification_date,
+                'changes_allowed': kyc.changes_allowed
+            })
+
+        for model, objs in updated.items():
+            if objs:
+                model.objects.bulk_update(objs, KYC_ADMIN_UPDATABLE_FIELDS)
+        KYCVerificationLog.objects.bulk_create(logs)
+
+    # bulk_update skips post_save, so drop cached authorization state here
+    invalidate_auth_context([kyc.user_id for objs in updated.values() for kyc in objs])
+
+    return results
@@ -0,0 +1,139 @@
+from datetime import timedelta
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+from .models import EmailDeadLetter, OutboundEmail
+
+
+logger = logging.getLogger(__name__)
+
+# Messages sent per worker run over a single SMTP connection
+SEND_BATCH_SIZE = 50
+
+# A message left in "sending" this long belongs to a worker that died
+SENDING_TIMEOUT = timedelta(minutes=10)
+
+
+def queue_email(subject, body, to, from_email=None):
+    """
+    Store a message in the outbound queue and wake the mail worker once
+    the surrounding transaction commits. Never talks to the mail server,
+    so it is safe to call inside ``transaction.atomic()``.
+    """
+    message = OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.EMAIL_HOST_USER or '',
+        to=list(to),
+    )
+    transaction.on_commit(_wake_worker)
+    return message
+
+
+def _wake_worker():
+    try:
+        send_queued_emails.delay()
+    except Exception as e:
+        # The periodic run still picks the message up
+        logger.warning(f"Could not queue mail worker: {e}")
+
+
+def _claim_batch():
+    """Mark the next due messages as sending and return them"""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:SEND_BATCH_SIZE]
+        )
+        OutboundEmail.objects.filter(id__in=ids).update(status='sending', updated_at=now)
+    return list(OutboundEmail.objects.filter(id__in=ids).order_by('next_attempt_at'))
+
+
+def _record_failure(message, error):
+    message.attempts += 1
+    message.last_error = str(error)
+
+    if message.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+        with transaction.atomic():
+            # The body is dropped: it can carry OTP codes and reset links
+            EmailDeadLetter.objects.create(
+                subject=message.subject,
+                from_email=message.from_email,
+                to=message.to,
+                attempts=message.attempts,
+                last_error=message.last_error,
+                queued_at=message.created_at,
+            )
+            message.delete()
+        logger.error(f"Email {message.subject!r} to {message.to} moved to dead letters: {error}")
+        return
+
+    delay = settings.EMAIL_QUEUE_RETRY_BACKOFF * (2 ** (message.attempts - 1))
+    message.status = 'queued'
+    message.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+    message.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at', 'updated_at'])
+
+
+@shared_task
+def send_queued_emails():
+    """
+    Drain the outbound queue, reusing one mail-server connection for the
+    whole batch. Failed messages are retried with exponential backoff and
+    moved to EmailDeadLetter after EMAIL_QUEUE_MAX_ATTEMPTS. Bodies are
+    only kept until a message is sent or given up on.
+    """
+    # Release messages claimed by a worker that never finished
+    OutboundEmail.objects.filter(
+        status='sending', updated_at__lt=timezone.now() - SENDING_TIMEOUT
+    ).update(status='queued')
+
+    sent = failed = 0
+    while True:
+        batch = _claim_batch()
+        if not batch:
+            break
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as e:
+            for message in batch:
+                _record_failure(message, e)
+            failed += len(batch)
+            break
+
+        try:
+            for message in batch:
+                try:
+                    EmailMessage(
+                        message.subject,
+                        message.body,
+                        message.from_email,
+                        message.to,
+                        connection=connection,
+                    ).send(fail_silently=False)
+                except Exception as e:
+                    _record_failure(message, e)
+                    failed += 1
+                else:
+                    # Clear the body: it can carry OTP codes and reset links
+                    OutboundEmail.objects.filter(id=message.id).update(
+                        status='sent', body='', sent_at=timezone.now(), updated_at=timezone.now()
+                    )
+                    sent += 1
+        finally:
+            connection.close()
+
+    # Keep sent messages around for a while for troubleshooting
+    OutboundEmail.objects.filter(
+        status='sent', sent_at__lt=timezone.now() - timedelta(days=settings.EMAIL_QUEUE_RETENTION_DAYS)
+    ).delete()
+
+    return f"Sent {sent} emails, {failed} failed"
@@ -0,0 +1,60 @@
+from datetime import date
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apis.models import NDAAgreement
+from apis.nda import NDATemplate, get_nda_template
+
+
+class Command(BaseCommand):
+    help = "Time NDA PDF rendering with the shared compiled template against a fresh template per render"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100, help="NDAs to render in each run")
+        parser.add_argument('--signature', help="Signature image to embed in every NDA")
+
+    def handle(self, *args, **options):
+        count = options['count']
+        if count < 1:
+            raise CommandError("--count must be at least 1")
+
+        signature_data = None
+        if options['signature']:
+            with open(options['signature'], 'rb') as signature:
+                signature_data = signature.read()
+
+        # Unsaved agreements: rendering never touches the database
+        ndas = [
+            NDAAgreement(
+                pk=i,
+                full_name=f"Benchmark Investor {i}",
+                email=f"investor{i}@example.com",
+                company="Benchmark Capital" if i % 2 else "",
+                date_signed=date.today(),
+                ip_address="127.0.0.1",
+                submitted_at=timezone.now(),
+            )
+            for i in range(count)
+        ]
+
+        runs = [
+            ("fresh template", lambda nda: NDATemplate().render(nda, signature_data)),
+            ("shared template", lambda nda: get_nda_template().render(nda, signature_data)),
+        ]
+        # Build the shared template outside the timed loop, as a warm worker would have
+        get_nda_template()
+
+        for label, render in runs:
+            size = 0
+            started = time.perf_counter()
+            for nda in ndas:
+                size += len(render(nda))
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{label}: {count} NDAs in {elapsed:.2f}s "
+                f"({elapsed / count * 1000:.1f} ms each, {count / elapsed:.1f}/s, "
+                f"{size / count / 1024:.0f} KiB avg)"
+            )
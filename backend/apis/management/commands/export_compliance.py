@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apis.compliance_export import EXPORT_FORMATS, EXPORT_SECTIONS, VERIFIED_FILTERS, stream_compliance_export
+from apis.kyc_review import parse_submitted
+
+
+class Command(BaseCommand):
+    help = "Write NDA PDFs, signatures and NDA/KYC metadata to a ZIP archive for a compliance audit"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Path of the ZIP file to write")
+        parser.add_argument('--submitted-after', help="ISO date or datetime (inclusive)")
+        parser.add_argument('--submitted-before', help="ISO date or datetime (exclusive)")
+        parser.add_argument('--verified', choices=list(VERIFIED_FILTERS), default='all',
+                            help="KYC verification state to include")
+        parser.add_argument('--include', default=','.join(EXPORT_SECTIONS),
+                            help=f"Comma-separated sections: {', '.join(EXPORT_SECTIONS)}")
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv', help="Metadata format")
+
+    def handle(self, *args, **options):
+        dates = {}
+        for param in ['submitted_after', 'submitted_before']:
+            if options[param]:
+                dates[param] = parse_submitted(options[param])
+                if dates[param] is None:
+                    raise CommandError(f"Invalid --{param.replace('_', '-')}: use an ISO date or datetime")
+
+        sections = [section for section in options['include'].split(',') if section]
+        if not sections or any(section not in EXPORT_SECTIONS for section in sections):
+            raise CommandError(f"Invalid --include: use any of {', '.join(EXPORT_SECTIONS)}")
+
+        size = 0
+        with open(options['output'], 'wb') as output:
+            for chunk in stream_compliance_export(
+                verified=VERIFIED_FILTERS[options['verified']],
+                sections=sections,
+                export_format=options['format'],
+                **dates,
+            ):
+                output.write(chunk)
+                size += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {size / 1024 / 1024:.1f} MiB to {options['output']}"))
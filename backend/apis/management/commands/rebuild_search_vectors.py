@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apis.search import SEARCH_FIELDS, rebuild_search_vectors, search_enabled
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored full-text search vectors for opportunities and projects"
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError("Full-text search requires PostgreSQL")
+
+        for model in SEARCH_FIELDS:
+            count = rebuild_search_vectors(model)
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt search vectors for {count} {model._meta.verbose_name_plural}"
+            ))
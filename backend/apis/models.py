@@ -2,15 +2,17 @@ from datetime import timedelta
 import os
 from tabnanny import verbose
 from django.utils import timezone
-import secrets
 from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 import uuid
 from django.core.validators import MinValueValidator
 from django.forms import ValidationError
 
 from backend.storage_backends import MediaStorage
+from .signed_urls import get_signed_url
 import logging
 
 logger = logging.getLogger(__name__)
@@ -52,7 +54,68 @@ class UserProfile(models.Model):
         verbose_name_plural = "User Profiles"
         
         
-class InvestorKYC(models.Model):
+# KYC fields an admin may still change after submission
+KYC_ADMIN_UPDATABLE_FIELDS = ('is_verified', 'verification_date', 'changes_allowed', 'updated_at')
+
+
+class KYCQuerySet(models.QuerySet):
+    """Queryset that refuses bulk updates to immutable KYC fields"""
+
+    def update(self, **kwargs):
+        for field_name in kwargs:
+            if field_name not in KYC_ADMIN_UPDATABLE_FIELDS:
+                raise ValidationError(f"KYC data is immutable. Cannot update field: {field_name}")
+        return super().update(**kwargs)
+
+
+class ImmutableKYCMixin:
+    """
+    Enforce KYC immutability against the field values the instance was
+    loaded with, so an update costs no extra read of the row.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._snapshot_loaded_values()
+        return instance
+
+    def _snapshot_loaded_values(self):
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: field.value_from_object(self)
+            for field in self._meta.concrete_fields
+            if field.attname not in deferred
+        }
+
+    def _check_immutable(self, update_fields=None):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            # Not loaded from the database (e.g. built with an explicit pk)
+            instance = type(self).objects.filter(pk=self.pk).first()
+            if instance is None:
+                return
+            loaded = instance._loaded_values
+
+        for field in self._meta.concrete_fields:
+            if field.name in KYC_ADMIN_UPDATABLE_FIELDS or field.attname not in loaded:
+                continue
+            if update_fields is not None and field.name not in update_fields and field.attname not in update_fields:
+                continue
+            if field.value_from_object(self) != loaded[field.attname]:
+                raise ValidationError(f"KYC data is immutable. Cannot update field: {field.name}")
+
+    def save(self, *args, **kwargs):
+        """Override save to prevent updates after creation except allowed fields"""
+        # An instance built with an existing pk is still an update
+        if self.pk is not None:
+            self._check_immutable(kwargs.get('update_fields'))
+
+        super().save(*args, **kwargs)
+        self._snapshot_loaded_values()
+
+
+class InvestorKYC(ImmutableKYCMixin, models.Model):
     """KYC information for investors - Immutable once created"""
 
     ID_TYPE_CHOICES = [
@@ -94,21 +157,7 @@ class InvestorKYC(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        """Override save to prevent updates after creation except allowed fields"""
-        if self.pk is not None:
-            original = InvestorKYC.objects.get(pk=self.pk)
-            admin_updatable_fields = ['is_verified', 'verification_date', 'changes_allowed']
-
-            for field in self._meta.fields:
-                field_name = field.name
-                if field_name not in admin_updatable_fields and field_name not in ['updated_at']:
-                    old_value = getattr(original, field_name)
-                    new_value = getattr(self, field_name)
-                    if old_value != new_value:
-                        raise ValidationError(f"KYC data is immutable. Cannot update field: {field_name}")
-
-        super().save(*args, **kwargs)
+    objects = KYCQuerySet.as_manager()
 
     def __str__(self):
         return f"KYC for {self.full_name} - {'Verified' if self.is_verified else 'Pending'}"
@@ -116,9 +165,13 @@ class InvestorKYC(models.Model):
     class Meta:
         verbose_name = "Investor KYC"
         verbose_name_plural = "Investor KYCs"
+        indexes = [
+            # Admin review queue: pending submissions, oldest first
+            models.Index(fields=['created_at', 'id'], name='investor_kyc_pending_idx', condition=models.Q(is_verified=False)),
+        ]
 
 
-class FarmerKYC(models.Model):
+class FarmerKYC(ImmutableKYCMixin, models.Model):
     """KYC information for farmers/project seekers - Immutable once created"""
 
     ROLE_CHOICES = [
@@ -159,29 +212,18 @@ class FarmerKYC(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def save(self, *args, **kwargs):
-        """Override save to prevent updates after creation except allowed fields"""
-        if self.pk is not None:
-            original = FarmerKYC.objects.get(pk=self.pk)
-            admin_updatable_fields = ['is_verified', 'verification_date', 'changes_allowed']
-
-            for field in self._meta.fields:
-                field_name = field.name
-                if field_name not in admin_updatable_fields and field_name not in ['updated_at']:
-                    old_value = getattr(original, field_name)
-                    new_value = getattr(self, field_name)
-                    if old_value != new_value:
-                        raise ValidationError(f"KYC data is immutable. Cannot update field: {field_name}")
-
-        super().save(*args, **kwargs)
+    objects = KYCQuerySet.as_manager()
 
-    
     def __str__(self):
         return f"KYC for {self.full_name} - {'Verified' if self.is_verified else 'Pending'}"
 
     class Meta:
         verbose_name = "Farmer KYC"
         verbose_name_plural = "Farmer KYCs"
+        indexes = [
+            # Admin review queue: pending submissions, oldest first
+            models.Index(fields=['created_at', 'id'], name='farmer_kyc_pending_idx', condition=models.Q(is_verified=False)),
+        ]
 
 
 class KYCVerificationLog(models.Model):
@@ -230,41 +272,32 @@ class PasswordReset(models.Model):
 
 
 class OTPToken(models.Model):
-    """OTP Token model for authentication"""
-    user = models.ForeignKey(
+    """
+    A user's current login OTP. There is at most one row per user and only
+    a keyed hash of the code is stored; see apis/otp.py.
+    """
+    user = models.OneToOneField(
         settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE, 
-        related_name="otps"
+        related_name="otp"
     )
-    otp_code = models.CharField(max_length=5, blank=True)
-    otp_created_at = models.DateTimeField(auto_now_add=True)  
-    otp_expires_at = models.DateTimeField(blank=True, null=True)
+    otp_hash = models.CharField(max_length=64)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    otp_created_at = models.DateTimeField(default=timezone.now)
+    otp_expires_at = models.DateTimeField()
     
     class Meta:
-        ordering = ['-otp_created_at']
+        indexes = [
+            # Expiry sweeper
+            models.Index(fields=['otp_expires_at'], name='otp_expires_idx'),
+        ]
     
     def __str__(self):
-        return f"OTP for {self.user.username} - {self.otp_code}"
+        return f"OTP for user {self.user_id}"
     
     def is_expired(self):
         """Check if OTP is expired"""
-        if self.otp_expires_at:
-            return timezone.now() > self.otp_expires_at
-        return False
-    
-    def generate_otp_code(self):
-        """Generate a 5-digit OTP code"""
-        return str(secrets.randbelow(90000) + 10000)
-    
-    def save(self, *args, **kwargs):
-        """Generate OTP code and set expiry time if not provided"""
-        if not self.otp_code:
-            self.otp_code = self.generate_otp_code()
-        
-        if not self.otp_expires_at:
-            self.otp_expires_at = timezone.now() + timedelta(minutes=5)
-        
-        super().save(*args, **kwargs)
+        return timezone.now() > self.otp_expires_at
                
 
 class Opportunity(models.Model):
@@ -292,17 +325,29 @@ class Opportunity(models.Model):
     applicants = models.PositiveIntegerField(default=0)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='opportunities')
     is_active = models.BooleanField(default=True)
+    # Weighted full-text document, maintained by apis.search
+    search_vector = SearchVectorField(null=True, editable=False)
     
     class Meta:
         ordering = ['-posted']
         verbose_name_plural = "Opportunities"
+        indexes = [
+            # opportunity_list: active listings, optionally by type, newest first
+            models.Index(fields=['-posted'], name='opp_active_posted_idx', condition=models.Q(is_active=True)),
+            models.Index(fields=['type', '-posted'], name='opp_active_type_posted_idx', condition=models.Q(is_active=True)),
+            # cleanup_expired_opportunities: active rows past their deadline
+            models.Index(fields=['deadline'], name='opp_active_deadline_idx', condition=models.Q(is_active=True)),
+            # opportunity_list search: full-text and typo-tolerant title matching
+            GinIndex(fields=['search_vector'], name='opp_search_vector_idx'),
+            GinIndex(fields=['title'], name='opp_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
     
     def __str__(self):
         return self.title
     
-    def increment_views(self):
-        self.views += 1
-        self.save(update_fields=['views'])
+    def increment_views(self, count=1):
+        # Atomic, so concurrent increments are never lost
+        Opportunity.objects.filter(pk=self.pk).update(views=models.F('views') + count)
 
 # PROJECTS
 
@@ -314,7 +359,19 @@ class Project(models.Model):
         ('funded', 'Funded'),
         ('completed', 'Completed'),
     ]
-    
+
+    WATERMARK_PENDING = 'pending'
+    WATERMARK_PROCESSING = 'processing'
+    WATERMARK_READY = 'ready'
+    WATERMARK_FAILED = 'failed'
+
+    WATERMARK_STATUS_CHOICES = [
+        (WATERMARK_PENDING, 'Pending'),
+        (WATERMARK_PROCESSING, 'Processing'),
+        (WATERMARK_READY, 'Ready'),
+        (WATERMARK_FAILED, 'Failed'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     farmer = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -336,14 +393,24 @@ class Project(models.Model):
     image_url = models.URLField(blank=True, null=True)
     original_proposal = models.FileField(
         upload_to='proposals/original/',
+        storage=MediaStorage(),
         help_text="Upload your project proposal PDF"
     )
     watermarked_proposal = models.FileField(
         upload_to='proposals/watermarked/',
+        storage=MediaStorage(),
         blank=True,
         null=True,
         editable=False
     )
+    watermark_status = models.CharField(
+        max_length=20,
+        choices=WATERMARK_STATUS_CHOICES,
+        default=WATERMARK_PENDING,
+        editable=False
+    )
+    watermark_attempts = models.PositiveSmallIntegerField(default=0, editable=False)
+    watermark_error = models.TextField(blank=True, editable=False)
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
@@ -353,6 +420,8 @@ class Project(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Weighted full-text document, maintained by apis.search
+    search_vector = SearchVectorField(null=True, editable=False)
 
     class Meta:
         ordering = ['-created_at']
@@ -362,6 +431,19 @@ class Project(models.Model):
         ]
         verbose_name = "Project"
         verbose_name_plural = "Projects"
+        indexes = [
+            # list_projects / search_projects keyset pages over approved projects
+            models.Index(fields=['-created_at', '-id'], name='project_approved_recent_idx', condition=models.Q(status='approved')),
+            # get_recommended_projects: deadline range and budget filters
+            models.Index(fields=['deadline'], name='project_approved_deadline_idx', condition=models.Q(status='approved')),
+            models.Index(fields=['target_amount', 'deadline'], name='project_approved_budget_idx', condition=models.Q(status='approved')),
+            # farmer_projects keyset pages and per-status admin filtering
+            models.Index(fields=['farmer', '-created_at', '-id'], name='project_farmer_recent_idx'),
+            models.Index(fields=['status', '-created_at'], name='project_status_recent_idx'),
+            # search_projects: full-text and typo-tolerant title matching
+            GinIndex(fields=['search_vector'], name='project_search_vector_idx'),
+            GinIndex(fields=['title'], name='project_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
     
     def __str__(self):
         return f"{self.title} by {self.farmer.username}"
@@ -375,6 +457,125 @@ class Project(models.Model):
 
 
 
+class DirectUpload(models.Model):
+    """A file uploaded by the client straight to MediaStorage via presigned multipart parts"""
+
+    PURPOSE_CHOICES = [
+        ('proposal', 'Project Proposal'),
+        ('id_document', 'KYC ID Document'),
+        ('profile_picture', 'KYC Profile Picture'),
+    ]
+
+    STATUS_CHOICES = [
+        ('initiated', 'Initiated'),
+        ('completed', 'Completed'),
+        ('attached', 'Attached'),
+        ('aborted', 'Aborted'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='direct_uploads')
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    name = models.CharField(max_length=500, help_text="Storage name of the uploaded object")
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.PositiveBigIntegerField()
+    upload_id = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='initiated')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.purpose} upload by {self.user.username} - {self.status}"
+
+    class Meta:
+        verbose_name = "Direct Upload"
+        verbose_name_plural = "Direct Uploads"
+        ordering = ['-created_at']
+
+
+class OutboundEmail(models.Model):
+    """Durable outbound mail queue, drained by apis.mailer"""
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list, help_text="List of recipient addresses")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)} - {self.status}"
+
+    class Meta:
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+        ordering = ['-created_at']
+        indexes = [
+            # Worker claims due messages in order
+            models.Index(fields=['next_attempt_at'], name='email_queued_due_idx', condition=models.Q(status='queued')),
+        ]
+
+
+class EmailDeadLetter(models.Model):
+    """Outbound emails that failed every delivery attempt (without their bodies)"""
+
+    subject = models.CharField(max_length=255)
+    from_email = models.CharField(max_length=255, blank=True)
+    to = models.JSONField(default=list)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    queued_at = models.DateTimeField()
+    failed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)}"
+
+    class Meta:
+        verbose_name = "Email Dead Letter"
+        verbose_name_plural = "Email Dead Letters"
+        ordering = ['-failed_at']
+
+
+class AdminNotification(models.Model):
+    """Admin-facing event, mailed in periodic digests by apis.notifications"""
+
+    KIND_CHOICES = [
+        ('investor_kyc', 'Investor KYC Submitted'),
+        ('farmer_kyc', 'Farmer KYC Submitted'),
+        ('project', 'Project Created'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    digested_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} - {self.created_at}"
+
+    class Meta:
+        verbose_name = "Admin Notification"
+        verbose_name_plural = "Admin Notifications"
+        ordering = ['-created_at']
+        indexes = [
+            # Digest run collects events not yet mailed
+            models.Index(fields=['created_at'], name='notification_pending_idx', condition=models.Q(digested_at__isnull=True)),
+        ]
+
+
 class MyModel(models.Model):
     image = models.ImageField(upload_to='images/') 
     document = models.FileField(upload_to='documents/') 
@@ -402,6 +603,12 @@ class NDAAgreement(models.Model):
     ip_address = models.GenericIPAddressField()
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    # Rendered PDF, produced in the background by apis.nda
+    pdf = models.FileField(upload_to='documents/nda/', storage=MediaStorage(), blank=True)
+    pdf_sha256 = models.CharField(max_length=64, blank=True)
+    pdf_template_version = models.PositiveIntegerField(null=True, blank=True)
+    pdf_rendered_at = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         verbose_name = 'NDA Agreement'
         verbose_name_plural = 'NDA Agreements'
@@ -414,7 +621,9 @@ class NDAAgreement(models.Model):
 
     def signature_preview(self):
         if self.signature:
-            return mark_safe(f'<img src="{self.signature.url}" width="300" height="100" style="border:1px solid #ccc;" />')
+            # Reuse a cached presigned URL rather than signing on every admin page load
+            url, _ = get_signed_url(self.signature.storage, self.signature.name)
+            return mark_safe(f'<img src="{url}" width="300" height="100" style="border:1px solid #ccc;" />')
         return "(No Signature Uploaded)"
     
     signature_preview.short_description = "Signature Preview"
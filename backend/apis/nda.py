@@ -0,0 +1,288 @@
+from copy import copy
+from functools import lru_cache
+from html import escape
+from io import BytesIO
+import hashlib
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
+from .models import NDAAgreement
+from .storage_fetch import fetch
+
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the PDF layout or wording changes; stored PDFs rendered
+# from an older version are re-rendered on their next download
+NDA_TEMPLATE_VERSION = 2
+
+NDA_TERMS = """
+    <b>1. Purpose</b><br/>
+    The purpose of this Agreement is to prevent unauthorized use, disclosure, or reproduction of confidential information and intellectual property belonging to project owners (Farmers or Agricultural Entrepreneurs) listed on the Platform.<br/><br/>
+
+    <b>2. Definitions</b><br/>
+    <b>2.1 Confidential Information</b><br/>
+    Includes all business proposals, documentation, business plans, financial projections, technological concepts, sustainable methods, or any materials uploaded by project owners, whether marked as confidential or not.<br/><br/>
+    <b>2.2 Intellectual Property (IP)</b><br/>
+    Includes all trademarks, copyrights, trade secrets, processes, techniques, ideas, inventions, and other proprietary content disclosed through proposal documents or listed projects.<br/><br/>
+
+    <b>3. Obligations of Recipient</b><br/>
+    3.1 Recipient agrees not to copy, reproduce, disclose, reverse-engineer, exploit, or use any part of the Confidential Information or IP for personal or commercial gain without express written consent of the rightful owner.<br/>
+    3.2 Recipient shall not implement, replicate, or attempt to profit from any idea, concept, or structure disclosed through the Platform's proposals.<br/>
+    3.3 Recipient agrees not to share, distribute, or disclose any content to third parties, including colleagues, partners, or competing platforms.<br/>
+    3.4 Recipient agrees to use all reasonable means to protect and maintain the confidentiality and integrity of such information.<br/><br/>
+
+    <b>4. Access Limitations</b><br/>
+    4.1 Only investors who have signed this NDA via digital e-signature may view watermarked PDF proposals on a read-only basis through the Platform.<br/>
+    4.2 Farmers are restricted from accessing or viewing other users' proposals or project documents.<br/><br/>
+
+    <b>5. Ownership & IPR</b><br/>
+    5.1 All Confidential Information and associated Intellectual Property remains the sole property of the original project owner.<br/>
+    5.2 This Agreement does not transfer any ownership rights to the Recipient, nor does it grant any license or rights beyond those expressly stated.<br/><br/>
+
+    <b>6. Watermarking & Content Protection</b><br/>
+    6.1 All uploaded proposals are automatically embedded with "Agriconnect" watermarks using PyPDF2 and displayed in a secure PDF format.<br/>
+    6.2 This protection is enforced to prevent unauthorized reproduction or sharing of materials.<br/><br/>
+
+    <b>7. Legal Enforcement</b><br/>
+    7.1 Any breach of this Agreement, including misuse, unauthorized implementation, or disclosure of confidential material, will result in immediate legal action.<br/>
+    7.2 The Platform reserves the right to suspend, terminate, or permanently ban users in breach of this Agreement and seek damages, injunctive relief, and/or prosecution.<br/><br/>
+
+    <b>8. E-Signature & Acceptance</b><br/>
+    By signing electronically, the Recipient acknowledges that:<br/>
+    • They have read and understood this Agreement<br/>
+    • They agree to be legally bound by its terms<br/>
+    • They accept that a violation may result in legal liability.<br/><br/>
+
+    <b>9. Governing Law</b><br/>
+    This Agreement shall be governed by and construed in accordance with the laws of the Republic of Ghana, according to the Copyright Act, 2005 (Act 690), the Patents Act, 2003 (Act 657), the Trademarks Act, 2004 (Act 664), the Industrial Designs Act, 2003 (Act 660), and the Protection Against Unfair Competition Act, 2000 (Act 589), without applying any rules that might direct the use of another jurisdiction's laws.<br/><br/>
+"""
+
+
+class StaticParagraph(Paragraph):
+    """
+    Paragraph whose line breaks are computed once per frame width and then
+    shared by all of its shallow copies. Only for text that never changes.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wrapped = {}
+
+    def wrap(self, availWidth, availHeight):
+        wrapped = self._wrapped.get(availWidth)
+        if wrapped is None:
+            width, height = super().wrap(availWidth, availHeight)
+            if hasattr(self, 'blPara'):
+                self._wrapped[availWidth] = (self._wrapWidths, self.blPara, height)
+            return width, height
+
+        self._wrapWidths, self.blPara, self.height = wrapped
+        self.width = availWidth
+        return availWidth, self.height
+
+    def split(self, availWidth, availHeight):
+        # Splitting edits the broken lines in place, so give this copy its own
+        Paragraph.wrap(self, availWidth, availHeight)
+        return super().split(availWidth, availHeight)
+
+
+class NDATemplate:
+    """
+    Compiled NDA layout. The styles, title and static clauses are parsed
+    and line-broken once; each render copies those flowables and lays out
+    only the paragraphs that carry signatory details.
+    """
+
+    def __init__(self):
+        base_styles = getSampleStyleSheet()
+        self.normal_style = ParagraphStyle(
+            name='CustomNormal',
+            parent=base_styles['Normal'],
+            fontSize=12,
+            leading=15
+        )
+        self.title_style = ParagraphStyle(
+            name='CustomTitle',
+            parent=base_styles['Title'],
+            fontSize=20,
+            leading=24,
+            alignment=1
+        )
+        self.title = StaticParagraph("NON-DISCLOSURE AGREEMENT", self.title_style)
+        self.clauses = [
+            StaticParagraph(clause, self.normal_style)
+            for clause in NDA_TERMS.split('<br/><br/>')
+            if clause.strip()
+        ]
+
+    def story(self, nda, signature_data=None):
+        """Flowables for ``nda``; ``signature_data`` is the signature image bytes"""
+        full_name = escape(nda.full_name)
+        gap = self.normal_style.leading
+
+        intro = f"""
+        This Non-Disclosure Agreement is entered into on {nda.date_signed} by and between
+        <b>Agriconnect</b>, an agricultural non-governmental platform, and the undersigned
+        individual <b>{full_name}</b>.
+        """
+        signatory = f"""
+        <b>Signatory Information:</b><br/>
+        Full Name: {full_name}<br/>
+        Email: {escape(nda.email)}<br/>
+        Company: {escape(nda.company) or 'N/A'}<br/>
+        Date Signed: {nda.date_signed}<br/>
+        IP Address: {nda.ip_address}<br/>
+        Submitted At: {nda.submitted_at.strftime('%Y-%m-%d %H:%M:%S')}<br/>
+        <br/><br/>
+        <b>Electronic Signature:</b><br/>
+        This document has been electronically signed by {full_name} on {nda.date_signed}.
+        """
+
+        # Layout state is kept on the flowable, so every render gets its own
+        # shallow copies; the parsed text and line breaks they share are
+        # only ever read
+        story = [copy(self.title), Spacer(1, 12), Paragraph(intro, self.normal_style), Spacer(1, gap)]
+        for clause in self.clauses:
+            story.append(copy(clause))
+            story.append(Spacer(1, gap))
+        story.append(Spacer(1, gap))
+        story.append(Paragraph(signatory, self.normal_style))
+
+        if signature_data:
+            story.append(Spacer(1, 12))
+            story.append(Paragraph("<b>Digital Signature:</b>", self.normal_style))
+            story.append(Image(BytesIO(signature_data), width=3*inch, height=1*inch))
+
+        return story
+
+    def render(self, nda, signature_data=None):
+        """Render ``nda`` to PDF bytes"""
+        buffer = BytesIO()
+        # invariant: no timestamp or random document id, so equal input gives equal bytes
+        SimpleDocTemplate(buffer, pagesize=letter, invariant=True).build(self.story(nda, signature_data))
+        return buffer.getvalue()
+
+
+@lru_cache(maxsize=None)
+def get_nda_template():
+    """The NDATemplate shared by every render in this process"""
+    return NDATemplate()
+
+
+def render_nda_pdf(nda):
+    """Render ``nda`` to PDF bytes, reading the signature straight from storage"""
+    signature_data = fetch(nda.signature.storage, nda.signature.name) if nda.signature else None
+    return get_nda_template().render(nda, signature_data)
+
+
+def nda_is_current(nda):
+    return bool(nda.pdf) and nda.pdf_template_version == NDA_TEMPLATE_VERSION
+
+
+def store_nda_pdf(nda):
+    """
+    Render ``nda`` and store it in MediaStorage under a content-addressed
+    name, so a stored PDF is never overwritten. Returns the stored name.
+
+    The row is locked while the new name is recorded: if another render
+    stored a current PDF in the meantime, that one is kept. Replaced PDFs
+    are deleted later by ``delete_nda_pdf``, so downloads streaming them
+    can finish.
+    """
+    pdf = render_nda_pdf(nda)
+    digest = hashlib.sha256(pdf).hexdigest()
+
+    name = nda.pdf.field.generate_filename(nda, f"nda_{nda.pk}_{digest[:16]}.pdf")
+    if not nda.pdf.storage.exists(name):
+        name = nda.pdf.storage.save(name, ContentFile(pdf))
+
+    with transaction.atomic():
+        stored = (
+            NDAAgreement.objects.select_for_update()
+            .only('pdf', 'pdf_sha256', 'pdf_template_version')
+            .get(pk=nda.pk)
+        )
+        if nda_is_current(stored):
+            # Another render got there first; ours is the leftover
+            replaced = name
+            name, digest = stored.pdf.name, stored.pdf_sha256
+        else:
+            replaced = stored.pdf.name
+            NDAAgreement.objects.filter(pk=nda.pk).update(
+                pdf=name,
+                pdf_sha256=digest,
+                pdf_template_version=NDA_TEMPLATE_VERSION,
+                pdf_rendered_at=timezone.now(),
+            )
+        if replaced and replaced != name:
+            schedule_nda_pdf_cleanup(replaced)
+
+    nda.pdf.name = name
+    nda.pdf_sha256 = digest
+    nda.pdf_template_version = NDA_TEMPLATE_VERSION
+    return name
+
+
+def schedule_nda_pdf_cleanup(name):
+    """Delete the stored PDF ``name`` after NDA_PDF_CLEANUP_DELAY, once the transaction commits"""
+
+    def _enqueue():
+        try:
+            delete_nda_pdf.apply_async((name,), countdown=settings.NDA_PDF_CLEANUP_DELAY)
+        except Exception as e:
+            logger.warning(f"Could not queue deletion of old NDA PDF {name}: {e}")
+
+    transaction.on_commit(_enqueue)
+
+
+@shared_task
+def delete_nda_pdf(name):
+    """Delete a replaced NDA PDF unless an agreement points at it again"""
+    if NDAAgreement.objects.filter(pdf=name).exists():
+        return f"NDA PDF {name} still in use"
+    NDAAgreement._meta.get_field('pdf').storage.delete(name)
+    return f"Deleted NDA PDF {name}"
+
+
+def enqueue_nda_render(nda):
+    """Queue rendering of ``nda``'s PDF once the surrounding transaction commits"""
+    nda_id = nda.pk
+
+    def _enqueue():
+        try:
+            render_nda.delay(nda_id)
+        except Exception as e:
+            # The first download renders it instead
+            logger.warning(f"Could not queue NDA rendering for {nda_id}: {e}")
+
+    transaction.on_commit(_enqueue)
+
+
+@shared_task(bind=True, max_retries=settings.NDA_RENDER_MAX_RETRIES)
+def render_nda(self, nda_id):
+    """Render and store an NDA's PDF unless the stored one is already current"""
+    try:
+        nda = NDAAgreement.objects.get(pk=nda_id)
+    except NDAAgreement.DoesNotExist:
+        return f"NDA {nda_id} not found"
+
+    if nda_is_current(nda):
+        return f"NDA {nda_id} already rendered"
+
+    try:
+        store_nda_pdf(nda)
+    except Exception as e:
+        logger.error(f"NDA rendering failed for {nda_id}: {e}")
+        countdown = settings.NDA_RENDER_RETRY_BACKOFF * (2 ** self.request.retries)
+        raise self.retry(exc=e, countdown=countdown)
+
+    return f"NDA {nda_id} rendered"
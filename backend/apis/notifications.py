@@ -0,0 +1,75 @@
+from datetime import timedelta
+import logging
+
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .mailer import queue_email
+from .models import AdminNotification
+
+
+logger = logging.getLogger(__name__)
+
+# Events listed in full in one digest; the rest are only counted
+DIGEST_MAX_EVENTS = 100
+
+
+def record_admin_event(kind, subject, message):
+    """
+    Store an event for the next admin digest. With ADMIN_DIGEST_INTERVAL
+    set to 0 the event is mailed on its own straight away instead.
+    """
+    if not settings.ADMIN_DIGEST_INTERVAL:
+        queue_email(subject, message, [settings.EMAIL_HOST_USER])
+        return AdminNotification.objects.create(
+            kind=kind, subject=subject, message=message, digested_at=timezone.now()
+        )
+    return AdminNotification.objects.create(kind=kind, subject=subject, message=message)
+
+
+def build_digest(events):
+    """Subject and body for one digest email covering ``events``"""
+    labels = dict(AdminNotification.KIND_CHOICES)
+    counts = {}
+    for event in events:
+        counts[event.kind] = counts.get(event.kind, 0) + 1
+
+    subject = f"Agriconnect admin digest: {len(events)} new events"
+    lines = [f"{labels[kind]}: {count}" for kind, count in counts.items()]
+    lines.append("")
+
+    for event in events[:DIGEST_MAX_EVENTS]:
+        lines.append(f"--- {event.subject} ({timezone.localtime(event.created_at):%Y-%m-%d %H:%M})")
+        lines.append(event.message)
+        lines.append("")
+    if len(events) > DIGEST_MAX_EVENTS:
+        lines.append(f"... and {len(events) - DIGEST_MAX_EVENTS} more, see the admin notifications page.")
+
+    return subject, "\n".join(lines)
+
+
+@shared_task
+def send_admin_digest():
+    """Mail every event recorded since the last digest as one message"""
+    if not settings.EMAIL_HOST_USER:
+        return "EMAIL_HOST_USER not configured"
+
+    with transaction.atomic():
+        events = list(
+            AdminNotification.objects.select_for_update(skip_locked=True)
+            .filter(digested_at__isnull=True)
+            .order_by('created_at')
+        )
+        if events:
+            subject, body = build_digest(events)
+            queue_email(subject, body, [settings.EMAIL_HOST_USER])
+            AdminNotification.objects.filter(id__in=[event.id for event in events]).update(
+                digested_at=timezone.now()
+            )
+
+    AdminNotification.objects.filter(
+        digested_at__lt=timezone.now() - timedelta(days=settings.ADMIN_NOTIFICATION_RETENTION_DAYS)
+    ).delete()
+
+    return f"Digested {len(events)} admin events"
@@ -1,7 +1,289 @@
+import hashlib
+import json
+import logging
 from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.core.paginator import Paginator
+from django.db.models import Count, F, Sum
 from django.utils import timezone
 from datetime import timedelta
+from . import response_cache
 from .models import Opportunity
+from .search import search as search_queryset
+
+
+logger = logging.getLogger(__name__)
+
+FLUSH_BATCH_SIZE = 500
+
+STATS_CACHE_KEY = "opportunity:stats"
+
+# Ids of opportunities with buffered views waiting for flush_opportunity_views
+DIRTY_VIEWS_KEY = "opportunity:views:dirty"
+
+
+def build_opportunity_stats():
+    """
+    Compute the public opportunity statistics with one grouped query and
+    return them with an ETag derived from their content.
+    """
+    rows = {
+        row['type']: row
+        for row in Opportunity.objects.filter(is_active=True)
+        .values('type')
+        .annotate(count=Count('id'), views=Sum('views'), applicants=Sum('applicants'))
+        .order_by()
+    }
+
+    stats = {
+        'total_opportunities': sum(row['count'] for row in rows.values()),
+        'total_views': sum(row['views'] or 0 for row in rows.values()),
+        'total_applicants': sum(row['applicants'] or 0 for row in rows.values()),
+        # Keep the declared type order and only list types with opportunities
+        'opportunities_by_type': {
+            label: rows[key]['count']
+            for key, label in Opportunity.OPPORTUNITY_TYPES
+            if key in rows
+        },
+    }
+    digest = hashlib.md5(json.dumps(stats, sort_keys=True).encode()).hexdigest()
+    return {'stats': stats, 'etag': f'"{digest}"'}
+
+
+def get_opportunity_stats():
+    """Return the cached stats snapshot, rebuilding it if it was invalidated"""
+    snapshot = cache.get(STATS_CACHE_KEY)
+    if snapshot is None:
+        snapshot = build_opportunity_stats()
+        cache.set(STATS_CACHE_KEY, snapshot, settings.OPPORTUNITY_STATS_CACHE_TIMEOUT)
+    return snapshot
+
+
+def invalidate_opportunity_caches():
+    """Drop the stats snapshot and every cached list/detail response"""
+    cache.delete(STATS_CACHE_KEY)
+    response_cache.bump_cache_version('opportunity')
+
+
+def opportunity_changed(sender, **kwargs):
+    """post_save / post_delete hook for Opportunity"""
+    invalidate_opportunity_caches()
+
+
+def _int_param(params, name, default, minimum=1, maximum=None):
+    try:
+        value = int(params.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    value = max(minimum, value)
+    return min(value, maximum) if maximum else value
+
+
+def normalize_list_params(params):
+    """Reduce opportunity_list query parameters to a canonical cache key form"""
+    return {
+        'type': params.get('type', '').strip(),
+        'search': ' '.join(params.get('search', '').split()).lower(),
+        'page': _int_param(params, 'page', 1),
+        'page_size': _int_param(params, 'page_size', 20, maximum=100),
+    }
+
+
+def build_opportunity_list(type, search, page, page_size):
+    """One page of active opportunities as plain data"""
+    # serializers imports this module, so import it lazily
+    from .serializers import OpportunitySerializer
+
+    opportunities = Opportunity.objects.filter(is_active=True)
+
+    if type:
+        opportunities = opportunities.filter(type=type)
+
+    # Ranked full-text search, best matches first
+    if search:
+        opportunities = search_queryset(opportunities, search).order_by('-rank', '-posted')
+
+    paginator = Paginator(opportunities, page_size)
+    page_obj = paginator.get_page(page)
+
+    return {
+        'results': list(OpportunitySerializer(page_obj, many=True).data),
+        'count': paginator.count,
+        'next': page_obj.has_next(),
+        'previous': page_obj.has_previous(),
+        'current_page': page,
+        'total_pages': paginator.num_pages
+    }
+
+
+def build_opportunity_detail(pk):
+    """A single active opportunity as plain data, or None"""
+    from .serializers import OpportunitySerializer
+
+    opportunity = Opportunity.objects.filter(pk=pk, is_active=True).first()
+    if opportunity is None:
+        return None
+    return dict(OpportunitySerializer(opportunity).data)
+
+
+RESPONSE_BUILDERS = {
+    'list': build_opportunity_list,
+    'detail': build_opportunity_detail,
+}
+
+
+def cached_opportunity_response(name, params):
+    """
+    Read-through cache for the public opportunity endpoints. Fresh entries
+    are returned as is; stale ones are returned while a single background
+    task rebuilds them. Writes to Opportunity bump the key version.
+    """
+    key = response_cache.make_key('opportunity', name, params)
+    data, stale = response_cache.read(key)
+
+    if data is not None:
+        if stale and response_cache.claim_refresh(key):
+            try:
+                refresh_opportunity_response.delay(name, params)
+            except Exception as e:
+                response_cache.release_refresh(key)
+                logger.warning(f"Could not queue refresh of {key}: {e}")
+        return data
+
+    data = RESPONSE_BUILDERS[name](**params)
+    if data is not None:
+        response_cache.write(key, data)
+    return data
+
+
+@shared_task
+def refresh_opportunity_response(name, params):
+    """Rebuild a stale cached opportunity response"""
+    key = response_cache.make_key('opportunity', name, params)
+    try:
+        data = RESPONSE_BUILDERS[name](**params)
+        if data is not None:
+            response_cache.write(key, data)
+    finally:
+        response_cache.release_refresh(key)
+
+
+def _pending_views_key(opportunity_id):
+    return f"opportunity:views:pending:{opportunity_id}"
+
+
+def _redis():
+    backend = caches['default']
+    if isinstance(backend, RedisCache):
+        return backend._cache.get_client(write=True)
+    return None
+
+
+def _mark_views_dirty(ids):
+    """
+    Add ``ids`` to the dirty set. On Redis this is a native set; other
+    backends (local memory) keep a Python set under a single key.
+    """
+    client = _redis()
+    if client is not None:
+        client.sadd(cache.make_key(DIRTY_VIEWS_KEY), *ids)
+        return
+    cache.set(DIRTY_VIEWS_KEY, (cache.get(DIRTY_VIEWS_KEY) or set()) | set(ids), None)
+
+
+def _take_dirty_views(limit):
+    """Remove and return up to ``limit`` ids from the dirty set"""
+    client = _redis()
+    if client is not None:
+        return [int(pk) for pk in client.spop(cache.make_key(DIRTY_VIEWS_KEY), limit) or []]
+
+    dirty = cache.get(DIRTY_VIEWS_KEY) or set()
+    taken = sorted(dirty)[:limit]
+    if taken:
+        cache.set(DIRTY_VIEWS_KEY, dirty - set(taken), None)
+    return taken
+
+
+def _view_client(request):
+    """Identify the viewer: the user when logged in, otherwise IP and user agent"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    ip = forwarded.split(',')[0].strip() or request.META.get('REMOTE_ADDR', '')
+    agent = request.META.get('HTTP_USER_AGENT', '')
+    return "anon:" + hashlib.sha256(f"{ip}|{agent}".encode()).hexdigest()[:32]
+
+
+def record_opportunity_view(request, opportunity_id):
+    """
+    Count a view in the shared cache instead of writing the row. Repeat
+    views from the same client inside OPPORTUNITY_VIEW_DEDUP_WINDOW are
+    ignored. Buffered counts reach the database in flush_opportunity_views.
+    """
+    try:
+        seen_key = f"opportunity:viewed:{opportunity_id}:{_view_client(request)}"
+        if not cache.add(seen_key, 1, settings.OPPORTUNITY_VIEW_DEDUP_WINDOW):
+            return
+
+        key = _pending_views_key(opportunity_id)
+        cache.add(key, 0, None)
+        cache.incr(key)
+        _mark_views_dirty([opportunity_id])
+    except Exception as e:
+        # A view count is never worth failing the page over
+        logger.warning(f"Could not record view for opportunity {opportunity_id}: {e}")
+
+
+def pending_opportunity_views(opportunity_id):
+    """Views recorded for an opportunity that have not been flushed yet"""
+    try:
+        return cache.get(_pending_views_key(opportunity_id), 0)
+    except Exception:
+        return 0
+
+
+@shared_task
+def flush_opportunity_views():
+    """
+    Move buffered view counts into the database with ``F('views') + n``.
+    Only opportunities in the dirty set are read. Each counter is
+    decremented by exactly what was written, and only after the update
+    succeeds, so neither a failed update nor views arriving mid-flush are
+    lost; those ids go back into the dirty set for the next run.
+    """
+    flushed = 0
+    retry = []
+
+    while True:
+        batch = _take_dirty_views(FLUSH_BATCH_SIZE)
+        if not batch:
+            break
+        pending = cache.get_many([_pending_views_key(pk) for pk in batch])
+
+        for pk in batch:
+            count = pending.get(_pending_views_key(pk))
+            if not count:
+                continue
+            try:
+                Opportunity.objects.filter(pk=pk).update(views=F('views') + count)
+            except Exception as e:
+                logger.warning(f"Could not flush {count} views for opportunity {pk}: {e}")
+                retry.append(pk)
+                continue
+            if cache.decr(_pending_views_key(pk), count) > 0:
+                retry.append(pk)
+            flushed += count
+
+    if retry:
+        _mark_views_dirty(retry)
+    if flushed:
+        # Only the stats carry flushed totals; cached list/detail responses
+        # expire on their own TTL and detail already adds pending views
+        cache.delete(STATS_CACHE_KEY)
+    return f"Flushed {flushed} opportunity views"
+
 
 @shared_task
 def cleanup_expired_opportunities():
@@ -15,8 +297,9 @@ def cleanup_expired_opportunities():
         is_active=True
     )
     
-    count = expired_opportunities.count()
-    expired_opportunities.update(is_active=False)
+    count = expired_opportunities.update(is_active=False)
+    if count:
+        invalidate_opportunity_caches()
     
     return f"Deactivated {count} expired opportunities"
 
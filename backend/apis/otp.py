@@ -0,0 +1,219 @@
+from datetime import timedelta
+import hashlib
+import hmac
+import logging
+import secrets
+
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.db import connection
+from django.utils import timezone
+from .models import OTPToken
+
+
+logger = logging.getLogger(__name__)
+
+# verify_otp results
+OTP_VALID = 'valid'
+OTP_MISSING = 'missing'
+OTP_EXPIRED = 'expired'
+OTP_INVALID = 'invalid'
+OTP_LOCKED = 'locked'
+
+
+def generate_code():
+    """Generate a 5-digit OTP code"""
+    return str(secrets.randbelow(90000) + 10000)
+
+
+def hash_code(user_id, code):
+    """Keyed hash of ``code``, bound to the user so hashes can't be swapped between rows"""
+    message = f"{user_id}:{code}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def _verify_result(matched, attempts, expired):
+    """Map the state after a verification write to an OTP_* result"""
+    if expired:
+        return OTP_EXPIRED
+    if matched:
+        # A right code after the lockout doesn't count
+        return OTP_VALID if attempts <= settings.OTP_MAX_ATTEMPTS else OTP_LOCKED
+    return OTP_LOCKED if attempts >= settings.OTP_MAX_ATTEMPTS else OTP_INVALID
+
+
+class DatabaseOTPStore:
+    """One OTPToken row per user, replaced in place on every issue"""
+
+    def issue(self, user_id, code, expires_at):
+        # INSERT ... ON CONFLICT (user_id) DO UPDATE: one statement whether or not a row exists
+        OTPToken.objects.bulk_create(
+            [OTPToken(
+                user_id=user_id,
+                otp_hash=hash_code(user_id, code),
+                attempts=0,
+                otp_created_at=timezone.now(),
+                otp_expires_at=expires_at,
+            )],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['otp_hash', 'attempts', 'otp_created_at', 'otp_expires_at'],
+        )
+
+    def _verify_sql(self):
+        opts = OTPToken._meta
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        user, otp_hash, attempts, expires = (
+            qn(opts.get_field(name).column) for name in ('user', 'otp_hash', 'attempts', 'otp_expires_at')
+        )
+        # Every guess counts as an attempt; a matching one also burns the
+        # hash, so a code is consumed once however many requests race. The
+        # hashes are keyed HMACs, so comparing them in SQL leaks nothing useful
+        return (
+            f"UPDATE {table} SET {attempts} = {attempts} + 1, "
+            f"{otp_hash} = CASE WHEN {otp_hash} = %s THEN '' ELSE {otp_hash} END "
+            f"WHERE {user} = %s AND {otp_hash} <> '' "
+            f"RETURNING {otp_hash}, {attempts}, {expires} < %s"
+        )
+
+    def verify(self, user_id, code):
+        # One UPDATE ... RETURNING: the check and the write are a single round trip
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        with connection.cursor() as cursor:
+            cursor.execute(self._verify_sql(), [hash_code(user_id, str(code)), user_id, now])
+            row = cursor.fetchone()
+
+        if row is None:
+            # No code, or it was already used or burnt
+            return OTP_MISSING
+        otp_hash, attempts, expired = row
+        return _verify_result(otp_hash == '', attempts, bool(expired))
+
+    def purge_expired(self):
+        deleted, _ = OTPToken.objects.filter(otp_expires_at__lt=timezone.now()).delete()
+        return deleted
+
+
+# KEYS[1]: the OTP hash; ARGV: candidate hash, now (epoch seconds), max attempts
+_REDIS_VERIFY_SCRIPT = """
+local otp = redis.call('HMGET', KEYS[1], 'hash', 'attempts', 'expires_at')
+if not otp[1] then return 'missing' end
+if tonumber(otp[3]) <= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+    return 'expired'
+end
+if otp[1] == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 'valid'
+end
+if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= tonumber(ARGV[3]) then
+    redis.call('DEL', KEYS[1])
+    return 'locked'
+end
+return 'invalid'
+"""
+
+
+class CacheOTPStore:
+    """
+    OTPs kept in the shared cache, expiring with their TTL. On Redis each
+    OTP is a hash checked and updated by one Lua script, so verification
+    is a single atomic round trip; other backends (local memory) fall back
+    to plain cache reads and writes.
+    """
+
+    def _key(self, user_id):
+        return f"otp:{user_id}"
+
+    def _redis(self):
+        backend = caches['default']
+        if isinstance(backend, RedisCache):
+            return backend._cache.get_client(write=True)
+        return None
+
+    def issue(self, user_id, code, expires_at):
+        entry = {'hash': hash_code(user_id, code), 'attempts': 0, 'expires_at': expires_at.timestamp()}
+        client = self._redis()
+        if client is None:
+            cache.set(self._key(user_id), entry, settings.OTP_TTL)
+            return
+
+        key = cache.make_key(self._key(user_id))
+        pipeline = client.pipeline()
+        pipeline.delete(key)
+        pipeline.hset(key, mapping=entry)
+        pipeline.expire(key, settings.OTP_TTL)
+        pipeline.execute()
+
+    def verify(self, user_id, code):
+        candidate = hash_code(user_id, str(code))
+        client = self._redis()
+        if client is not None:
+            result = client.eval(
+                _REDIS_VERIFY_SCRIPT, 1, cache.make_key(self._key(user_id)),
+                candidate, timezone.now().timestamp(), settings.OTP_MAX_ATTEMPTS,
+            )
+            return result.decode() if isinstance(result, bytes) else result
+
+        key = self._key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            return OTP_MISSING
+
+        remaining = entry['expires_at'] - timezone.now().timestamp()
+        if remaining <= 0:
+            cache.delete(key)
+            return OTP_EXPIRED
+
+        if hmac.compare_digest(candidate, entry['hash']):
+            cache.delete(key)
+            return OTP_VALID
+
+        entry['attempts'] += 1
+        if entry['attempts'] >= settings.OTP_MAX_ATTEMPTS:
+            cache.delete(key)
+            return OTP_LOCKED
+
+        cache.set(key, entry, remaining)
+        return OTP_INVALID
+
+    def purge_expired(self):
+        # Entries expire on their own
+        return 0
+
+
+OTP_STORES = {
+    'database': DatabaseOTPStore,
+    'cache': CacheOTPStore,
+}
+
+
+def get_otp_store():
+    return OTP_STORES[settings.OTP_BACKEND]()
+
+
+def issue_otp(user):
+    """Create (or replace) ``user``'s login OTP and return the plain code for the email"""
+    code = generate_code()
+    expires_at = timezone.now() + timedelta(seconds=settings.OTP_TTL)
+    get_otp_store().issue(user.pk, code, expires_at)
+    return code
+
+
+def verify_otp(user, code):
+    """
+    Check ``code`` against ``user``'s OTP. A valid code is consumed; an
+    invalid one counts as an attempt and the OTP is dropped after
+    OTP_MAX_ATTEMPTS. Returns one of the OTP_* results.
+    """
+    return get_otp_store().verify(user.pk, code)
+
+
+@shared_task
+def purge_expired_otps():
+    """Delete expired OTPs that were never verified"""
+    deleted = get_otp_store().purge_expired()
+    return f"Purged {deleted} expired OTPs"
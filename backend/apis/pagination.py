@@ -0,0 +1,133 @@
+import base64
+import binascii
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination:
+    """
+    Cursor pagination over ``(created_at, id)`` in descending order.
+
+    Each page is fetched with a ``WHERE (created_at, id) < cursor`` seek
+    instead of an OFFSET, so later pages cost the same as the first one.
+    Responses look like ``{"results": [...], "next": url, "previous": url}``.
+    """
+    ordering_field = 'created_at'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def format_value(self, value):
+        return value.isoformat()
+
+    def parse_value(self, raw):
+        return datetime.fromisoformat(raw)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, settings.REST_FRAMEWORK['PAGE_SIZE']))
+        except (TypeError, ValueError):
+            page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, obj, reverse=False):
+        value = self.format_value(getattr(obj, self.ordering_field))
+        raw = f"{'r' if reverse else 'f'}|{value}|{obj.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            direction, value, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split('|', 2)
+            return direction == 'r', self.parse_value(value), pk
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        field = self.ordering_field
+        reverse = False
+        if cursor:
+            reverse, value, pk = cursor
+            if reverse:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk})
+                ).order_by(field, 'pk')
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+                ).order_by(f'-{field}', '-pk')
+        else:
+            queryset = queryset.order_by(f'-{field}', '-pk')
+
+        # Fetch one extra row to learn whether another page exists
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[0], reverse=True))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'results': data,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        })
+
+
+class RankKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination over a search ``rank`` annotation, best match first.
+    The rank is a fixed-precision decimal (see apis.search.RANK_FIELD), so
+    the cursor value matches the row it came from exactly.
+    """
+    ordering_field = 'rank'
+
+    def format_value(self, value):
+        return str(value)
+
+    def parse_value(self, raw):
+        try:
+            return Decimal(raw)
+        except InvalidOperation:
+            raise ValueError(f"Invalid rank {raw!r}")
+
+
+def paginate_projects(request, queryset, serializer_class, pagination_class=KeysetPagination):
+    """Serialize one keyset page of ``queryset`` as a paginated response"""
+    paginator = pagination_class()
+    page = paginator.paginate_queryset(queryset, request)
+    serializer = serializer_class(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
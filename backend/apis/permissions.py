@@ -1,6 +1,7 @@
 # permissions.py
 from rest_framework import permissions
 from django.contrib.auth import get_user_model
+from .authz import FARMER_ROLES, get_auth_context
 
 import logging
 
@@ -16,43 +17,33 @@ class IsVerifiedFarmer(permissions.BasePermission):
     message = "Only verified farmers can perform create a project."
     
     def has_permission(self, request, view):
-        logger.info(f"IsVerifiedFarmer check for user: {request.user}")
-        logger.info(f"User authenticated: {request.user.is_authenticated}")
-        
         if not request.user.is_authenticated:
             self.message = "Authentication required."
-            logger.warning("User not authenticated")
             return False
         
+        context = get_auth_context(request)
+
         # Check if user has profile
-        if not hasattr(request.user, 'profile'):
+        if not context.has_profile:
             self.message = "User profile not found. Please complete your profile first."
-            logger.warning(f"User {request.user.id} has no profile")
+            logger.warning(f"User {context.user_id} has no profile")
             return False
         
-        logger.info(f"User role: {request.user.profile.role}")
-        
         # Check if user is a farmer (or allowed roles)
-        allowed_roles = ['Farmer', 'Student', 'Entrepreneur']
-        if request.user.profile.role not in allowed_roles:
-            self.message = f"Only users with roles {', '.join(allowed_roles)} can create projects."
-            logger.warning(f"User {request.user.id} has invalid role: {request.user.profile.role}")
+        if context.role not in FARMER_ROLES:
+            self.message = f"Only users with roles {', '.join(FARMER_ROLES)} can create projects."
+            logger.warning(f"User {context.user_id} has invalid role: {context.role}")
             return False
         
         # Check if KYC exists and is verified
-        if not hasattr(request.user, 'farmer_kyc'):
+        if not context.has_farmer_kyc:
             self.message = "KYC verification required. Please complete your KYC submission first."
-            logger.warning(f"User {request.user.id} has no farmer_kyc")
             return False
         
-        logger.info(f"User KYC verified: {request.user.farmer_kyc.is_verified}")
-        
-        if not request.user.farmer_kyc.is_verified:
+        if not context.farmer_kyc_verified:
             self.message = "Your KYC is not yet verified. Please wait for admin approval."
-            logger.warning(f"User {request.user.id} KYC not verified")
             return False
         
-        logger.info(f"User {request.user.id} passed all permission checks")
         return True
     
     
@@ -67,22 +58,24 @@ class IsVerifiedInvestor(permissions.BasePermission):
             self.message = "Authentication required."
             return False
         
+        context = get_auth_context(request)
+
         # Check if user has profile
-        if not hasattr(request.user, 'profile'):
+        if not context.has_profile:
             self.message = "User profile not found. Please complete your profile first."
             return False
         
         # Check if user is an investor
-        if request.user.profile.role != 'Investor':
+        if context.role != 'Investor':
             self.message = "Only investors can view project details."
             return False
         
         # Check if KYC exists and is verified
-        if not hasattr(request.user, 'investor_kyc'):
+        if not context.has_investor_kyc:
             self.message = "KYC verification required. Please complete your KYC submission first."
             return False
         
-        if not request.user.investor_kyc.is_verified:
+        if not context.investor_kyc_verified:
             self.message = "Your KYC is not yet verified. Please wait for admin approval."
             return False
         
@@ -101,32 +94,32 @@ class CanViewProject(permissions.BasePermission):
             self.message = "Authentication required."
             return False
         
-        if not hasattr(request.user, 'profile'):
+        context = get_auth_context(request)
+
+        if not context.has_profile:
             self.message = "User profile not found. Please complete your profile first."
             return False
         
-        user_role = request.user.profile.role
-
         # Investors can view projects if verified
-        if user_role == 'Investor':
-            if not hasattr(request.user, 'investor_kyc'):
+        if context.role == 'Investor':
+            if not context.has_investor_kyc:
                 self.message = "KYC verification required. Please complete your KYC submission first."
                 return False
             
-            if not request.user.investor_kyc.is_verified:
+            if not context.investor_kyc_verified:
                 self.message = "Your KYC is not yet verified. Please wait for admin approval."
                 return False
             
             return True
 
-        elif user_role in ['Farmer', 'Student', 'Entrepreneur']:
+        elif context.role in FARMER_ROLES:
             if request.method in permissions.SAFE_METHODS:
-                if view.action in ['retrieve', 'download_proposal']:
-                    if not hasattr(request.user, 'farmer_kyc'):
+                if getattr(view, 'action', None) in ['retrieve', 'download_proposal']:
+                    if not context.has_farmer_kyc:
                         self.message = "KYC verification required to view detailed project information."
                         return False
                     
-                    if not request.user.farmer_kyc.is_verified:
+                    if not context.farmer_kyc_verified:
                         self.message = "Your KYC is not yet verified. Please wait for admin approval."
                         return False
                 
@@ -135,7 +128,7 @@ class CanViewProject(permissions.BasePermission):
             return False
 
         # Admin users can view all projects
-        elif request.user.is_staff or request.user.is_superuser:
+        elif context.is_admin:
             return True
         
         self.message = "Invalid user role for this action."
@@ -149,19 +142,18 @@ class CanViewProject(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
 
+        context = get_auth_context(request)
+
         # Admins can view everything
-        if request.user.is_staff or request.user.is_superuser:
+        if context.is_admin:
             return True
 
-        user_role = request.user.profile.role
-
         # Farmers can only view their own projects
-        if user_role in ['Farmer', 'Student', 'Entrepreneur']:
-            return obj.farmer == request.user
+        if context.role in FARMER_ROLES:
+            return obj.farmer_id == context.user_id
 
-        if user_role == 'Investor':
-            return (hasattr(request.user, 'investor_kyc') and 
-                    request.user.investor_kyc.is_verified)
+        if context.role == 'Investor':
+            return context.investor_kyc_verified
 
         return False
 
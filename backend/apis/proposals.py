@@ -0,0 +1,129 @@
+from celery import shared_task
+from celery.signals import worker_process_init
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from backend.storage_backends import MediaStorage
+from .models import Project
+from .watermark import warm_watermark_cache, watermark_pdf
+import logging
+import tempfile
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+@worker_process_init.connect
+def prepare_watermark_stamps(**kwargs):
+    """Build the watermark stamps once when a worker process starts"""
+    try:
+        warm_watermark_cache()
+    except Exception as e:
+        logger.warning(f"Could not prebuild watermark stamps: {e}")
+
+
+def enqueue_watermark(project):
+    """
+    Queue the watermarking job for ``project`` once the surrounding
+    transaction commits. A broker outage leaves the project PENDING so
+    ``requeue_stalled_watermarks`` can pick it up later.
+    """
+    project_id = str(project.id)
+
+    def _enqueue():
+        try:
+            watermark_project_proposal.delay(project_id)
+        except Exception as e:
+            logger.warning(f"Could not queue watermarking for project {project_id}: {e}")
+
+    transaction.on_commit(_enqueue)
+
+
+@shared_task(bind=True, max_retries=settings.WATERMARK_MAX_RETRIES)
+def watermark_project_proposal(self, project_id):
+    """
+    Watermark the original proposal of a project and store the result
+    in MediaStorage, tracking progress in ``Project.watermark_status``.
+    """
+    try:
+        project = Project.objects.get(id=project_id)
+    except Project.DoesNotExist:
+        return f"Project {project_id} not found"
+
+    if project.watermark_status == Project.WATERMARK_READY:
+        return f"Project {project_id} already watermarked"
+
+    Project.objects.filter(id=project_id).update(
+        watermark_status=Project.WATERMARK_PROCESSING,
+        # Counted in SQL so concurrent runs and requeues don't lose increments
+        watermark_attempts=F('watermark_attempts') + 1,
+        watermark_error='',
+        updated_at=timezone.now(),
+    )
+
+    try:
+        # Spill to disk past WATERMARK_SPOOL_MAX_MEMORY; MediaStorage then
+        # uploads from the file in multipart chunks (AWS_S3_TRANSFER_CONFIG)
+        with project.original_proposal.open('rb') as source, \
+                tempfile.SpooledTemporaryFile(max_size=settings.WATERMARK_SPOOL_MAX_MEMORY) as output:
+            watermark_pdf(source, output)
+            output.seek(0)
+
+            media_storage = MediaStorage()
+            watermarked_name = f"proposals/watermarked/watermarked_{uuid.uuid4()}.pdf"
+            watermarked_name = media_storage.save(watermarked_name, File(output, name=watermarked_name))
+
+    except Exception as e:
+        logger.error(f"Watermarking failed for project {project_id}: {e}")
+
+        if self.request.retries < self.max_retries:
+            Project.objects.filter(id=project_id).update(
+                watermark_status=Project.WATERMARK_PENDING,
+                watermark_error=str(e),
+                updated_at=timezone.now(),
+            )
+            countdown = settings.WATERMARK_RETRY_BACKOFF * (2 ** self.request.retries)
+            raise self.retry(exc=e, countdown=countdown)
+
+        Project.objects.filter(id=project_id).update(
+            watermark_status=Project.WATERMARK_FAILED,
+            watermark_error=str(e),
+            updated_at=timezone.now(),
+        )
+        return f"Watermarking failed for project {project_id}"
+
+    Project.objects.filter(id=project_id).update(
+        watermarked_proposal=watermarked_name,
+        watermark_status=Project.WATERMARK_READY,
+        watermark_error='',
+        updated_at=timezone.now(),
+    )
+    return f"Watermarked proposal stored for project {project_id}"
+
+
+@shared_task
+def requeue_stalled_watermarks():
+    """
+    Re-queue projects whose watermarking job never started or whose
+    worker died mid-way.
+    """
+    cutoff = timezone.now() - settings.WATERMARK_STALL_TIMEOUT
+
+    stalled_ids = list(
+        Project.objects.filter(
+            watermark_status__in=[Project.WATERMARK_PENDING, Project.WATERMARK_PROCESSING],
+            updated_at__lt=cutoff,
+        ).values_list('id', flat=True)
+    )
+
+    for project_id in stalled_ids:
+        Project.objects.filter(id=project_id).update(
+            watermark_status=Project.WATERMARK_PENDING,
+            watermark_attempts=0,
+            updated_at=timezone.now(),
+        )
+        watermark_project_proposal.delay(str(project_id))
+
+    return f"Re-queued {len(stalled_ids)} stalled watermark jobs"
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+# How long a background refresh may hold the rebuild lock for a key
+REFRESH_LOCK_TIMEOUT = 30
+
+
+def _version_key(namespace):
+    return f"{namespace}:response:version"
+
+
+def get_cache_version(namespace):
+    """
+    Current version of ``namespace``'s cached responses. A missing version
+    starts from the clock, so it never repeats one that was evicted.
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_cache_version(namespace):
+    """Make every cached response in ``namespace`` unreachable"""
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.add(_version_key(namespace), int(time.time() * 1000), None)
+
+
+def make_key(namespace, name, params):
+    """Cache key for one endpoint and its normalized parameters"""
+    digest = hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+    return f"{namespace}:response:v{get_cache_version(namespace)}:{name}:{digest}"
+
+
+def read(key):
+    """Return ``(data, is_stale)``, or ``(None, False)`` on a miss"""
+    entry = cache.get(key)
+    if entry is None:
+        return None, False
+    return entry['data'], entry['fresh_until'] <= time.time()
+
+
+def write(key, data):
+    """
+    Store ``data`` as fresh for RESPONSE_CACHE_TTL seconds; it may then be
+    served stale for RESPONSE_CACHE_STALE_TTL more while it is rebuilt.
+    """
+    entry = {'data': data, 'fresh_until': time.time() + settings.RESPONSE_CACHE_TTL}
+    cache.set(key, entry, settings.RESPONSE_CACHE_TTL + settings.RESPONSE_CACHE_STALE_TTL)
+
+
+def claim_refresh(key):
+    """True for the one caller that should rebuild a stale ``key``"""
+    return cache.add(f"{key}:refreshing", 1, REFRESH_LOCK_TIMEOUT)
+
+
+def release_refresh(key):
+    cache.delete(f"{key}:refreshing")
@@ -0,0 +1,90 @@
+from decimal import Decimal
+import logging
+
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import DecimalField, F, Q, Value
+from django.db.models.functions import Cast
+
+from .models import Opportunity, Project
+
+
+logger = logging.getLogger(__name__)
+
+# Weighted document for each searchable model: A counts most, D least
+SEARCH_FIELDS = {
+    Opportunity: [('title', 'A'), ('organization', 'B'), ('theme', 'B'),
+                  ('description', 'C'), ('location', 'C'), ('full_description', 'D')],
+    Project: [('title', 'A'), ('name', 'B'), ('brief', 'B'),
+              ('description', 'C'), ('benefits', 'D')],
+}
+
+# ``rank`` is rounded to a fixed-precision numeric in SQL, so a cursor
+# holding it compares exactly (a float4 doesn't survive a decimal literal)
+RANK_FIELD = DecimalField(max_digits=12, decimal_places=6)
+
+
+def search_enabled():
+    """Full-text search needs PostgreSQL; other backends fall back to icontains"""
+    return connection.vendor == 'postgresql'
+
+
+def build_search_vector(model):
+    fields = SEARCH_FIELDS[model]
+    vector = SearchVector(fields[0][0], weight=fields[0][1], config='english')
+    for field, weight in fields[1:]:
+        vector += SearchVector(field, weight=weight, config='english')
+    return vector
+
+
+def update_search_vector(instance):
+    """Recompute the stored search_vector of a single row"""
+    model = type(instance)
+    model.objects.filter(pk=instance.pk).update(search_vector=build_search_vector(model))
+
+
+def rebuild_search_vectors(model):
+    """Recompute search_vector for every row of ``model``; returns the row count"""
+    return model.objects.update(search_vector=build_search_vector(model))
+
+
+def refresh_search_vector(sender, instance, update_fields=None, raw=False, **kwargs):
+    """post_save hook: keep search_vector in step with the indexed text fields"""
+    if raw or not search_enabled():
+        return
+    searched = {field for field, _ in SEARCH_FIELDS[sender]}
+    if update_fields is not None and not searched.intersection(update_fields):
+        return
+    update_search_vector(instance)
+
+
+def create_search_extensions(sender, using, **kwargs):
+    """pre_migrate hook: the trigram indexes need pg_trgm before migrations run"""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+def search(queryset, text):
+    """
+    Filter ``queryset`` to rows matching ``text`` and annotate each with a
+    ``rank``. Matches come from the weighted tsvector, or from trigram
+    similarity on the title so misspelt queries still find something.
+    The caller decides how to order on ``rank``.
+    """
+    model = queryset.model
+    if not search_enabled():
+        lookup = Q()
+        for field, _ in SEARCH_FIELDS[model]:
+            lookup |= Q(**{f'{field}__icontains': text})
+        return queryset.filter(lookup).annotate(rank=Value(Decimal(0), output_field=RANK_FIELD))
+
+    query = SearchQuery(text, search_type='websearch', config='english')
+    return queryset.annotate(
+        rank=Cast(SearchRank(F('search_vector'), query) + TrigramSimilarity('title', text), RANK_FIELD),
+    ).filter(
+        Q(search_vector=query) | Q(title__trigram_similar=text)
+    )
@@ -1,23 +1,51 @@
 from datetime import date
+import logging
 from django.conf import settings
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db import models, transaction
 from django.utils import timezone
-from .models import InvestorKYC, FarmerKYC, KYCVerificationLog, NDAAgreement, Opportunity, Project, UserProfile
+from .models import AdminNotification, DirectUpload, InvestorKYC, FarmerKYC, KYCVerificationLog, NDAAgreement, Opportunity, Project, UserProfile
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import issue_tokens, stamp_claims
+from .authz import get_auth_context
 from .opportunities import schedule_opportunity_cleanup
-import os
-from django.core.files.base import ContentFile
-from backend.storage_backends import MediaStorage
-from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.colors import gray
-from PyPDF2 import PdfReader, PdfWriter
-import uuid
+from .proposals import enqueue_watermark
+from .signed_urls import get_signed_url, get_signed_urls
+from .uploads import MAX_PARTS, UploadError, claim_upload
+
+
+logger = logging.getLogger(__name__)
+
+
+class SignedURLMixin:
+    """Represent a stored file by a short-lived presigned URL, cached per object"""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        url, _ = get_signed_url(value.storage, value.name)
+        return url
+
+
+class SignedFileField(SignedURLMixin, serializers.FileField):
+    pass
+
+
+class SignedImageField(SignedURLMixin, serializers.ImageField):
+    pass
+
+
+# ModelSerializer.serializer_field_mapping for serializers exposing private files
+SIGNED_FILE_FIELD_MAPPING = {
+    **serializers.ModelSerializer.serializer_field_mapping,
+    models.FileField: SignedFileField,
+    models.ImageField: SignedImageField,
+}
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -36,7 +64,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 class UserSerializer(serializers.ModelSerializer):
     """Basic User serializer for responses"""
-    profile = UserProfileSerializer(source='userprofile', read_only=True)
+    profile = UserProfileSerializer(read_only=True)
     
     class Meta:
         model = User
@@ -84,38 +112,28 @@ class UserSignUpSerializer(serializers.ModelSerializer):
         return attrs
 
     def create(self, validated_data):
-        """Create user and profile"""
-        phone_number = validated_data.pop('phone_number', '')
-        role = validated_data.pop('role')
-        organization = validated_data.pop('organization', '')
-        investor_type = validated_data.pop('investor_type', '')
+        """Create the user and their profile in one transaction; nothing else writes either row"""
+        profile_data = {
+            'phone_number': validated_data.pop('phone_number', ''),
+            'role': validated_data.pop('role'),
+            'organization': validated_data.pop('organization', ''),
+            'investor_type': validated_data.pop('investor_type', ''),
+        }
         validated_data.pop('confirm_password')
 
         email = validated_data['email']
 
-        # Create user with email as username
-        user = User.objects.create_user(
-            username=email,
-            email=email,
-            first_name=validated_data['first_name'],
-            last_name=validated_data['last_name'],
-            password=validated_data['password']
-        )
-
-        # Create user profile
-        try:
-            profile = UserProfile.objects.create(
-                user=user,
-                phone_number=phone_number,
-                role=role,
-                organization=organization,
-                investor_type=investor_type
+        with transaction.atomic():
+            # Create user with email as username
+            user = User.objects.create_user(
+                username=email,
+                email=email,
+                first_name=validated_data['first_name'],
+                last_name=validated_data['last_name'],
+                password=validated_data['password']
             )
-            print(f"Created profile for user {user.email}: {profile}")
-        except Exception as e:
-            # If profile creation fails, delete the user to maintain consistency
-            user.delete()
-            raise serializers.ValidationError(f"Failed to create user profile: {str(e)}")
+            # Also caches user.profile, so serializing the user needs no query
+            UserProfile.objects.create(user=user, **profile_data)
 
         return user
 
@@ -157,7 +175,7 @@ class PasswordResetSerializer(serializers.Serializer):
 
 class UserUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating user information (role cannot be changed)"""
-    profile = UserProfileSerializer(source='userprofile', required=False)
+    profile = UserProfileSerializer(required=False)
     
     class Meta:
         model = User
@@ -174,7 +192,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         """Update user and profile (excluding role)"""
-        profile_data = validated_data.pop('userprofile', None)
+        profile_data = validated_data.pop('profile', None)
         
         # Update user fields
         for attr, value in validated_data.items():
@@ -183,7 +201,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         
         if profile_data:
             try:
-                profile = instance.userprofile
+                profile = instance.profile
                 # Don't allow role changes through this serializer
                 profile_data.pop('role', None)
                 
@@ -203,14 +221,62 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         return instance
 
 
-class InvestorKYCSerializer(serializers.ModelSerializer):
+class DirectUploadMixin:
+    """
+    Lets a serializer accept the id of a completed direct upload
+    (``<field>_upload``) in place of a multipart file for ``<field>``.
+    """
+    # serializer file field -> DirectUpload purpose
+    direct_upload_fields = {}
+
+    def validate_direct_uploads(self, attrs):
+        errors = {}
+        for field in self.direct_upload_fields:
+            upload_field = f"{field}_upload"
+            if attrs.get(field) and attrs.get(upload_field):
+                errors[upload_field] = f"Provide either {field} or {upload_field}, not both."
+            elif not attrs.get(field) and not attrs.get(upload_field):
+                errors[field] = "This field is required."
+            elif attrs.get(upload_field) and not DirectUpload.objects.filter(
+                id=attrs[upload_field],
+                user=self.context['request'].user,
+                purpose=self.direct_upload_fields[field],
+                status='completed',
+            ).exists():
+                errors[upload_field] = "Upload not found or not completed."
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def attach_direct_uploads(self, validated_data, user):
+        """Swap upload ids for the stored object names (call inside a transaction)"""
+        for field, purpose in self.direct_upload_fields.items():
+            upload_id = validated_data.pop(f"{field}_upload", None)
+            if upload_id:
+                try:
+                    validated_data[field] = claim_upload(user, upload_id, purpose)
+                except UploadError as e:
+                    raise serializers.ValidationError({f"{field}_upload": str(e)})
+        return validated_data
+
+
+class InvestorKYCSerializer(DirectUploadMixin, serializers.ModelSerializer):
     """Serializer for Investor KYC data - Read-only after creation"""
+    serializer_field_mapping = SIGNED_FILE_FIELD_MAPPING
+    id_document_upload = serializers.UUIDField(write_only=True, required=False)
+    profile_picture_upload = serializers.UUIDField(write_only=True, required=False)
+
+    direct_upload_fields = {
+        'id_document': 'id_document',
+        'profile_picture': 'profile_picture',
+    }
 
     class Meta:
         model = InvestorKYC
         fields = [
             'id', 'full_name', 'email', 'date_of_birth', 'nationality', 'phone_number',
             'id_type', 'id_number', 'id_document', 'profile_picture',
+            'id_document_upload', 'profile_picture_upload',
             'address', 'occupation', 'income_source', 'annual_income', 'purpose',
             'is_verified', 'verification_date', 'created_at', 'updated_at'
         ]
@@ -223,8 +289,8 @@ class InvestorKYCSerializer(serializers.ModelSerializer):
             'phone_number': {'required': True},
             'id_type': {'required': True},
             'id_number': {'required': True},
-            'id_document': {'required': True},
-            'profile_picture': {'required': True},
+            'id_document': {'required': False},
+            'profile_picture': {'required': False},
             'address': {'required': True},
             'occupation': {'required': True},
             'income_source': {'required': True},
@@ -238,6 +304,10 @@ class InvestorKYCSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Annual income must be greater than 0")
         return value
 
+    def validate(self, attrs):
+        """Require each document as either a file or a completed direct upload"""
+        return self.validate_direct_uploads(attrs)
+
     def update(self, instance, validated_data):
         """Prevent updates to KYC data"""
         raise serializers.ValidationError("KYC data cannot be updated once submitted. Please contact support if changes are needed.")
@@ -254,14 +324,25 @@ class InvestorKYCSerializer(serializers.ModelSerializer):
         if not validated_data.get('phone_number') and hasattr(user, 'profile'):
             validated_data['phone_number'] = user.profile.phone_number or ''
 
-        # Log KYC submission
-        KYCVerificationLog.objects.create(user=user, action='submitted')
+        with transaction.atomic():
+            self.attach_direct_uploads(validated_data, user)
+
+            # Log KYC submission
+            KYCVerificationLog.objects.create(user=user, action='submitted')
 
-        return super().create(validated_data)
+            return super().create(validated_data)
 
 
-class FarmerKYCSerializer(serializers.ModelSerializer):
+class FarmerKYCSerializer(DirectUploadMixin, serializers.ModelSerializer):
     """Serializer for Farmer KYC data - Read-only after creation"""
+    serializer_field_mapping = SIGNED_FILE_FIELD_MAPPING
+    id_document_upload = serializers.UUIDField(write_only=True, required=False)
+    profile_picture_upload = serializers.UUIDField(write_only=True, required=False)
+
+    direct_upload_fields = {
+        'id_document': 'id_document',
+        'profile_picture': 'profile_picture',
+    }
 
     class Meta:
         model = FarmerKYC
@@ -269,6 +350,7 @@ class FarmerKYCSerializer(serializers.ModelSerializer):
             'id', 'full_name', 'email', 'phone_number', 'role',
             'date_of_birth', 'nationality', 'background', 'address',
             'id_type', 'id_number', 'id_document', 'profile_picture',
+            'id_document_upload', 'profile_picture_upload',
             'is_verified', 'verification_date', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'is_verified', 'verification_date', 'created_at', 'updated_at']
@@ -283,8 +365,8 @@ class FarmerKYCSerializer(serializers.ModelSerializer):
             'address': {'required': True},
             'id_type': {'required': True},
             'id_number': {'required': True},
-            'id_document': {'required': True},
-            'profile_picture': {'required': True},
+            'id_document': {'required': False},
+            'profile_picture': {'required': False},
         }
 
     def validate_date_of_birth(self, value):
@@ -333,6 +415,10 @@ class FarmerKYCSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError("Profile picture must be a JPG, JPEG, or PNG file.")
         return value
 
+    def validate(self, attrs):
+        """Require each document as either a file or a completed direct upload"""
+        return self.validate_direct_uploads(attrs)
+
     def update(self, instance, validated_data):
         """Prevent updates to KYC data"""
         raise serializers.ValidationError("KYC data cannot be updated once submitted. Please contact support if changes are needed.")
@@ -357,12 +443,15 @@ class FarmerKYCSerializer(serializers.ModelSerializer):
             validated_data['role'] = user.profile.role
 
         # Create and log KYC
-        instance = super().create(validated_data)
+        with transaction.atomic():
+            self.attach_direct_uploads(validated_data, user)
+            instance = super().create(validated_data)
 
         try:
             KYCVerificationLog.objects.create(user=user, action='submitted')
-        except Exception as e:
-            print(f"KYC log failed: {str(e)}")
+        except Exception:
+            # The KYC itself is saved; a missing log entry shouldn't fail the submission
+            logger.exception(f"Could not log KYC submission for user {user.pk}")
 
         return instance
 
@@ -390,6 +479,77 @@ class KYCAdminUpdateSerializer(serializers.Serializer):
     """Serializer for admin KYC updates"""
     action = serializers.ChoiceField(choices=['approved', 'rejected', 'pending'])
     allow_changes = serializers.BooleanField(default=False, help_text="Allow one-time changes to KYC data")
+
+
+class KYCBulkDecisionSerializer(KYCAdminUpdateSerializer):
+    """One user's decision in a bulk KYC verification"""
+    user_id = serializers.IntegerField()
+
+
+class KYCBulkVerifySerializer(serializers.Serializer):
+    """Serializer for bulk admin KYC verification"""
+    decisions = KYCBulkDecisionSerializer(many=True, allow_empty=False, max_length=500)
+
+    def validate_decisions(self, value):
+        user_ids = [decision['user_id'] for decision in value]
+        if len(user_ids) != len(set(user_ids)):
+            raise serializers.ValidationError("Each user can only appear once.")
+        return value
+
+
+class KYCReviewMixin(serializers.Serializer):
+    """
+    Admin review-queue representation. File URLs come pre-signed in
+    ``context['file_urls']`` so a page is signed in one batch.
+    """
+    kyc_type = serializers.SerializerMethodField()
+    user_info = serializers.SerializerMethodField()
+    id_document = serializers.SerializerMethodField()
+    profile_picture = serializers.SerializerMethodField()
+
+    def get_kyc_type(self, obj):
+        return self.context['kyc_type']
+
+    def get_user_info(self, obj):
+        return {
+            'id': obj.user.id,
+            'username': obj.user.username,
+            'email': obj.user.email
+        }
+
+    def _file_url(self, field):
+        signed = self.context['file_urls'].get(field.name) if field else None
+        return signed[0] if signed else None
+
+    def get_id_document(self, obj):
+        return self._file_url(obj.id_document)
+
+    def get_profile_picture(self, obj):
+        return self._file_url(obj.profile_picture)
+
+
+class InvestorKYCReviewSerializer(KYCReviewMixin, serializers.ModelSerializer):
+    class Meta:
+        model = InvestorKYC
+        fields = [
+            'id', 'kyc_type', 'user_info', 'full_name', 'email', 'date_of_birth', 'nationality',
+            'phone_number', 'id_type', 'id_number', 'id_document', 'profile_picture',
+            'address', 'occupation', 'income_source', 'annual_income', 'purpose',
+            'is_verified', 'verification_date', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
+
+
+class FarmerKYCReviewSerializer(KYCReviewMixin, serializers.ModelSerializer):
+    class Meta:
+        model = FarmerKYC
+        fields = [
+            'id', 'kyc_type', 'user_info', 'full_name', 'email', 'phone_number', 'role',
+            'date_of_birth', 'nationality', 'background', 'address',
+            'id_type', 'id_number', 'id_document', 'profile_picture',
+            'is_verified', 'verification_date', 'created_at', 'updated_at'
+        ]
+        read_only_fields = fields
     
     
 class OpportunitySerializer(serializers.ModelSerializer):
@@ -453,22 +613,48 @@ class OpportunityCreateSerializer(serializers.ModelSerializer):
 
 # PROJECT SERIALIZER
 
+def _ready_proposal(project):
+    """Stored name of ``project``'s watermarked proposal, or None until it is ready"""
+    if project.watermark_status == Project.WATERMARK_READY and project.watermarked_proposal:
+        return project.watermarked_proposal.name
+    return None
+
+
+def signed_proposal_url(project):
+    """Presigned URL of ``project``'s watermarked proposal, or None until it is ready"""
+    name = _ready_proposal(project)
+    return get_signed_url(project.watermarked_proposal.storage, name)[0] if name else None
+
+
+class ProjectListSerializer(serializers.ListSerializer):
+    """Signs every watermarked proposal on a page in one batch (see apis/signed_urls.py)"""
+
+    def to_representation(self, data):
+        projects = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        storage = Project._meta.get_field('watermarked_proposal').storage
+        self.context['proposal_urls'] = get_signed_urls(storage, [_ready_proposal(p) for p in projects])
+        return super().to_representation(projects)
+
+
 class ProjectSerializer(serializers.ModelSerializer):
     farmer_name = serializers.CharField(source='farmer.get_full_name', read_only=True)
     days_remaining = serializers.SerializerMethodField()
     is_farmer = serializers.SerializerMethodField()
+    # Short-lived presigned URL, cached per object; None until watermarking is done
+    watermarked_proposal = serializers.SerializerMethodField()
     
     class Meta:
         model = Project
+        list_serializer_class = ProjectListSerializer
         fields = [
             'id', 'farmer', 'farmer_name', 'name', 'title', 'email', 
             'brief', 'description', 'benefits', 'target_amount', 
             'deadline', 'days_remaining', 'image_url', 
-            'watermarked_proposal', 'status', 'created_at', 'is_farmer'
+            'watermarked_proposal', 'watermark_status', 'status', 'created_at', 'is_farmer'
         ]
         read_only_fields = [
             'id', 'farmer', 'farmer_name', 'status', 'created_at', 
-            'updated_at', 'watermarked_proposal', 'days_remaining',
+            'updated_at', 'watermark_status', 'days_remaining',
             'is_farmer'
         ]
     
@@ -480,83 +666,48 @@ class ProjectSerializer(serializers.ModelSerializer):
     
     def get_is_farmer(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return hasattr(request.user, 'profile') and request.user.profile.role == 'Farmer'
-        return False
+        return bool(request) and get_auth_context(request).is_farmer
+
+    def get_watermarked_proposal(self, obj):
+        urls = self.context.get('proposal_urls')
+        if urls is None:
+            return signed_proposal_url(obj)
+        signed = urls.get(_ready_proposal(obj))
+        return signed[0] if signed else None
 
 
-class ProjectCreateSerializer(serializers.ModelSerializer):
-    file = serializers.FileField(write_only=True)
+class ProjectCreateSerializer(DirectUploadMixin, serializers.ModelSerializer):
+    file = serializers.FileField(write_only=True, required=False)
+    file_upload = serializers.UUIDField(write_only=True, required=False)
+
+    direct_upload_fields = {'file': 'proposal'}
 
     class Meta:
         model = Project
         fields = [
             'name', 'title', 'email', 'brief', 'description',
-            'benefits', 'target_amount', 'deadline', 'image_url', 'file'
+            'benefits', 'target_amount', 'deadline', 'image_url', 'file', 'file_upload'
         ]
 
+    def validate(self, attrs):
+        """Require the proposal as either a file or a completed direct upload"""
+        return self.validate_direct_uploads(attrs)
+
     def create(self, validated_data):
-        file = validated_data.pop('file')
         farmer = self.context['request'].user
         validated_data.pop('farmer', None)
 
-        project = Project.objects.create(
-            farmer=farmer,
-            original_proposal=file,
-            **validated_data
-        )
+        with transaction.atomic():
+            self.attach_direct_uploads(validated_data, farmer)
+            file = validated_data.pop('file')
 
-        try:
-            font_path = os.path.join(settings.BASE_DIR, "apis", "fonts", "DynaPuff.ttf")
-            if not os.path.exists(font_path):
-                raise FileNotFoundError(f"Font not found at {font_path}")
-
-            pdfmetrics.registerFont(TTFont("DynaPuff", font_path))
-
-            # 2. Create watermark PDF in memory
-            watermark_stream = BytesIO()
-            c = canvas.Canvas(watermark_stream, pagesize=letter)
-            c.setFont("DynaPuff", 80)
-            c.setFillColor(gray)
-            c.setFillAlpha(0.4)
-            width, height = letter
-            c.translate(width / 2, height / 2)
-            c.rotate(45)
-            c.drawCentredString(0, 0, "Agriconnect")
-            c.save()
-
-            watermark_stream.seek(0)
-
-            # 3. Apply watermark
-            file.seek(0)
-            reader = PdfReader(file)
-            watermark_reader = PdfReader(watermark_stream)
-            watermark_page = watermark_reader.pages[0]
-            writer = PdfWriter()
-
-            for i, page in enumerate(reader.pages):
-                try:
-                    page.merge_page(watermark_page)
-                except Exception as e:
-                    print(f"Failed to watermark page {i}: {e}")
-                writer.add_page(page)
-
-            # 4. Save watermarked file to S3
-            output_stream = BytesIO()
-            writer.write(output_stream)
-            output_stream.seek(0)
-
-            media_storage = MediaStorage()
-            watermarked_name = f"proposals/watermarked/watermarked_{uuid.uuid4()}.pdf"
-            media_storage.save(watermarked_name, ContentFile(output_stream.read()))
-
-            project.watermarked_proposal.name = watermarked_name
-            project.save(update_fields=['watermarked_proposal'])
+            project = Project.objects.create(
+                farmer=farmer,
+                original_proposal=file,
+                **validated_data
+            )
 
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Watermarking failed for project {project.id}: {e}")
+        enqueue_watermark(project)
 
         return project
 
@@ -568,8 +719,55 @@ class KYCPreFillSerializer(serializers.Serializer):
     role = serializers.CharField()
     
 
+class DirectUploadInitiateSerializer(serializers.Serializer):
+    purpose = serializers.ChoiceField(choices=DirectUpload.PURPOSE_CHOICES)
+    filename = serializers.CharField(max_length=255)
+    content_type = serializers.CharField(max_length=100)
+    size = serializers.IntegerField(min_value=1)
+
+
+class DirectUploadPartSerializer(serializers.Serializer):
+    part_number = serializers.IntegerField(min_value=1, max_value=MAX_PARTS)
+    etag = serializers.CharField(max_length=255)
+
+
+class DirectUploadCompleteSerializer(serializers.Serializer):
+    parts = DirectUploadPartSerializer(many=True, allow_empty=False)
+
+
 # NDA
 class NDAAgreementSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = SIGNED_FILE_FIELD_MAPPING
+
     class Meta:
         model = NDAAgreement
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+
+class AdminNotificationSerializer(serializers.ModelSerializer):
+    """Serializer for the admin notification feed"""
+
+    class Meta:
+        model = AdminNotification
+        fields = ['id', 'kind', 'subject', 'message', 'created_at', 'digested_at']
+        read_only_fields = fields
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair whose tokens carry the user's authorization claims"""
+
+    @classmethod
+    def get_token(cls, user):
+        return issue_tokens(user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh that re-stamps current authorization claims on the new access token"""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        refresh = RefreshToken(attrs['refresh'])
+        access = refresh.access_token
+        stamp_claims(access, refresh[jwt_settings.USER_ID_CLAIM], refresh.get('username', ''))
+        data['access'] = str(access)
+        return data
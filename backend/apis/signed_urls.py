@@ -0,0 +1,68 @@
+from datetime import timedelta
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_key(storage, name, disposition):
+    digest = hashlib.sha256(f"{storage.bucket_name}:{name}:{disposition}".encode()).hexdigest()
+    return f"signed-url:{digest}"
+
+
+def _sign(storage, name, disposition):
+    expiry = settings.SIGNED_URL_EXPIRY
+    parameters = {'ResponseContentDisposition': disposition} if disposition else None
+
+    url = storage.url(name, parameters=parameters, expire=expiry)
+    return url, timezone.now() + timedelta(seconds=expiry)
+
+
+def _cache_timeout():
+    return settings.SIGNED_URL_EXPIRY - settings.SIGNED_URL_REFRESH_MARGIN
+
+
+def get_signed_url(storage, name, filename=None):
+    """
+    Return ``(url, expires_at)`` for a short-lived presigned GET on
+    ``name`` in ``storage``. URLs are cached per object and reused until
+    ``SIGNED_URL_REFRESH_MARGIN`` seconds before they expire.
+    """
+    disposition = f'inline; filename="{filename}"' if filename else ''
+    key = _cache_key(storage, name, disposition)
+
+    cached = cache.get(key)
+    if cached:
+        return cached
+
+    signed = _sign(storage, name, disposition)
+    if _cache_timeout() > 0:
+        cache.set(key, signed, _cache_timeout())
+
+    return signed
+
+
+def get_signed_urls(storage, names):
+    """
+    Batch form of get_signed_url for listings: returns ``{name: (url,
+    expires_at)}`` using one cache read and one cache write per call.
+    Empty names are skipped.
+    """
+    keys = {_cache_key(storage, name, ''): name for name in set(names) if name}
+    cached = cache.get_many(keys)
+
+    signed = {keys[key]: value for key, value in cached.items()}
+    missing = {}
+    for key, name in keys.items():
+        if key not in cached:
+            missing[key] = signed[name] = _sign(storage, name, '')
+
+    if missing and _cache_timeout() > 0:
+        cache.set_many(missing, _cache_timeout())
+
+    return signed
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import logging
+import threading
+
+from django.conf import settings
+from backend.storage_backends import object_key
+
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(storage):
+    """
+    One boto3 S3 client per bucket, shared by every thread in the process.
+    Clients are thread-safe and keep a connection pool, so repeated fetches
+    reuse connections; timeouts and retries come from AWS_S3_CLIENT_CONFIG.
+    """
+    key = (storage.endpoint_url, storage.bucket_name)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = storage._create_session().client(
+                    's3',
+                    region_name=storage.region_name,
+                    use_ssl=storage.use_ssl,
+                    endpoint_url=storage.endpoint_url,
+                    config=storage.client_config,
+                    verify=storage.verify,
+                )
+                _clients[key] = client
+    return client
+
+
+class BlobCache:
+    """Thread-safe LRU of small objects, bounded by their total size"""
+
+    def __init__(self, max_bytes, max_blob):
+        self.max_bytes = max_bytes
+        self.max_blob = max_blob
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_blob:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+@lru_cache(maxsize=None)
+def get_blob_cache():
+    return BlobCache(settings.STORAGE_FETCH_CACHE_MAX_BYTES, settings.STORAGE_FETCH_CACHE_MAX_BLOB)
+
+
+@lru_cache(maxsize=None)
+def _executor():
+    return ThreadPoolExecutor(max_workers=settings.STORAGE_FETCH_WORKERS, thread_name_prefix='storage-fetch')
+
+
+def fetch(storage, name, use_cache=True):
+    """
+    Read ``name`` from an S3-backed ``storage`` into memory. Stored files
+    are never overwritten, so small objects are kept in a per-process LRU
+    and later reads of the same name skip the network.
+    """
+    if not hasattr(storage, 'bucket_name'):
+        # Not S3 (local development): plain storage read, no caching
+        with storage.open(name, 'rb') as f:
+            return f.read()
+
+    key = object_key(storage, name)
+    cache_key = (storage.bucket_name, key)
+
+    if use_cache:
+        data = get_blob_cache().get(cache_key)
+        if data is not None:
+            return data
+
+    data = get_client(storage).get_object(Bucket=storage.bucket_name, Key=key)['Body'].read()
+
+    if use_cache:
+        get_blob_cache().put(cache_key, data)
+    return data
+
+
+def fetch_many(storage, names, use_cache=True):
+    """
+    Fetch several objects concurrently on a shared pool of
+    STORAGE_FETCH_WORKERS threads. Returns ``(results, errors)``: dicts
+    from name to bytes and from name to the exception that name raised.
+    Empty names are skipped.
+    """
+    futures = {
+        name: _executor().submit(fetch, storage, name, use_cache)
+        for name in dict.fromkeys(names)
+        if name
+    }
+
+    results, errors = {}, {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            logger.warning(f"Could not fetch {name} from storage: {e}")
+            errors[name] = e
+    return results, errors
@@ -0,0 +1,133 @@
+import re
+import logging
+
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from backend.storage_backends import object_key
+
+
+logger = logging.getLogger(__name__)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def parse_range_header(header, size):
+    """
+    Parse a single-range ``Range: bytes=...`` header against an object
+    of ``size`` bytes. Returns ``(start, end)`` (inclusive), ``None`` to
+    serve the whole object, or raises ``ValueError`` if the range cannot
+    be satisfied.
+    """
+    if not header:
+        return None
+
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: fall back to a full response
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable")
+
+    return start, min(end, size - 1)
+
+
+def _if_range_passes(request, etag, last_modified):
+    """Check the If-Range precondition (RFC 9110 section 13.1.5)"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+
+    if_range_date = parse_http_date_safe(if_range)
+    if if_range_date is not None:
+        return last_modified is not None and last_modified <= if_range_date
+
+    # Weak validators never match for If-Range
+    return etag is not None and not etag.startswith('W/') and parse_etags(if_range) == [etag]
+
+
+def stream_storage_object(request, storage, name, content_type, filename=None, etag=None, disposition='inline'):
+    """
+    Stream ``name`` from an S3-backed ``storage`` in chunks, honouring
+    single byte ranges and ETag/Last-Modified conditional requests.
+    A known content hash passed as ``etag`` replaces S3's ETag, and a
+    matching If-None-Match is then answered without touching storage.
+    """
+    if etag is not None:
+        conditional = get_conditional_response(request, etag=etag)
+        if conditional is not None:
+            conditional['ETag'] = etag
+            return conditional
+
+    obj = storage.bucket.Object(object_key(storage, name))
+    try:
+        obj.load()
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+            raise Http404("File not found.")
+        raise
+
+    size = obj.content_length
+    etag = etag or obj.e_tag
+    last_modified = int(obj.last_modified.timestamp())
+
+    conditional = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if conditional is not None:
+        conditional['ETag'] = etag
+        conditional['Last-Modified'] = http_date(last_modified)
+        return conditional
+
+    byte_range = None
+    if _if_range_passes(request, etag, last_modified):
+        try:
+            byte_range = parse_range_header(request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    get_kwargs = {}
+    if byte_range:
+        start, end = byte_range
+        get_kwargs['Range'] = f'bytes={start}-{end}'
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    else:
+        body = obj.get(**get_kwargs)['Body']
+        response = StreamingHttpResponse(
+            body.iter_chunks(chunk_size=settings.STORAGE_STREAM_CHUNK_SIZE),
+            content_type=content_type,
+        )
+
+    if byte_range:
+        response.status_code = 206
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response['Content-Length'] = str(size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
+    if filename:
+        response['Content-Disposition'] = f'{disposition}; filename="{filename}"'
+
+    return response
@@ -1,3 +1,1446 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+import json
+import re
+import threading
+import unittest
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from botocore.exceptions import ClientError
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import InMemoryStorage
+from django.db import connection
+from django.db.models import Case, Value, When
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from PyPDF2 import PdfReader
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .authentication import context_from_claims, issue_tokens
+from .authz import get_claims_version, load_auth_context
+from .kyc_review import bulk_verify, decode_cursor, pending_queue, review_queue_page
+from .mailer import queue_email, send_queued_emails
+from .models import (
+    KYC_ADMIN_UPDATABLE_FIELDS, AdminNotification, DirectUpload, EmailDeadLetter, FarmerKYC, InvestorKYC, KYCVerificationLog,
+    NDAAgreement, Opportunity, OutboundEmail, Project, UserProfile,
+)
+from .nda import delete_nda_pdf, get_nda_template, nda_is_current, render_nda, render_nda_pdf, store_nda_pdf
+from .notifications import record_admin_event, send_admin_digest
+from .opportunities import flush_opportunity_views, pending_opportunity_views
+from .otp import (
+    OTP_EXPIRED, OTP_INVALID, OTP_LOCKED, OTP_MISSING, OTP_VALID, get_otp_store, issue_otp, verify_otp,
+)
+from .pagination import RankKeysetPagination
+from .proposals import watermark_project_proposal
+from .search import RANK_FIELD, search
+from .serializers import InvestorKYCSerializer, ProjectSerializer
+from .signed_urls import get_signed_url
+from .storage_fetch import BlobCache, fetch, fetch_many, get_blob_cache
+from .streaming import stream_storage_object
+from .uploads import PART_SIZE, UploadError, abort_stale_uploads, claim_upload, complete_upload, initiate_upload
+from .watermark import get_watermark_stamp, stamp_for_page, watermark_pdf
+from backend.storage_backends import MediaStorage
+
+
+# Tests that touch the shared cache run against local memory instead of Redis
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# A Redis cache nothing listens on, for the cache-down paths
+DOWN_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+    'LOCATION': 'redis://127.0.0.1:1/0',
+}}
+
+
+def make_project(farmer, **fields):
+    values = {
+        'name': 'Farm',
+        'title': 'Project',
+        'email': farmer.email,
+        'brief': 'Brief',
+        'description': 'Description',
+        'target_amount': Decimal(1000),
+        'deadline': timezone.now().date() + timedelta(days=30),
+        'status': 'approved',
+        **fields,
+    }
+    return Project.objects.create(farmer=farmer, **values)
+
+
+def make_farmer_kyc(user, **fields):
+    values = {
+        'full_name': user.get_full_name() or user.username,
+        'email': user.email,
+        'phone_number': '+233200000000',
+        'role': 'Farmer',
+        'date_of_birth': date(1990, 1, 1),
+        'nationality': 'Ghanaian',
+        'background': 'Background',
+        'address': 'Accra',
+        'id_type': 'National ID',
+        'id_number': f'GHA-{user.pk}',
+        'id_document': f'documents/id/{user.pk}.pdf',
+        'profile_picture': f'profiles/{user.pk}.png',
+        **fields,
+    }
+    return FarmerKYC.objects.create(user=user, **values)
+
+
+def make_investor_kyc(user, **fields):
+    values = {
+        'full_name': user.get_full_name() or user.username,
+        'email': user.email,
+        'phone_number': '+233200000000',
+        'date_of_birth': date(1985, 1, 1),
+        'nationality': 'Ghanaian',
+        'id_type': 'passport',
+        'id_number': f'P-{user.pk}',
+        'id_document': f'documents/id/{user.pk}.pdf',
+        'profile_picture': f'profiles/{user.pk}.png',
+        'address': 'Accra',
+        'occupation': 'Investor',
+        'income_source': 'business',
+        'annual_income': Decimal(50000),
+        'purpose': 'Agricultural investment',
+        **fields,
+    }
+    return InvestorKYC.objects.create(user=user, **values)
+
+
+def make_opportunity(created_by, **fields):
+    values = {
+        'title': 'Grant',
+        'organization': 'Fund',
+        'location': 'Accra',
+        'theme': 'Agriculture',
+        'type': Opportunity.OPPORTUNITY_TYPES[0][0],
+        'description': 'Description',
+        'full_description': 'Full description',
+        'amount': '1000',
+        'deadline': timezone.now().date() + timedelta(days=30),
+        'application_link': 'https://example.com/apply',
+        **fields,
+    }
+    return Opportunity.objects.create(created_by=created_by, **values)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "EXPLAIN checks need PostgreSQL")
+@override_settings(CACHES=LOCMEM_CACHES)
+class HotQueryIndexTests(TestCase):
+    """
+    Make sure each hot project and opportunity query is served by the
+    index added for it. Sequential scans are disabled for the session so
+    the planner picks an index whenever a usable one exists, however
+    small the table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('indexes@example.com', 'indexes@example.com', 'password')
+        today = timezone.now().date()
+
+        Project.objects.bulk_create([
+            Project(
+                farmer=cls.user,
+                name='Farm',
+                title=f'Project {i}',
+                email='indexes@example.com',
+                brief='Brief',
+                description='Description',
+                target_amount=Decimal(1000 * (i + 1)),
+                deadline=today + timedelta(days=i),
+                status='approved' if i % 2 else 'pending',
+            )
+            for i in range(50)
+        ])
+        Opportunity.objects.bulk_create([
+            Opportunity(
+                title=f'Opportunity {i}',
+                organization='Org',
+                location='Kigali',
+                theme='Agriculture',
+                type='grant' if i % 2 else 'hackathon',
+                description='Description',
+                full_description='Full description',
+                amount='1000',
+                deadline=today + timedelta(days=i),
+                application_link='https://example.com',
+                created_by=cls.user,
+                is_active=bool(i % 3),
+            )
+            for i in range(50)
+        ])
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE apis_project')
+            cursor.execute('ANALYZE apis_opportunity')
+            cursor.execute('SET enable_seqscan = off')
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute('RESET enable_seqscan')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan, plan)
+
+    def test_approved_projects_listing(self):
+        self.assertUsesIndex(
+            Project.objects.filter(status='approved').order_by('-created_at', '-id')[:21],
+            'project_approved_recent_idx'
+        )
+
+    def test_projects_due_soon(self):
+        today = timezone.now().date()
+        self.assertUsesIndex(
+            Project.objects.filter(status='approved', deadline__range=[today, today + timedelta(days=7)]),
+            'project_approved_deadline_idx'
+        )
+
+    def test_projects_within_budget(self):
+        self.assertUsesIndex(
+            Project.objects.filter(status='approved', target_amount__lte=Decimal('5000')),
+            'project_approved_budget_idx'
+        )
+
+    def test_farmer_projects_listing(self):
+        self.assertUsesIndex(
+            Project.objects.filter(farmer=self.user).order_by('-created_at', '-id')[:21],
+            'project_farmer_recent_idx'
+        )
+
+    def test_active_opportunities_listing(self):
+        self.assertUsesIndex(Opportunity.objects.filter(is_active=True)[:20], 'opp_active_posted_idx')
+
+    def test_active_opportunities_by_type(self):
+        self.assertUsesIndex(
+            Opportunity.objects.filter(is_active=True, type='grant')[:20],
+            'opp_active_type_posted_idx'
+        )
+
+    def test_expired_opportunities_cleanup(self):
+        self.assertUsesIndex(
+            Opportunity.objects.filter(is_active=True, deadline__lt=timezone.now().date()),
+            'opp_active_deadline_idx'
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SignupQueryTests(TestCase):
+    """
+    Signup writes the user and profile once each, in one transaction:
+    the email check, a savepoint around the two inserts, and the
+    authorization context read for the tokens.
+    """
+
+    payload = {
+        'first_name': 'Ama',
+        'last_name': 'Mensah',
+        'email': 'ama@example.com',
+        'password': 'Harvest-2024!',
+        'confirm_password': 'Harvest-2024!',
+        'phone_number': '+233200000000',
+        'role': 'Investor',
+        'organization': 'Mensah Capital',
+        'investor_type': 'Organization',
+    }
+
+    def test_signup_query_count(self):
+        with self.assertNumQueries(6):
+            response = self.client.post(reverse('signup'), self.payload, content_type='application/json')
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['user']['profile']['role'], 'Investor')
+
+        profile = UserProfile.objects.get(user__email='ama@example.com')
+        self.assertEqual(profile.organization, 'Mensah Capital')
+
+    def test_user_save_leaves_profile_alone(self):
+        self.client.post(reverse('signup'), self.payload, content_type='application/json')
+        user = User.objects.get(email='ama@example.com')
+
+        with self.assertNumQueries(1):
+            user.last_login = timezone.now()
+            user.save(update_fields=['last_login'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LogoutTests(TestCase):
+
+    def test_logout_bumps_claims_version(self):
+        user = User.objects.create_user('logout@example.com', 'logout@example.com', 'password')
+        access = issue_tokens(user).access_token
+        version = get_claims_version(user.pk)
+
+        response = self.client.post(reverse('logout'), HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertNotEqual(get_claims_version(user.pk), version)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RankKeysetPaginationTests(TestCase):
+    """Paging by rank visits every row exactly once, however close the ranks are"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('ranks@example.com', 'ranks@example.com', 'password')
+        cls.projects = [make_project(cls.farmer, title=f'Maize farm {i}') for i in range(7)]
+
+    def page_through(self, queryset, page_size=1):
+        url = f'/search/?page_size={page_size}'
+        seen = []
+        for _ in range(len(self.projects) + 2):
+            paginator = RankKeysetPagination()
+            page = paginator.paginate_queryset(queryset, Request(APIRequestFactory().get(url)))
+            seen.extend(project.pk for project in page)
+            url = paginator.get_next_link()
+            if url is None:
+                return seen
+        self.fail(f"Paging did not finish: {seen}")
+
+    def test_equal_and_near_equal_ranks(self):
+        ranks = ['0.300000', '0.300001', '0.300001', '0.300001', '0.299999', '0.000001', '0.000001']
+        queryset = Project.objects.annotate(rank=Case(
+            *[When(pk=project.pk, then=Value(Decimal(rank))) for project, rank in zip(self.projects, ranks)],
+            output_field=RANK_FIELD,
+        ))
+
+        seen = self.page_through(queryset)
+
+        self.assertEqual(len(seen), len(self.projects))
+        self.assertEqual(set(seen), {project.pk for project in self.projects})
+        # Best match first, ties broken by descending id
+        self.assertEqual(seen[:3], sorted([p.pk for p in self.projects[1:4]], reverse=True))
+
+    def test_search_results_page_once(self):
+        seen = self.page_through(search(Project.objects.all(), 'maize farm'))
+
+        self.assertEqual(sorted(seen), sorted(project.pk for project in self.projects))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AuthContextInvalidationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('authz@example.com', 'authz@example.com', 'password')
+        self.profile = UserProfile.objects.create(user=self.user, role='Farmer')
+
+    def test_role_change_reloads_context_and_bumps_version(self):
+        self.assertEqual(load_auth_context(self.user.pk).role, 'Farmer')
+        version = get_claims_version(self.user.pk)
+
+        self.profile.role = 'Investor'
+        self.profile.save()
+
+        self.assertEqual(load_auth_context(self.user.pk).role, 'Investor')
+        self.assertNotEqual(get_claims_version(self.user.pk), version)
+
+    def test_kyc_changes_reload_context(self):
+        self.assertFalse(load_auth_context(self.user.pk).has_farmer_kyc)
+
+        kyc = make_farmer_kyc(self.user)
+        context = load_auth_context(self.user.pk)
+        self.assertEqual(context.farmer_kyc_id, kyc.pk)
+        self.assertFalse(context.farmer_kyc_verified)
+
+        kyc.is_verified = True
+        kyc.save()
+        self.assertTrue(load_auth_context(self.user.pk).farmer_kyc_verified)
+
+    def test_last_login_save_keeps_version(self):
+        version = get_claims_version(self.user.pk)
+        self.user.last_login = timezone.now()
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(get_claims_version(self.user.pk), version)
+
+
+@override_settings(CACHES=DOWN_CACHES)
+class AuthContextCacheDownTests(TestCase):
+    """With the cache unreachable, writes still succeed and claims are never trusted"""
+
+    def test_saves_and_tokens_without_cache(self):
+        with self.assertLogs('apis.authz', 'WARNING'):
+            user = User.objects.create_user('down@example.com', 'down@example.com', 'password')
+            profile = UserProfile.objects.create(user=user, role='Farmer')
+            user.first_name = 'Ama'
+            user.save()
+            profile.role = 'Investor'
+            profile.save()
+
+            self.assertEqual(load_auth_context(user.pk).role, 'Investor')
+
+            access = issue_tokens(user).access_token
+            self.assertIsNone(context_from_claims(access))
+
+            profile.delete()
+            self.assertFalse(load_auth_context(user.pk).has_profile)
+
+
+def make_pdf(pages=1, pagesize=(612, 792)):
+    """A small PDF with ``pages`` numbered pages"""
+    from reportlab.pdfgen import canvas
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=pagesize)
+    for number in range(pages):
+        c.drawString(72, 720, f"Page {number + 1}")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def fake_presign(storage, name, parameters=None, expire=None):
+    return f'https://signed.example.com/{name}?expires={expire}'
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+@mock.patch.object(MediaStorage, 'url', autospec=True, side_effect=fake_presign)
+class SignedURLTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.farmer = User.objects.create_user('signed@example.com', 'signed@example.com', 'password')
+
+    def test_media_storage_urls_expire_with_signed_urls(self, presign):
+        self.assertEqual(MediaStorage().querystring_expire, settings.SIGNED_URL_EXPIRY)
+
+    def test_signed_url_is_cached(self, presign):
+        storage = MediaStorage()
+        first = get_signed_url(storage, 'proposals/watermarked/a.pdf')
+        second = get_signed_url(storage, 'proposals/watermarked/a.pdf')
+
+        self.assertEqual(first, second)
+        self.assertEqual(presign.call_count, 1)
+        self.assertEqual(presign.call_args.kwargs['expire'], settings.SIGNED_URL_EXPIRY)
+        self.assertAlmostEqual(
+            (first[1] - timezone.now()).total_seconds(), settings.SIGNED_URL_EXPIRY, delta=5
+        )
+
+    def test_project_listing_signs_ready_proposals_once(self, presign):
+        for i in range(3):
+            make_project(
+                self.farmer,
+                title=f'Ready {i}',
+                watermarked_proposal=f'proposals/watermarked/{i}.pdf',
+                watermark_status=Project.WATERMARK_READY,
+            )
+        make_project(self.farmer, title='Pending', watermark_status=Project.WATERMARK_PENDING)
+
+        data = ProjectSerializer(Project.objects.order_by('title'), many=True).data
+        urls = {project['title']: project['watermarked_proposal'] for project in data}
+
+        self.assertIsNone(urls['Pending'])
+        self.assertEqual(
+            urls['Ready 0'],
+            f'https://signed.example.com/proposals/watermarked/0.pdf?expires={settings.SIGNED_URL_EXPIRY}',
+        )
+        self.assertEqual(presign.call_count, 3)
+
+        # A second page view is served from the cache
+        ProjectSerializer(Project.objects.all(), many=True).data
+        self.assertEqual(presign.call_count, 3)
+
+    def test_kyc_documents_are_signed(self, presign):
+        kyc = make_investor_kyc(self.farmer)
+        data = InvestorKYCSerializer(kyc).data
+
+        self.assertTrue(data['id_document'].startswith(f'https://signed.example.com/{kyc.id_document.name}'))
+        self.assertTrue(data['profile_picture'].startswith(f'https://signed.example.com/{kyc.profile_picture.name}'))
+
+
+class OTPTestsMixin:
+    """Login OTP behaviour shared by both stores"""
+
+    # Issued codes are 10000-99999
+    wrong_code = '00000'
+
+    def setUp(self):
+        self.user = User.objects.create_user('otp@example.com', 'otp@example.com', 'password')
+
+    def test_correct_code_is_consumed(self):
+        code = issue_otp(self.user)
+        self.assertEqual(verify_otp(self.user, code), OTP_VALID)
+        self.assertEqual(verify_otp(self.user, code), OTP_MISSING)
+
+    def test_wrong_code(self):
+        code = issue_otp(self.user)
+        self.assertEqual(verify_otp(self.user, self.wrong_code), OTP_INVALID)
+        self.assertEqual(verify_otp(self.user, code), OTP_VALID)
+
+    def test_no_code(self):
+        self.assertEqual(verify_otp(self.user, '12345'), OTP_MISSING)
+
+    def test_expired_code(self):
+        get_otp_store().issue(self.user.pk, '12345', timezone.now() - timedelta(seconds=1))
+        self.assertEqual(verify_otp(self.user, '12345'), OTP_EXPIRED)
+
+    def test_lockout_after_max_attempts(self):
+        code = issue_otp(self.user)
+        for _ in range(settings.OTP_MAX_ATTEMPTS - 1):
+            self.assertEqual(verify_otp(self.user, self.wrong_code), OTP_INVALID)
+        self.assertEqual(verify_otp(self.user, self.wrong_code), OTP_LOCKED)
+        self.assertIn(verify_otp(self.user, code), (OTP_LOCKED, OTP_MISSING))
+
+    def test_last_attempt_can_still_succeed(self):
+        code = issue_otp(self.user)
+        for _ in range(settings.OTP_MAX_ATTEMPTS - 1):
+            verify_otp(self.user, self.wrong_code)
+        self.assertEqual(verify_otp(self.user, code), OTP_VALID)
+
+    @mock.patch('apis.otp.generate_code', side_effect=['11111', '22222'])
+    def test_resend_replaces_code_and_attempts(self, generate_code):
+        issue_otp(self.user)
+        for _ in range(settings.OTP_MAX_ATTEMPTS - 1):
+            verify_otp(self.user, self.wrong_code)
+        issue_otp(self.user)
+
+        self.assertEqual(verify_otp(self.user, '11111'), OTP_INVALID)
+        self.assertEqual(verify_otp(self.user, '22222'), OTP_VALID)
+
+
+@override_settings(OTP_BACKEND='database', CACHES=LOCMEM_CACHES)
+class DatabaseOTPTests(OTPTestsMixin, TestCase):
+
+    def test_issue_and_verify_take_one_query_each(self):
+        with self.assertNumQueries(1):
+            code = issue_otp(self.user)
+        with self.assertNumQueries(1):
+            verify_otp(self.user, self.wrong_code)
+        with self.assertNumQueries(1):
+            self.assertEqual(verify_otp(self.user, code), OTP_VALID)
+
+
+@override_settings(OTP_BACKEND='cache', CACHES=LOCMEM_CACHES)
+class CacheOTPTests(OTPTestsMixin, TestCase):
+    pass
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OpportunityViewFlushTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user('admin', 'admin@example.com', 'pass')
+        self.viewed = make_opportunity(admin)
+        self.idle = make_opportunity(admin)
+
+    def view(self, opportunity, agent='browser'):
+        self.client.get(reverse('opportunity-detail', args=[opportunity.pk]), HTTP_USER_AGENT=agent)
+
+    def test_flush_reads_only_dirty_counters(self):
+        self.view(self.viewed, 'a')
+        self.view(self.viewed, 'b')
+
+        with mock.patch('apis.opportunities.cache.get_many', wraps=cache.get_many) as get_many:
+            flush_opportunity_views()
+
+        read = [key for call in get_many.call_args_list for key in call.args[0]]
+        self.assertEqual(read, [f"opportunity:views:pending:{self.viewed.pk}"])
+        self.viewed.refresh_from_db()
+        self.assertEqual(self.viewed.views, 2)
+        self.assertEqual(pending_opportunity_views(self.viewed.pk), 0)
+
+        # Nothing is dirty any more, so the next run reads nothing
+        with mock.patch('apis.opportunities.cache.get_many') as get_many:
+            flush_opportunity_views()
+        get_many.assert_not_called()
+
+    def test_failed_update_keeps_pending_views(self):
+        self.view(self.viewed)
+
+        with mock.patch('apis.opportunities.Opportunity.objects.filter', side_effect=RuntimeError('db down')), \
+                self.assertLogs('apis.opportunities', 'WARNING'):
+            flush_opportunity_views()
+        self.assertEqual(pending_opportunity_views(self.viewed.pk), 1)
+
+        flush_opportunity_views()
+        self.viewed.refresh_from_db()
+        self.assertEqual(self.viewed.views, 1)
+        self.assertEqual(pending_opportunity_views(self.viewed.pk), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FarmerProjectCountsTests(TestCase):
+
+    def setUp(self):
+        self.farmer = User.objects.create_user('counts@example.com', 'counts@example.com', 'password')
+        UserProfile.objects.create(user=self.farmer, role='Farmer')
+        make_farmer_kyc(self.farmer, is_verified=True)
+        for status in ['approved', 'approved', 'pending', 'rejected']:
+            make_project(self.farmer, status=status)
+
+        other = User.objects.create_user('other@example.com', 'other@example.com', 'password')
+        make_project(other)
+
+    def test_counts_per_status_in_one_query(self):
+        access = issue_tokens(self.farmer).access_token
+        url = reverse('farmer-project-counts')
+        self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], {
+            'total': 4, 'approved': 2, 'pending': 1, 'rejected': 1, 'funded': 0, 'completed': 0,
+        })
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class DirectUploadTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('uploads@example.com', 'uploads@example.com', 'password')
+        patcher = mock.patch('apis.uploads._client')
+        self.s3 = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.s3.create_multipart_upload.return_value = {'UploadId': 'multipart-1'}
+        self.s3.generate_presigned_url.side_effect = lambda op, Params, ExpiresIn: f"https://s3/{Params['PartNumber']}"
+
+    def make_upload(self, status='initiated', age=timedelta(0), upload_id='multipart-1'):
+        upload = DirectUpload.objects.create(
+            user=self.user, purpose='proposal', name=f'proposals/original/{status}.pdf', filename='p.pdf',
+            content_type='application/pdf', size=2048, status=status,
+            upload_id=upload_id, completed_at=timezone.now() - age if status == 'completed' else None,
+        )
+        DirectUpload.objects.filter(pk=upload.pk).update(created_at=timezone.now() - age)
+        return upload
+
+    def test_initiate_presigns_every_part(self):
+        upload, parts, part_size = initiate_upload(
+            self.user, 'proposal', '../My Proposal.pdf', 'application/pdf', 2 * PART_SIZE + 1,
+        )
+
+        self.assertEqual(part_size, PART_SIZE)
+        self.assertEqual([part['part_number'] for part in parts], [1, 2, 3])
+        self.assertTrue(upload.name.startswith('proposals/original/'))
+        self.assertEqual(self.s3.create_multipart_upload.call_args.kwargs['Key'], f'media/{upload.name}')
+
+    def test_initiate_rejects_other_types(self):
+        with self.assertRaises(UploadError):
+            initiate_upload(self.user, 'proposal', 'proposal.exe', 'application/pdf', 1024)
+        self.assertFalse(DirectUpload.objects.exists())
+
+    def test_complete_checks_size_and_content(self):
+        upload = self.make_upload()
+        self.s3.head_object.return_value = {'ContentLength': upload.size}
+        self.s3.get_object.return_value = {'Body': mock.Mock(read=lambda: b'%PDF-1.7\n')}
+
+        complete_upload(upload, [{'part_number': 1, 'etag': '"a"'}])
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'completed')
+        self.assertIsNotNone(upload.completed_at)
+
+    def test_complete_discards_mismatched_content(self):
+        upload = self.make_upload()
+        self.s3.head_object.return_value = {'ContentLength': upload.size}
+        self.s3.get_object.return_value = {'Body': mock.Mock(read=lambda: b'MZ\x90\x00')}
+
+        with self.assertRaises(UploadError):
+            complete_upload(upload, [{'part_number': 1, 'etag': '"a"'}])
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'aborted')
+        self.s3.delete_object.assert_called_once()
+
+    def test_upload_attaches_once(self):
+        upload = self.make_upload('completed')
+
+        self.assertEqual(claim_upload(self.user, upload.id, 'proposal'), upload.name)
+        with self.assertRaises(UploadError):
+            claim_upload(self.user, upload.id, 'proposal')
+
+    def test_abort_marks_only_aborted_uploads(self):
+        stale = timedelta(seconds=settings.DIRECT_UPLOAD_URL_EXPIRY, hours=2)
+        aborted = self.make_upload(age=stale, upload_id='ok')
+        gone = self.make_upload(age=stale, upload_id='gone')
+        failing = self.make_upload(age=stale, upload_id='down')
+        recent = self.make_upload(upload_id='recent')
+        errors = {
+            'gone': ClientError({'Error': {'Code': 'NoSuchUpload'}}, 'AbortMultipartUpload'),
+            'down': ConnectionError('timeout'),
+        }
+
+        def abort(UploadId, **kwargs):
+            if UploadId in errors:
+                raise errors[UploadId]
+        self.s3.abort_multipart_upload.side_effect = abort
+
+        with self.assertLogs('apis.uploads', 'WARNING'):
+            abort_stale_uploads()
+
+        statuses = dict(DirectUpload.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[aborted.id], 'aborted')
+        self.assertEqual(statuses[gone.id], 'aborted')
+        self.assertEqual(statuses[failing.id], 'initiated')
+        self.assertEqual(statuses[recent.id], 'initiated')
+
+    def test_unattached_uploads_are_removed(self):
+        old = self.make_upload('completed', age=timedelta(seconds=settings.DIRECT_UPLOAD_ATTACH_WINDOW + 60))
+        fresh = self.make_upload('completed')
+
+        abort_stale_uploads()
+
+        self.s3.delete_object.assert_called_once_with(
+            Bucket=settings.AWS_STORAGE_BUCKET_NAME, Key=f'media/{old.name}',
+        )
+        self.assertEqual(DirectUpload.objects.get(pk=fresh.pk).status, 'completed')
+        with self.assertRaises(UploadError):
+            claim_upload(self.user, old.id, 'proposal')
+
+
+class FakeS3Object:
+    """Just enough of a boto3 S3 Object for stream_storage_object"""
+
+    def __init__(self, data, e_tag='"abc123"', last_modified=None):
+        self.data = data
+        self.content_length = len(data)
+        self.e_tag = e_tag
+        self.last_modified = last_modified or timezone.now().replace(microsecond=0)
+        self.ranges = []
+
+    def load(self):
+        pass
+
+    def get(self, Range=None):
+        self.ranges.append(Range)
+        data = self.data
+        if Range:
+            start, end = Range[len('bytes='):].split('-')
+            data = data[int(start):int(end) + 1]
+        return {'Body': mock.Mock(iter_chunks=lambda chunk_size: iter([data]))}
+
+
+class StreamStorageObjectTests(SimpleTestCase):
+
+    def setUp(self):
+        self.object = FakeS3Object(bytes(range(100)))
+        self.storage = mock.Mock(location='media')
+        self.storage.bucket.Object.return_value = self.object
+
+    def stream(self, **headers):
+        request = RequestFactory().get('/file.pdf', **headers)
+        return stream_storage_object(request, self.storage, 'file.pdf', 'application/pdf')
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_response(self):
+        response = self.stream()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.body(response), self.object.data)
+        self.storage.bucket.Object.assert_called_once_with('media/file.pdf')
+
+    def test_valid_range(self):
+        response = self.stream(HTTP_RANGE='bytes=10-19')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self.body(response), self.object.data[10:20])
+        self.assertEqual(self.object.ranges, ['bytes=10-19'])
+
+    def test_suffix_range(self):
+        response = self.stream(HTTP_RANGE='bytes=-5')
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), self.object.data[-5:])
+
+    def test_unsatisfiable_range(self):
+        response = self.stream(HTTP_RANGE='bytes=100-')
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+        self.assertEqual(self.object.ranges, [])
+
+    def test_stale_if_range_sends_whole_object(self):
+        response = self.stream(HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE='"older"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.object.data)
+
+    def test_matching_if_range_sends_range(self):
+        response = self.stream(HTTP_RANGE='bytes=10-19', HTTP_IF_RANGE=self.object.e_tag)
+
+        self.assertEqual(response.status_code, 206)
+
+    def test_not_modified_by_etag(self):
+        response = self.stream(HTTP_IF_NONE_MATCH=self.object.e_tag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], self.object.e_tag)
+        self.assertEqual(self.object.ranges, [])
+
+    def test_not_modified_by_last_modified(self):
+        response = self.stream(HTTP_IF_MODIFIED_SINCE=http_date(self.object.last_modified.timestamp()))
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.object.ranges, [])
+
+    def test_known_etag_skips_storage(self):
+        request = RequestFactory().get('/file.pdf', HTTP_IF_NONE_MATCH='"sha"')
+        response = stream_storage_object(request, self.storage, 'file.pdf', 'application/pdf', etag='"sha"')
+
+        self.assertEqual(response.status_code, 304)
+        self.storage.bucket.Object.assert_not_called()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class WatermarkTaskTests(TestCase):
+
+    def setUp(self):
+        farmer = User.objects.create_user('watermark@example.com', 'watermark@example.com', 'password')
+        self.project = make_project(farmer, original_proposal='proposals/original/p.pdf')
+
+    def run_task(self):
+        return watermark_project_proposal.apply(args=[str(self.project.id)])
+
+    @mock.patch.object(MediaStorage, 'save', autospec=True, side_effect=lambda storage, name, content: name)
+    @mock.patch('django.db.models.fields.files.FieldFile.open')
+    def test_stores_watermarked_proposal(self, open_file, save):
+        open_file.return_value = BytesIO(make_pdf(pages=2))
+
+        self.run_task()
+
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.watermark_status, Project.WATERMARK_READY)
+        self.assertEqual(self.project.watermark_attempts, 1)
+        self.assertEqual(self.project.watermark_error, '')
+        self.assertTrue(self.project.watermarked_proposal.name.startswith('proposals/watermarked/'))
+        save.assert_called_once()
+
+    @mock.patch('django.db.models.fields.files.FieldFile.open', side_effect=OSError('storage down'))
+    def test_retries_then_fails(self, open_file):
+        with self.assertLogs('apis.proposals', 'ERROR'), \
+                mock.patch.object(watermark_project_proposal, 'retry', wraps=watermark_project_proposal.retry) as retry:
+            self.run_task()
+
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.watermark_status, Project.WATERMARK_FAILED)
+        self.assertEqual(self.project.watermark_attempts, settings.WATERMARK_MAX_RETRIES + 1)
+        self.assertEqual(self.project.watermark_error, 'storage down')
+        self.assertEqual(
+            [call.kwargs['countdown'] for call in retry.call_args_list],
+            [settings.WATERMARK_RETRY_BACKOFF * 2 ** n for n in range(settings.WATERMARK_MAX_RETRIES)],
+        )
+
+    def test_ready_project_is_skipped(self):
+        Project.objects.filter(pk=self.project.pk).update(watermark_status=Project.WATERMARK_READY)
+
+        self.assertIn('already watermarked', self.run_task().result)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.watermark_attempts, 0)
+
+
+class WatermarkStampCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        get_watermark_stamp.cache_clear()
+        self.addCleanup(get_watermark_stamp.cache_clear)
+
+    def watermark(self, data):
+        output = BytesIO()
+        watermark_pdf(BytesIO(data), output)
+        return output.getvalue()
+
+    def test_repeated_runs_reuse_the_stamp(self):
+        source = make_pdf(pages=3)
+
+        first = self.watermark(source)
+        second = self.watermark(source)
+
+        self.assertEqual(first, second)
+        info = get_watermark_stamp.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 5)
+
+    def test_stamp_per_page_geometry(self):
+        letter_page, a4_page = (
+            PdfReader(BytesIO(make_pdf(pagesize=size))).pages[0] for size in [(612, 792), (595, 842)]
+        )
+
+        self.assertIs(stamp_for_page(letter_page), stamp_for_page(letter_page))
+        self.assertIsNot(stamp_for_page(letter_page), stamp_for_page(a4_page))
+
+    def test_changed_text_builds_a_new_stamp(self):
+        page = PdfReader(BytesIO(make_pdf())).pages[0]
+        stamp = stamp_for_page(page)
+
+        with mock.patch('apis.watermark.WATERMARK_TEXT', 'Confidential'):
+            changed = stamp_for_page(page)
+
+        self.assertIsNot(changed, stamp)
+        self.assertNotEqual(changed.get_contents().get_data(), stamp.get_contents().get_data())
+        self.assertIs(stamp_for_page(page), stamp)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OpportunityStatsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_user('stats@example.com', 'stats@example.com', 'password')
+        make_opportunity(admin, type='grant', views=5)
+        make_opportunity(admin, type='grant', views=2)
+        make_opportunity(admin, type='hackathon', applicants=3)
+        self.url = reverse('opportunity-stats')
+
+    def test_stats_in_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+        self.assertEqual(response.json(), {
+            'total_opportunities': 3,
+            'total_views': 7,
+            'total_applicants': 3,
+            'opportunities_by_type': {'Grant': 2, 'Hackathon': 1},
+        })
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_changes_give_a_new_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        make_opportunity(User.objects.get(), type='other')
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['total_opportunities'], 4)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class OpportunityResponseCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('listing@example.com', 'listing@example.com', 'password')
+        self.opportunity = make_opportunity(self.admin)
+        self.url = reverse('opportunity-list')
+
+    def test_repeat_requests_are_served_from_cache(self):
+        # Equivalent parameters normalize to the same key
+        first = self.client.get(self.url, {'search': ' ', 'page_size': 20}).json()
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url).json()
+        self.assertEqual(first, second)
+
+    def test_writes_bump_the_version(self):
+        self.client.get(self.url)
+
+        make_opportunity(self.admin, title='New grant')
+
+        self.assertEqual(self.client.get(self.url).json()['count'], 2)
+
+    def test_flushing_views_keeps_cached_responses(self):
+        detail = reverse('opportunity-detail', args=[self.opportunity.pk])
+        self.client.get(self.url)
+        self.client.get(detail)
+
+        flush_opportunity_views()
+
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+            self.client.get(detail)
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        self.client.get(self.url)
+        Opportunity.objects.filter(pk=self.opportunity.pk).update(title='Renamed')
+
+        with mock.patch('apis.response_cache.time.time', return_value=timezone.now().timestamp() + settings.RESPONSE_CACHE_TTL + 1), \
+                mock.patch('apis.opportunities.refresh_opportunity_response.delay') as refresh:
+            stale = self.client.get(self.url).json()
+            self.client.get(self.url)
+
+        self.assertEqual(stale['results'][0]['title'], 'Grant')
+        refresh.assert_called_once()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReviewQueueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now() - timedelta(days=1)
+        # Ties on created_at within and across the two KYC types
+        schedule = [
+            ('farmer', 0), ('investor', 0), ('farmer', 1), ('investor', 2),
+            ('farmer', 2), ('investor', 3), ('farmer', 3),
+        ]
+        cls.expected = []
+        for i, (kyc_type, minute) in enumerate(schedule):
+            user = User.objects.create_user(f'queue{i}@example.com', f'queue{i}@example.com', 'password')
+            with mock.patch('django.utils.timezone.now', return_value=start + timedelta(minutes=minute)):
+                kyc = (make_farmer_kyc if kyc_type == 'farmer' else make_investor_kyc)(user)
+            cls.expected.append((kyc.created_at, kyc_type, kyc.pk))
+        cls.expected.sort()
+        make_farmer_kyc(User.objects.create_user('done@example.com'), is_verified=True)
+
+    def test_pages_are_ordered_without_duplicates(self):
+        seen, cursor = [], None
+        while True:
+            with self.assertNumQueries(2):
+                items, next_cursor = review_queue_page(pending_queue(), cursor, page_size=2)
+            seen += [(kyc.created_at, kyc_type, kyc.pk) for kyc_type, kyc in items]
+            if next_cursor is None:
+                break
+            cursor = decode_cursor(next_cursor)
+
+        self.assertEqual(seen, self.expected)
+
+    def test_single_type_queue(self):
+        items, next_cursor = review_queue_page(pending_queue('investor'), page_size=10)
+
+        self.assertEqual([kyc_type for kyc_type, _ in items], ['investor'] * 3)
+        self.assertIsNone(next_cursor)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BulkVerifyTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin@example.com', 'admin@example.com', 'password')
+        self.farmer = User.objects.create_user('farmer@example.com', 'farmer@example.com', 'password')
+        self.investor = User.objects.create_user('investor@example.com', 'investor@example.com', 'password')
+        self.no_kyc = User.objects.create_user('nokyc@example.com', 'nokyc@example.com', 'password')
+        for user, role in [(self.farmer, 'Farmer'), (self.investor, 'Investor'), (self.no_kyc, 'Farmer')]:
+            UserProfile.objects.create(user=user, role=role)
+        make_farmer_kyc(self.farmer)
+        make_investor_kyc(self.investor)
+
+    @mock.patch('apis.kyc_review.invalidate_auth_context')
+    def test_writes_only_admin_fields_and_invalidates(self, invalidate):
+        decisions = [
+            {'user_id': self.farmer.pk, 'action': 'approved', 'allow_changes': True},
+            {'user_id': self.investor.pk, 'action': 'rejected'},
+            {'user_id': self.no_kyc.pk, 'action': 'approved'},
+            {'user_id': 0, 'action': 'approved'},
+        ]
+
+        with CaptureQueriesContext(connection) as queries:
+            results = bulk_verify(decisions, self.admin)
+
+        updates = [q['sql'] for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 2)
+        for sql in updates:
+            written = set(re.findall(r'(?:SET |END, )"(\w+)" = ', sql))
+            self.assertLessEqual(written, set(KYC_ADMIN_UPDATABLE_FIELDS), sql)
+
+        self.assertEqual([r['success'] for r in results], [True, True, False, False])
+        self.assertEqual(results[2]['message'], 'KYC not found')
+        self.assertEqual(results[3]['message'], 'User profile not found')
+        self.assertTrue(FarmerKYC.objects.get(user=self.farmer).is_verified)
+        self.assertTrue(FarmerKYC.objects.get(user=self.farmer).changes_allowed)
+        self.assertFalse(InvestorKYC.objects.get(user=self.investor).is_verified)
+        self.assertEqual(KYCVerificationLog.objects.count(), 2)
+        invalidate.assert_called_once()
+        self.assertCountEqual(invalidate.call_args.args[0], [self.farmer.pk, self.investor.pk])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ImmutableKYCTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('kyc@example.com', 'kyc@example.com', 'password')
+        self.kyc = make_farmer_kyc(self.user)
+
+    def test_locked_field_save_raises(self):
+        kyc = FarmerKYC.objects.get(pk=self.kyc.pk)
+        kyc.full_name = 'Someone Else'
+
+        with self.assertRaises(ValidationError):
+            kyc.save()
+        self.assertEqual(FarmerKYC.objects.get(pk=kyc.pk).full_name, self.kyc.full_name)
+
+    def test_created_instance_is_locked_too(self):
+        self.kyc.id_number = 'CHANGED'
+
+        with self.assertRaises(ValidationError):
+            self.kyc.save()
+
+    def test_unloaded_instance_is_checked_against_the_row(self):
+        kyc = FarmerKYC(pk=self.kyc.pk, user=self.user, full_name='Someone Else')
+
+        with self.assertRaises(ValidationError):
+            kyc.save()
+
+    def test_admin_fields_save_without_extra_read(self):
+        kyc = FarmerKYC.objects.get(pk=self.kyc.pk)
+        kyc.is_verified = True
+        kyc.verification_date = timezone.now()
+
+        with self.assertNumQueries(1):
+            kyc.save(update_fields=['is_verified', 'verification_date'])
+        self.assertTrue(FarmerKYC.objects.get(pk=kyc.pk).is_verified)
+
+    def test_queryset_updates(self):
+        with self.assertRaises(ValidationError):
+            FarmerKYC.objects.filter(pk=self.kyc.pk).update(full_name='Someone Else')
+        with self.assertRaises(ValidationError):
+            InvestorKYC.objects.update(occupation='Other')
+
+        self.assertEqual(FarmerKYC.objects.filter(pk=self.kyc.pk).update(is_verified=True), 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class MailQueueTests(TestCase):
+
+    def setUp(self):
+        self.message = queue_email('Your code', 'Code: 12345', ['farmer@example.com'])
+
+    def make_due(self):
+        OutboundEmail.objects.filter(pk=self.message.pk).update(next_attempt_at=timezone.now())
+
+    def test_sent_message_body_is_cleared(self):
+        send_queued_emails()
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].body, 'Code: 12345')
+        message = OutboundEmail.objects.get(pk=self.message.pk)
+        self.assertEqual(message.status, 'sent')
+        self.assertEqual(message.body, '')
+        self.assertIsNotNone(message.sent_at)
+
+    @mock.patch('apis.mailer.EmailMessage.send', side_effect=OSError('connection reset'))
+    def test_failures_back_off_exponentially(self, send):
+        for attempt in range(1, 4):
+            before = timezone.now()
+            send_queued_emails()
+
+            message = OutboundEmail.objects.get(pk=self.message.pk)
+            delay = timedelta(seconds=settings.EMAIL_QUEUE_RETRY_BACKOFF * 2 ** (attempt - 1))
+            self.assertEqual(message.status, 'queued')
+            self.assertEqual(message.attempts, attempt)
+            self.assertEqual(message.last_error, 'connection reset')
+            self.assertGreaterEqual(message.next_attempt_at, before + delay)
+            self.assertLess(message.next_attempt_at, timezone.now() + delay)
+
+            # Not due yet, so another run leaves it alone
+            send_queued_emails()
+            self.assertEqual(send.call_count, attempt)
+            self.make_due()
+
+    @mock.patch('apis.mailer.EmailMessage.send', side_effect=OSError('mailbox unavailable'))
+    def test_dead_lettered_after_max_attempts(self, send):
+        with self.assertLogs('apis.mailer', 'ERROR'):
+            for _ in range(settings.EMAIL_QUEUE_MAX_ATTEMPTS):
+                send_queued_emails()
+                self.make_due()
+
+        self.assertFalse(OutboundEmail.objects.exists())
+        dead = EmailDeadLetter.objects.get()
+        self.assertEqual(dead.attempts, settings.EMAIL_QUEUE_MAX_ATTEMPTS)
+        self.assertEqual(dead.to, ['farmer@example.com'])
+        self.assertEqual(dead.last_error, 'mailbox unavailable')
+        self.assertFalse(hasattr(dead, 'body'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ADMIN_DIGEST_INTERVAL=15, EMAIL_HOST_USER='admin@example.com')
+class AdminDigestTests(TestCase):
+
+    def test_events_are_mailed_as_one_digest(self):
+        record_admin_event('farmer_kyc', 'Farmer KYC from Ama', 'Ama submitted KYC')
+        record_admin_event('farmer_kyc', 'Farmer KYC from Kofi', 'Kofi submitted KYC')
+        record_admin_event('project', 'New project: Maize', 'Maize project created')
+        self.assertFalse(OutboundEmail.objects.exists())
+
+        send_admin_digest()
+
+        digest = OutboundEmail.objects.get()
+        self.assertEqual(digest.subject, 'Agriconnect admin digest: 3 new events')
+        self.assertEqual(digest.to, ['admin@example.com'])
+        self.assertIn('Farmer KYC Submitted: 2', digest.body)
+        self.assertIn('Project Created: 1', digest.body)
+        self.assertIn('Maize project created', digest.body)
+        self.assertFalse(AdminNotification.objects.filter(digested_at__isnull=True).exists())
+
+        # Nothing new, nothing mailed
+        send_admin_digest()
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    @override_settings(ADMIN_DIGEST_INTERVAL=0)
+    def test_without_digests_events_are_mailed_at_once(self):
+        event = record_admin_event('project', 'New project: Maize', 'Maize project created')
+
+        self.assertEqual(OutboundEmail.objects.get().subject, 'New project: Maize')
+        self.assertIsNotNone(event.digested_at)
+
+    def test_old_digested_events_are_purged(self):
+        old = record_admin_event('project', 'Old', 'Old project')
+        AdminNotification.objects.filter(pk=old.pk).update(
+            digested_at=timezone.now() - timedelta(days=settings.ADMIN_NOTIFICATION_RETENTION_DAYS + 1)
+        )
+        pending = record_admin_event('project', 'New', 'New project')
+
+        send_admin_digest()
+
+        self.assertEqual(list(AdminNotification.objects.values_list('pk', flat=True)), [pending.pk])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AdminNotificationFeedTests(TestCase):
+
+    def setUp(self):
+        admin = User.objects.create_superuser('admin@example.com', 'admin@example.com', 'password')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {issue_tokens(admin).access_token}'}
+        self.url = reverse('admin_notifications')
+        self.events = [
+            record_admin_event(kind, f'Event {i}', 'Message')
+            for i, kind in enumerate(['project', 'farmer_kyc', 'project', 'investor_kyc'])
+        ]
+
+    def feed(self, **params):
+        return self.client.get(self.url, params, **self.auth)
+
+    def test_polls_events_after_the_last_seen(self):
+        first = self.feed(limit=2).json()
+        self.assertEqual([e['id'] for e in first['data']], [e.pk for e in self.events[2:]])
+
+        self.assertEqual(self.feed(after=first['last_id']).json()['data'], [])
+
+        new = record_admin_event('project', 'Event 4', 'Message')
+        later = self.feed(after=first['last_id']).json()
+        self.assertEqual([e['id'] for e in later['data']], [new.pk])
+        self.assertEqual(later['last_id'], new.pk)
+
+    def test_filters_by_kind(self):
+        data = self.feed(kind='project', after=0).json()['data']
+        self.assertEqual([e['id'] for e in data], [self.events[0].pk, self.events[2].pk])
+
+    def test_rejects_bad_cursor_and_non_admins(self):
+        self.assertEqual(self.feed(after='abc').status_code, 400)
+
+        user = User.objects.create_user('user@example.com', 'user@example.com', 'password')
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {issue_tokens(user).access_token}')
+        self.assertEqual(response.status_code, 403)
+
+
+def make_png():
+    from PIL import Image as PILImage
+
+    buffer = BytesIO()
+    PILImage.new('RGB', (60, 20), 'white').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class NDARenderTests(TestCase):
+
+    def setUp(self):
+        self.storage = InMemoryStorage()
+        for field in ('pdf', 'signature'):
+            patcher = mock.patch.object(NDAAgreement._meta.get_field(field), 'storage', self.storage)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        get_nda_template.cache_clear()
+        self.addCleanup(get_nda_template.cache_clear)
+
+        user = User.objects.create_user('nda@example.com', 'nda@example.com', 'password')
+        signature = self.storage.save('documents/signatures/sig.png', ContentFile(make_png()))
+        self.nda = NDAAgreement.objects.create(
+            user=user, full_name='Ama <Mensah>', email='nda@example.com', date_signed=date(2026, 1, 5),
+            signature=signature, ip_address='127.0.0.1',
+        )
+
+    def test_render_is_deterministic(self):
+        first = render_nda_pdf(self.nda)
+
+        get_nda_template.cache_clear()
+        self.assertEqual(render_nda_pdf(self.nda), first)
+        self.assertTrue(first.startswith(b'%PDF-'))
+
+    def test_stored_pdf_is_content_addressed(self):
+        name = store_nda_pdf(self.nda)
+
+        nda = NDAAgreement.objects.get(pk=self.nda.pk)
+        self.assertTrue(nda_is_current(nda))
+        self.assertIn(nda.pdf_sha256[:16], name)
+        self.assertEqual(nda.pdf.name, name)
+        self.assertEqual(render_nda.apply(args=[nda.pk]).result, f"NDA {nda.pk} already rendered")
+
+    @mock.patch('apis.nda.delete_nda_pdf.apply_async')
+    def test_template_change_rerenders_and_delays_cleanup(self, delete_later):
+        old = store_nda_pdf(self.nda)
+
+        get_nda_template.cache_clear()
+        with mock.patch('apis.nda.NDA_TEMPLATE_VERSION', 99), \
+                mock.patch('apis.nda.NDA_TERMS', '<b>1. Purpose</b><br/>Revised terms.<br/><br/>'):
+            self.assertFalse(nda_is_current(NDAAgreement.objects.get(pk=self.nda.pk)))
+            with self.captureOnCommitCallbacks(execute=True):
+                render_nda.apply(args=[self.nda.pk])
+
+        nda = NDAAgreement.objects.get(pk=self.nda.pk)
+        self.assertEqual(nda.pdf_template_version, 99)
+        self.assertNotEqual(nda.pdf.name, old)
+        # The replaced PDF stays for downloads in flight and is removed later
+        self.assertTrue(self.storage.exists(old))
+        delete_later.assert_called_once_with((old,), countdown=settings.NDA_PDF_CLEANUP_DELAY)
+
+    def test_delayed_delete_skips_pdfs_in_use(self):
+        current = store_nda_pdf(self.nda)
+        replaced = self.storage.save('documents/nda/old.pdf', ContentFile(b'%PDF-old'))
+
+        delete_nda_pdf(current)
+        delete_nda_pdf(replaced)
+
+        self.assertTrue(self.storage.exists(current))
+        self.assertFalse(self.storage.exists(replaced))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ComplianceExportTests(TestCase):
+
+    def setUp(self):
+        self.storage = InMemoryStorage()
+        for field in ('pdf', 'signature'):
+            patcher = mock.patch.object(NDAAgreement._meta.get_field(field), 'storage', self.storage)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        admin = User.objects.create_superuser('export@example.com', 'export@example.com', 'password')
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {issue_tokens(admin).access_token}'}
+
+        self.ndas = []
+        for i in range(3):
+            user = User.objects.create_user(f'signer{i}@example.com', f'signer{i}@example.com', 'password')
+            signature = self.storage.save(f'documents/signatures/{i}.png', ContentFile(make_png()))
+            self.ndas.append(NDAAgreement.objects.create(
+                user=user, full_name=f'Signer {i}', email=user.email, date_signed=date(2026, 1, 5),
+                signature=signature, ip_address='127.0.0.1',
+            ))
+        # One stored PDF, one rendered during the export, one whose signature is gone
+        self.stored_pdf = self.storage.open(store_nda_pdf(self.ndas[0])).read()
+        self.storage.delete(self.ndas[2].signature.name)
+
+        make_farmer_kyc(self.ndas[0].user, is_verified=True)
+        make_investor_kyc(self.ndas[1].user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('admin_compliance_export'), params, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+
+    def test_archive_contents(self):
+        with self.assertLogs('apis', 'WARNING'):
+            archive = self.export(verified='verified')
+
+        first, second, missing = self.ndas
+        self.assertCountEqual(archive.namelist(), [
+            'nda/agreements.csv',
+            f'nda/{first.pk}/agreement.pdf', f'nda/{first.pk}/signature.png',
+            f'nda/{second.pk}/agreement.pdf', f'nda/{second.pk}/signature.png',
+            'kyc/investor_kyc.csv', 'kyc/farmer_kyc.csv',
+            'errors.txt', 'manifest.json',
+        ])
+        self.assertEqual(archive.read(f'nda/{first.pk}/agreement.pdf'), self.stored_pdf)
+        self.assertTrue(archive.read(f'nda/{second.pk}/agreement.pdf').startswith(b'%PDF-'))
+        self.assertTrue(archive.read('errors.txt').decode().startswith(f'nda {missing.pk}: '))
+
+        agreements = archive.read('nda/agreements.csv').decode().splitlines()
+        self.assertEqual(len(agreements), 4)
+        self.assertTrue(agreements[0].startswith('id,user_id,full_name'))
+
+        manifest = json.loads(archive.read('manifest.json'))
+        self.assertEqual(manifest['counts'], {'nda': 3, 'investor_kyc': 0, 'farmer_kyc': 1})
+        self.assertEqual(manifest['errors'], 1)
+        self.assertEqual(manifest['filters']['verified'], True)
+
+    def test_kyc_only_as_json_lines(self):
+        archive = self.export(include='kyc', metadata='jsonl')
+
+        self.assertCountEqual(
+            archive.namelist(), ['kyc/investor_kyc.jsonl', 'kyc/farmer_kyc.jsonl', 'manifest.json'],
+        )
+        rows = [json.loads(line) for line in archive.read('kyc/investor_kyc.jsonl').decode().splitlines()]
+        self.assertEqual([row['user_id'] for row in rows], [self.ndas[1].user_id])
+
+    def test_rejects_bad_filters(self):
+        url = reverse('admin_compliance_export')
+        for params in [{'verified': 'maybe'}, {'metadata': 'xml'}, {'include': 'nda,files'},
+                       {'submitted_after': 'yesterday'}]:
+            self.assertEqual(self.client.get(url, params, **self.auth).status_code, 400, params)
+
+
+class BlobCacheTests(SimpleTestCase):
+
+    def test_evicts_least_recently_used(self):
+        blobs = BlobCache(max_bytes=10, max_blob=8)
+        blobs.put('a', b'aaaa')
+        blobs.put('b', b'bbbb')
+        blobs.get('a')
+        blobs.put('c', b'cccc')
+
+        self.assertIsNone(blobs.get('b'))
+        self.assertEqual(blobs.get('a'), b'aaaa')
+        self.assertEqual(blobs.get('c'), b'cccc')
+
+    def test_large_blobs_are_not_cached(self):
+        blobs = BlobCache(max_bytes=100, max_blob=8)
+        blobs.put('big', b'x' * 9)
+
+        self.assertIsNone(blobs.get('big'))
+
+
+class StorageFetchTests(SimpleTestCase):
+
+    def setUp(self):
+        get_blob_cache().clear()
+        self.addCleanup(get_blob_cache().clear)
+        self.storage = mock.Mock(location='media', bucket_name='bucket')
+        patcher = mock.patch('apis.storage_fetch.get_client')
+        self.s3 = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+
+    def serve(self, objects, barrier=None):
+        def get_object(Bucket, Key):
+            if barrier is not None:
+                barrier.wait(timeout=5)
+            if Key not in objects:
+                raise OSError(f'no such key {Key}')
+            return {'Body': BytesIO(objects[Key])}
+        self.s3.get_object.side_effect = get_object
+
+    def test_repeat_fetch_is_served_from_cache(self):
+        self.serve({'media/a.png': b'png'})
+
+        self.assertEqual(fetch(self.storage, 'a.png'), b'png')
+        self.assertEqual(fetch(self.storage, 'a.png'), b'png')
+        self.assertEqual(self.s3.get_object.call_count, 1)
+
+        fetch(self.storage, 'a.png', use_cache=False)
+        self.assertEqual(self.s3.get_object.call_count, 2)
+
+    def test_fetch_many_runs_concurrently(self):
+        # Every fetch waits for the other two, so this only passes if they overlap
+        self.serve({'media/a': b'a', 'media/b': b'b'}, threading.Barrier(3))
+
+        with self.assertLogs('apis.storage_fetch', 'WARNING'):
+            results, errors = fetch_many(self.storage, ['a', 'b', 'missing', 'a', ''])
+
+        self.assertEqual(results, {'a': b'a', 'b': b'b'})
+        self.assertEqual(list(errors), ['missing'])
+        self.assertEqual(self.s3.get_object.call_count, 3)
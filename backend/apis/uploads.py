@@ -0,0 +1,247 @@
+from datetime import timedelta
+import logging
+import math
+import os
+import uuid
+
+from botocore.exceptions import ClientError
+from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+from backend.storage_backends import MediaStorage, object_key
+from .models import DirectUpload
+
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+# S3 requires every part except the last to be at least 5 MB
+PART_SIZE = 8 * MB
+MAX_PARTS = 10000
+
+UPLOAD_RULES = {
+    'proposal': {
+        'upload_to': 'proposals/original/',
+        'max_size': 100 * MB,
+        'extensions': ['.pdf'],
+        'content_types': ['application/pdf'],
+    },
+    'id_document': {
+        'upload_to': 'documents/id/',
+        'max_size': 20 * MB,
+        'extensions': ['.pdf', '.jpg', '.jpeg', '.png'],
+        'content_types': ['application/pdf', 'image/jpeg', 'image/png'],
+    },
+    'profile_picture': {
+        'upload_to': 'profiles/',
+        'max_size': 20 * MB,
+        'extensions': ['.jpg', '.jpeg', '.png'],
+        'content_types': ['image/jpeg', 'image/png'],
+    },
+}
+
+# Leading bytes of each accepted content type
+FILE_SIGNATURES = {
+    'application/pdf': [b'%PDF-'],
+    'image/png': [b'\x89PNG\r\n\x1a\n'],
+    'image/jpeg': [b'\xff\xd8\xff'],
+}
+
+
+class UploadError(Exception):
+    """Raised when a direct upload cannot be started, completed or attached"""
+
+
+def _client(storage):
+    return storage.bucket.meta.client
+
+
+def validate_upload_request(purpose, filename, content_type, size):
+    """Check a requested upload against the rules for its purpose"""
+    rules = UPLOAD_RULES.get(purpose)
+    if rules is None:
+        raise UploadError(f"Unknown upload purpose: {purpose}")
+
+    if not any(filename.lower().endswith(ext) for ext in rules['extensions']):
+        raise UploadError(f"File must be one of: {', '.join(rules['extensions'])}")
+
+    if content_type not in rules['content_types']:
+        raise UploadError(f"Content type must be one of: {', '.join(rules['content_types'])}")
+
+    if size <= 0 or size > rules['max_size']:
+        raise UploadError(f"File size must be between 1 byte and {rules['max_size'] // MB}MB")
+
+    return rules
+
+
+def initiate_upload(user, purpose, filename, content_type, size):
+    """
+    Start a multipart upload in MediaStorage and return the DirectUpload
+    record together with one presigned PUT URL per part.
+    """
+    rules = validate_upload_request(purpose, filename, content_type, size)
+
+    part_count = max(1, math.ceil(size / PART_SIZE))
+    if part_count > MAX_PARTS:
+        raise UploadError("File is too large to upload")
+
+    storage = MediaStorage()
+    safe_name = get_valid_filename(os.path.basename(filename))
+    name = f"{rules['upload_to']}{uuid.uuid4().hex}_{safe_name}"
+    key = object_key(storage, name)
+
+    client = _client(storage)
+    multipart = client.create_multipart_upload(
+        Bucket=storage.bucket_name,
+        Key=key,
+        ContentType=content_type,
+        ACL=storage.default_acl,
+    )
+
+    upload = DirectUpload.objects.create(
+        user=user,
+        purpose=purpose,
+        name=name,
+        filename=safe_name,
+        content_type=content_type,
+        size=size,
+        upload_id=multipart['UploadId'],
+    )
+
+    parts = [
+        {
+            'part_number': number,
+            'url': client.generate_presigned_url(
+                'upload_part',
+                Params={
+                    'Bucket': storage.bucket_name,
+                    'Key': key,
+                    'UploadId': upload.upload_id,
+                    'PartNumber': number,
+                },
+                ExpiresIn=settings.DIRECT_UPLOAD_URL_EXPIRY,
+            ),
+        }
+        for number in range(1, part_count + 1)
+    ]
+
+    return upload, parts, PART_SIZE
+
+
+def _discard(storage, upload, key):
+    try:
+        _client(storage).delete_object(Bucket=storage.bucket_name, Key=key)
+    except Exception as e:
+        logger.warning(f"Could not delete rejected upload {upload.id}: {e}")
+    upload.status = 'aborted'
+    upload.save(update_fields=['status'])
+
+
+def complete_upload(upload, parts):
+    """
+    Finish the multipart upload, then check the stored object's size and
+    leading bytes before marking it ready to attach to a model.
+    """
+    if upload.status != 'initiated':
+        raise UploadError(f"Upload is already {upload.status}")
+
+    storage = MediaStorage()
+    key = object_key(storage, upload.name)
+    client = _client(storage)
+
+    client.complete_multipart_upload(
+        Bucket=storage.bucket_name,
+        Key=key,
+        UploadId=upload.upload_id,
+        MultipartUpload={
+            'Parts': [
+                {'PartNumber': int(part['part_number']), 'ETag': part['etag']}
+                for part in sorted(parts, key=lambda p: int(p['part_number']))
+            ]
+        },
+    )
+
+    head = client.head_object(Bucket=storage.bucket_name, Key=key)
+    if head['ContentLength'] != upload.size or head['ContentLength'] > UPLOAD_RULES[upload.purpose]['max_size']:
+        _discard(storage, upload, key)
+        raise UploadError("Uploaded file size does not match the declared size")
+
+    head_bytes = client.get_object(Bucket=storage.bucket_name, Key=key, Range='bytes=0-15')['Body'].read()
+    if not any(head_bytes.startswith(sig) for sig in FILE_SIGNATURES[upload.content_type]):
+        _discard(storage, upload, key)
+        raise UploadError("Uploaded file content does not match its type")
+
+    upload.status = 'completed'
+    upload.completed_at = timezone.now()
+    upload.save(update_fields=['status', 'completed_at'])
+    return upload
+
+
+def claim_upload(user, upload_id, purpose):
+    """
+    Return the storage name of a completed upload owned by ``user`` and
+    mark it attached so it can't be reused.
+    """
+    updated = DirectUpload.objects.filter(
+        id=upload_id, user=user, purpose=purpose, status='completed'
+    ).update(status='attached')
+
+    if not updated:
+        raise UploadError("Upload not found or not completed")
+
+    return DirectUpload.objects.values_list('name', flat=True).get(id=upload_id)
+
+
+@shared_task
+def abort_stale_uploads():
+    """
+    Abort multipart uploads that were started but never completed, and
+    delete completed uploads that were never attached to a model
+    """
+    now = timezone.now()
+    storage = MediaStorage()
+    client = _client(storage)
+
+    cutoff = now - timedelta(seconds=settings.DIRECT_UPLOAD_URL_EXPIRY) - timedelta(hours=1)
+    aborted = []
+    for upload in DirectUpload.objects.filter(status='initiated', created_at__lt=cutoff).iterator():
+        try:
+            client.abort_multipart_upload(
+                Bucket=storage.bucket_name,
+                Key=object_key(storage, upload.name),
+                UploadId=upload.upload_id,
+            )
+        except ClientError as e:
+            # Already aborted or completed on the storage side: nothing left to clean up
+            if e.response.get('Error', {}).get('Code') != 'NoSuchUpload':
+                logger.warning(f"Could not abort upload {upload.id}: {e}")
+                continue
+        except Exception as e:
+            logger.warning(f"Could not abort upload {upload.id}: {e}")
+            continue
+        aborted.append(upload.id)
+
+    # Only the uploads aborted above; failures are retried on the next run
+    DirectUpload.objects.filter(id__in=aborted, status='initiated').update(status='aborted')
+
+    # Mark unattached uploads aborted before deleting them, so a concurrent
+    # claim_upload either wins the row first or finds nothing to attach
+    cutoff = now - timedelta(seconds=settings.DIRECT_UPLOAD_ATTACH_WINDOW)
+    with transaction.atomic():
+        unattached = list(
+            DirectUpload.objects.select_for_update(skip_locked=True)
+            .filter(status='completed', completed_at__lt=cutoff)
+            .values_list('id', 'name')
+        )
+        DirectUpload.objects.filter(id__in=[pk for pk, _ in unattached]).update(status='aborted')
+
+    for pk, name in unattached:
+        try:
+            client.delete_object(Bucket=storage.bucket_name, Key=object_key(storage, name))
+        except Exception as e:
+            logger.warning(f"Could not delete unattached upload {pk}: {e}")
+
+    return f"Aborted {len(aborted)} stale uploads and removed {len(unattached)} unattached uploads"
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from apis.views import auth_views, kyc_views, opportunities_views, projects_views
+from apis.views import auth_views, compliance_views, files_views, kyc_views, notifications_views, opportunities_views, projects_views
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 
@@ -25,6 +25,9 @@ urlpatterns = [
     path('kyc/farmer/submit/', kyc_views.submit_farmer_kyc, name='submit_farmer_kyc'),
     path('admin/kyc/pending/', kyc_views.admin_list_pending_kyc, name='admin_list_pending_kyc'),
     path('admin/kyc/verify/<int:user_id>/', kyc_views.admin_verify_kyc, name='admin_verify_kyc'),
+    path('admin/kyc/verify/bulk/', kyc_views.admin_bulk_verify_kyc, name='admin_bulk_verify_kyc'),
+    path('admin/notifications/', notifications_views.admin_notifications, name='admin_notifications'),
+    path('admin/compliance/export/', compliance_views.admin_compliance_export, name='admin_compliance_export'),
     path('kyc/request-change/', kyc_views.request_kyc_change, name='request_kyc_change'),
     path('kyc/user/', kyc_views.get_user_kyc),
     path('kyc/status',kyc_views.get_kyc_status),
@@ -46,7 +49,9 @@ urlpatterns = [
     path('projects/create/', projects_views.create_project, name='project-create'),
     path('projects/', projects_views.list_projects, name='project-list'),
     path('projects/<uuid:project_id>/', projects_views.project_detail, name='project-detail'),
+    path('projects/<uuid:project_id>/watermark-status/', projects_views.project_watermark_status, name='project-watermark-status'),
     path('farmer/projects/', projects_views.farmer_projects, name='farmer-project-list'),
+    path('farmer/projects/counts/', projects_views.farmer_project_counts, name='farmer-project-counts'),
     path('media/proposals/watermarked/<str:filename>', projects_views.serve_watermarked_proposal),
     path('projects/search/', projects_views.search_projects, name='search_projects'),
     path('projects/sum/', projects_views.farmer_projects_sum),
@@ -54,5 +59,14 @@ urlpatterns = [
     path('submit-nda/', projects_views.submit_nda),
      path('check-nda-status/', projects_views.check_nda_status, name='check-nda-status'),
     path('download-nda/', projects_views.download_nda, name='download-nda-pdf'),
+
+    # SIGNED DOWNLOAD URLS
+    path('files/proposals/<uuid:project_id>/', files_views.proposal_signed_url, name='proposal-signed-url'),
+    path('files/kyc/<str:kyc_type>/<int:kyc_id>/', files_views.kyc_document_signed_url, name='kyc-document-signed-url'),
+    path('files/nda/<int:nda_id>/signature/', files_views.nda_signature_signed_url, name='nda-signature-signed-url'),
+
+    # DIRECT UPLOADS
+    path('uploads/initiate/', files_views.initiate_direct_upload, name='initiate-direct-upload'),
+    path('uploads/<uuid:upload_id>/complete/', files_views.complete_direct_upload, name='complete-direct-upload'),
 ]
 
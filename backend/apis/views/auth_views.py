@@ -7,16 +7,18 @@ from rest_framework import status
 from django.contrib.auth import authenticate, logout, get_user_model
 from django.contrib.auth.models import User
 from django.utils import timezone  
-from django.core.mail import EmailMessage
 from django.conf import settings
 from django.urls import reverse
 from django.db import transaction
-from ..models import  OTPToken,  PasswordReset, UserProfile
+from ..models import  PasswordReset, UserProfile
 from ..serializers import (
     PasswordResetRequestSerializer, PasswordResetSerializer, UserLoginSerializer, UserProfileSerializer, 
     UserSerializer, UserSignUpSerializer,UserUpdateSerializer, 
 )
-from rest_framework_simplejwt.tokens import RefreshToken
+from ..authentication import issue_tokens
+from ..authz import invalidate_auth_context
+from ..mailer import queue_email
+from ..otp import OTP_EXPIRED, OTP_INVALID, OTP_LOCKED, OTP_MISSING, issue_otp, verify_otp
 from django.http import  HttpResponseRedirect
 import logging
 import traceback
@@ -45,37 +47,25 @@ def signup_view(request):
         serializer = UserSignUpSerializer(data=data)
         if serializer.is_valid():
             try:
-                with transaction.atomic():
-                    user = serializer.save()
-                    
-                    try:
-                        profile = user.profile
-                    except UserProfile.DoesNotExist:
-                        profile = UserProfile.objects.create(
-                            user=user,
-                            phone_number=data.get('phone_number', ''),
-                            role=data.get('role', 'Farmer'),
-                            organization=data.get('organization', ''),
-                            investor_type=data.get('investor_type', '')
-                        )
-                        logger.info(f"Created profile for user {user.email}: {profile}")
-                    
-                    # Generate tokens
-                    refresh = RefreshToken.for_user(user)
-                    
-                    # Serialize user data
-                    user_data = UserSerializer(user).data
-                    
-                    logger.info(f"User {user.email} registered successfully")
-                    
-                    return Response({
-                        'success': True, 
-                        'message': 'Account created successfully',
-                        'user': user_data,
-                        'access': str(refresh.access_token),
-                        'refresh': str(refresh)
-                    }, status=status.HTTP_201_CREATED)
-                    
+                # Creates the user and profile in one transaction
+                user = serializer.save()
+
+                # Generate tokens
+                refresh = issue_tokens(user)
+
+                # Serialize user data
+                user_data = UserSerializer(user).data
+
+                logger.info(f"User {user.email} registered successfully")
+
+                return Response({
+                    'success': True, 
+                    'message': 'Account created successfully',
+                    'user': user_data,
+                    'access': str(refresh.access_token),
+                    'refresh': str(refresh)
+                }, status=status.HTTP_201_CREATED)
+
             except Exception as e:
                 logger.error(f"Error creating user: {str(e)}")
                 logger.error(f"Traceback: {traceback.format_exc()}")
@@ -119,21 +109,13 @@ def login_view(request):
                 
                 try:
                     with transaction.atomic():
-                        # Delete any existing OTPs for this user
-                        deleted_count = OTPToken.objects.filter(user=user).count()
-                        OTPToken.objects.filter(user=user).delete()
-                        logger.info(f"Deleted {deleted_count} existing OTPs for user {user.email}")
-                        
-                        # Create new OTP
-                        otp = OTPToken.objects.create(
-                            user=user,
-                            otp_expires_at=timezone.now() + timedelta(minutes=5)
-                        )
-                        logger.info(f"Created OTP {otp.otp_code} for user {user.email}")
+                        # Replaces any OTP the user already has
+                        otp_code = issue_otp(user)
+                        logger.info(f"Issued OTP for user {user.email}")
                         
                         message =  (
                         f"Hello {user.first_name},\n\n"
-                        f"Your One-Time Password (OTP) is: {otp.otp_code}\n\n"
+                        f"Your One-Time Password (OTP) is: {otp_code}\n\n"
                         f"This code will expire in 5 minutes. Please enter it to proceed with your login.\n\n"
                         f"Thank you,\n"
                         f"Agriconnect"
@@ -142,14 +124,8 @@ def login_view(request):
                         if not hasattr(settings, 'EMAIL_HOST_USER') or not settings.EMAIL_HOST_USER:
                             logger.warning("EMAIL_HOST_USER not configured, skipping email send")
                         else:
-                            email_message = EmailMessage(
-                                "Login Verification - OTP",
-                                message,
-                                settings.EMAIL_HOST_USER,
-                                [user.email]
-                            )
-                            email_message.send(fail_silently=False)
-                            logger.info(f"OTP email sent to {user.email}")
+                            queue_email("Login Verification - OTP", message, [user.email])
+                            logger.info(f"OTP email queued for {user.email}")
                         
                         return Response({
                             'success': True,
@@ -195,7 +171,7 @@ def verify_login_otp(request):
         username = request.data.get('username')
         otp_code = request.data.get('otp_code')
 
-        logger.info(f"OTP verification attempt for username: {username}, OTP: {otp_code}")
+        logger.info(f"OTP verification attempt for username: {username}")
 
         if not username or not otp_code:
             return Response({
@@ -207,33 +183,31 @@ def verify_login_otp(request):
             user = User.objects.get(username=username)
             logger.info(f"User found: {user.email}")
 
-            otp_token = OTPToken.objects.filter(user=user).order_by('-otp_created_at').first()
+            result = verify_otp(user, otp_code)
 
-            if not otp_token:
+            if result == OTP_MISSING:
                 logger.warning(f"No OTP found for user: {user.email}")
                 return Response({
                     'success': False,
                     'errors': {'general': 'No OTP found. Please request a new one.'}
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-            try:
-                if otp_token.is_expired():
-                    logger.warning(f"Expired OTP for user: {user.email}")
-                    otp_token.delete()
-                    return Response({
-                        'success': False,
-                        'errors': {'general': 'OTP has expired. Please request a new one.'}
-                    }, status=status.HTTP_400_BAD_REQUEST)
-            except Exception as e:
-                logger.error(f"Error checking OTP expiration: {e}")
-                logger.error(traceback.format_exc())
+            if result == OTP_EXPIRED:
+                logger.warning(f"Expired OTP for user: {user.email}")
                 return Response({
                     'success': False,
-                    'errors': {'general': 'OTP verification failed. Please try again.'}
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                    'errors': {'general': 'OTP has expired. Please request a new one.'}
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            if result == OTP_LOCKED:
+                logger.warning(f"Too many invalid OTP attempts for user: {user.email}")
+                return Response({
+                    'success': False,
+                    'errors': {'general': 'Too many invalid attempts. Please request a new OTP.'}
+                }, status=status.HTTP_400_BAD_REQUEST)
 
-            if otp_token.otp_code != otp_code:
-                logger.warning(f"Invalid OTP for user: {user.email}. Expected: {otp_token.otp_code}, Got: {otp_code}")
+            if result == OTP_INVALID:
+                logger.warning(f"Invalid OTP for user: {user.email}")
                 return Response({
                     'success': False,
                     'errors': {'general': 'Invalid OTP code. Please try again.'}
@@ -242,15 +216,10 @@ def verify_login_otp(request):
             logger.info(f"Valid OTP for user: {user.email}")
 
             with transaction.atomic():
-                otp_token.delete()
-
                 if not user.is_active:
                     user.is_active = True
                     user.save(update_fields=['is_active'])
 
-                refresh = RefreshToken.for_user(user)
-                access_token = refresh.access_token
-
                 try:
                     profile = user.profile
                 except UserProfile.DoesNotExist:
@@ -263,6 +232,9 @@ def verify_login_otp(request):
                     )
                     logger.info(f"Created missing profile for user: {user.email}")
 
+                refresh = issue_tokens(user)
+                access_token = refresh.access_token
+
                 user_data = {
                     'id': user.id,
                     'username': user.username,
@@ -333,23 +305,15 @@ def resend_login_otp(request):
         try:
             user = User.objects.get(username=username)
             
-            # Delete existing OTPs for this user
-            deleted_count = OTPToken.objects.filter(user=user).count()
-            OTPToken.objects.filter(user=user).delete()
-            logger.info(f"Deleted {deleted_count} existing OTPs for user {user.email}")
-            
-            # Create new OTP
+            # Replaces any OTP the user already has
             with transaction.atomic():
-                otp = OTPToken.objects.create(
-                    user=user,
-                    otp_expires_at=timezone.now() + timedelta(minutes=5)
-                )
-                logger.info(f"Created new OTP {otp.otp_code} for user {user.email}")
+                otp_code = issue_otp(user)
+                logger.info(f"Issued new OTP for user {user.email}")
                 
                 # Send OTP email
                 message =  (
                 f"Hello {user.first_name},\n\n"
-                f"Your One-Time Password (OTP) is: {otp.otp_code}\n\n"
+                f"Your One-Time Password (OTP) is: {otp_code}\n\n"
                 f"This code will expire in 5 minutes. Please enter it to proceed with your login.\n\n"
                 f"Thank you,\n"
                 f"Agriconnect"
@@ -357,17 +321,9 @@ def resend_login_otp(request):
                 
                 if not hasattr(settings, 'EMAIL_HOST_USER') or not settings.EMAIL_HOST_USER:
                     logger.warning("EMAIL_HOST_USER not configured, skipping email send")
-                    # For development - just log the OTP
-                    logger.info(f"DEV MODE - New OTP for {user.email}: {otp.otp_code}")
                 else:
-                    email_message = EmailMessage(
-                        "Login Verification - New OTP",
-                        message,
-                        settings.EMAIL_HOST_USER,
-                        [user.email]
-                    )
-                    email_message.send(fail_silently=False)
-                    logger.info(f"New OTP email sent to {user.email}")
+                    queue_email("Login Verification - New OTP", message, [user.email])
+                    logger.info(f"New OTP email queued for {user.email}")
                 
                 return Response({
                     'success': True,
@@ -403,7 +359,11 @@ def resend_login_otp(request):
 def logout_view(request):
     """User logout endpoint"""
     try:
+        # logout() swaps request.user for AnonymousUser
+        user_id = request.user.pk
         logout(request)
+        # Stop trusting role/KYC claims in tokens issued before logout
+        invalidate_auth_context([user_id])
         return Response({
             'success': True, 
             'message': 'Logged out successfully'
@@ -450,13 +410,7 @@ def forgot_password_view(request):
             )
 
 
-            email_message = EmailMessage(
-                email_subject,
-                email_body,
-                settings.EMAIL_HOST_USER,
-                [user.email]
-            )
-            email_message.send(fail_silently=True)
+            queue_email(email_subject, email_body, [user.email])
 
             return Response({
                 'success': True, 
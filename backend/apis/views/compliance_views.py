@@ -0,0 +1,70 @@
+import logging
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework import status
+from ..compliance_export import EXPORT_FORMATS, EXPORT_SECTIONS, VERIFIED_FILTERS, stream_compliance_export
+from ..kyc_review import parse_submitted
+
+
+logger = logging.getLogger(__name__)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_compliance_export(request):
+    """
+    Admin: download NDAs and KYC records as a streamed ZIP archive.
+    Filters: submitted_after, submitted_before, verified
+    (all/verified/unverified), include (nda,kyc) and metadata (csv/jsonl;
+    ``format`` is taken by DRF's format suffix handling).
+    """
+    dates = {}
+    for param in ['submitted_after', 'submitted_before']:
+        value = request.GET.get(param)
+        if value:
+            dates[param] = parse_submitted(value)
+            if dates[param] is None:
+                return Response({
+                    'success': False,
+                    'message': f'Invalid {param}: use an ISO date or datetime'
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+    verified = request.GET.get('verified', 'all')
+    if verified not in VERIFIED_FILTERS:
+        return Response({
+            'success': False,
+            'message': 'Invalid verified: use all, verified or unverified'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    export_format = request.GET.get('metadata', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return Response({
+            'success': False,
+            'message': f"Invalid metadata: use {' or '.join(EXPORT_FORMATS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    sections = [section for section in request.GET.get('include', ','.join(EXPORT_SECTIONS)).split(',') if section]
+    if not sections or any(section not in EXPORT_SECTIONS for section in sections):
+        return Response({
+            'success': False,
+            'message': f"Invalid include: use any of {', '.join(EXPORT_SECTIONS)}"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    logger.info(f"Compliance export requested by {request.user.username}: {request.GET.dict()}")
+
+    response = StreamingHttpResponse(
+        stream_compliance_export(
+            verified=VERIFIED_FILTERS[verified],
+            sections=sections,
+            export_format=export_format,
+            **dates,
+        ),
+        content_type='application/zip',
+    )
+    filename = f"compliance_export_{timezone.now():%Y%m%d_%H%M%S}.zip"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
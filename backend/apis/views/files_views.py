@@ -0,0 +1,181 @@
+import logging
+import os
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from backend.storage_backends import MediaStorage
+from ..models import DirectUpload, FarmerKYC, InvestorKYC, NDAAgreement, Project
+from ..permissions import CanViewProject
+from ..serializers import DirectUploadCompleteSerializer, DirectUploadInitiateSerializer
+from ..signed_urls import get_signed_url
+from ..uploads import UploadError, complete_upload, initiate_upload
+
+
+logger = logging.getLogger(__name__)
+
+
+def _signed_url_response(storage, name):
+    url, expires_at = get_signed_url(storage, name, filename=os.path.basename(name))
+    return Response({
+        'success': True,
+        'url': url,
+        'expires_at': expires_at,
+    }, status=status.HTTP_200_OK)
+
+
+def _owner_or_admin(request, owner_id):
+    return request.user.is_staff or request.user.is_superuser or owner_id == request.user.id
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, CanViewProject])
+def proposal_signed_url(request, project_id):
+    """Issue a short-lived download URL for a project's watermarked proposal"""
+    project = get_object_or_404(Project, id=project_id)
+
+    permission = CanViewProject()
+    if not permission.has_object_permission(request, None, project):
+        return Response({
+            'success': False,
+            'message': permission.message
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    if project.watermark_status != Project.WATERMARK_READY or not project.watermarked_proposal:
+        return Response({
+            'success': False,
+            'message': 'The watermarked proposal is not ready yet.',
+            'watermark_status': project.watermark_status
+        }, status=status.HTTP_409_CONFLICT)
+
+    return _signed_url_response(MediaStorage(), project.watermarked_proposal.name)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def kyc_document_signed_url(request, kyc_type, kyc_id):
+    """Issue a short-lived download URL for a KYC ID document (owner or admin)"""
+    if kyc_type == 'investor':
+        kyc = get_object_or_404(InvestorKYC, id=kyc_id)
+    elif kyc_type == 'farmer':
+        kyc = get_object_or_404(FarmerKYC, id=kyc_id)
+    else:
+        return Response({
+            'success': False,
+            'message': 'Invalid KYC type'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    if not _owner_or_admin(request, kyc.user_id):
+        return Response({
+            'success': False,
+            'message': 'You do not have permission to access this document.'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    if not kyc.id_document:
+        return Response({
+            'success': False,
+            'message': 'No ID document uploaded'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    return _signed_url_response(kyc.id_document.storage, kyc.id_document.name)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def nda_signature_signed_url(request, nda_id):
+    """Issue a short-lived download URL for an NDA signature (owner or admin)"""
+    nda = get_object_or_404(NDAAgreement, id=nda_id)
+
+    if not _owner_or_admin(request, nda.user_id):
+        return Response({
+            'success': False,
+            'message': 'You do not have permission to access this signature.'
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    if not nda.signature:
+        return Response({
+            'success': False,
+            'message': 'No signature uploaded'
+        }, status=status.HTTP_404_NOT_FOUND)
+
+    return _signed_url_response(nda.signature.storage, nda.signature.name)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def initiate_direct_upload(request):
+    """
+    Start a direct-to-storage multipart upload and return presigned URLs
+    for each part. The client PUTs the parts itself, then calls
+    complete_direct_upload with the returned ETags.
+    """
+    serializer = DirectUploadInitiateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        upload, parts, part_size = initiate_upload(request.user, **serializer.validated_data)
+    except UploadError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.exception("Error starting direct upload")
+        return Response({
+            'success': False,
+            'message': f'Error starting upload: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({
+        'success': True,
+        'upload_id': upload.id,
+        'part_size': part_size,
+        'parts': parts,
+        'expires_in': settings.DIRECT_UPLOAD_URL_EXPIRY,
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_direct_upload(request, upload_id):
+    """
+    Finalize a direct upload: assemble the parts, check the stored size
+    and file type, and make the upload available to attach (as
+    ``<field>_upload``) when creating a project or submitting KYC.
+    """
+    upload = get_object_or_404(DirectUpload, id=upload_id, user=request.user)
+
+    serializer = DirectUploadCompleteSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        upload = complete_upload(upload, serializer.validated_data['parts'])
+    except UploadError as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        logger.exception(f"Error completing direct upload {upload_id}")
+        return Response({
+            'success': False,
+            'message': f'Error completing upload: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({
+        'success': True,
+        'upload_id': upload.id,
+        'purpose': upload.purpose,
+        'size': upload.size,
+        'status': upload.status,
+    }, status=status.HTTP_200_OK)
@@ -1,4 +1,3 @@
-from django.core.mail import EmailMessage
 import logging
 from django.conf import settings
 from django.shortcuts import get_object_or_404
@@ -13,8 +12,15 @@ from django.db import transaction
 from ..serializers import (
     KYCPreFillSerializer,  InvestorKYCSerializer, FarmerKYCSerializer, 
     KYCVerificationLogSerializer, KYCStatusSerializer, KYCAdminUpdateSerializer,
+    KYCBulkVerifySerializer,
 )
 from ..models import InvestorKYC, FarmerKYC, KYCVerificationLog
+from ..notifications import record_admin_event
+from ..kyc_review import (
+    InvalidCursor, apply_decision, bulk_verify, decode_cursor, parse_submitted,
+    pending_queue, review_queue_page, serialize_review_items,
+)
+from rest_framework.utils.urls import replace_query_param
 import traceback
 from rest_framework import status
 
@@ -56,10 +62,9 @@ def submit_investor_kyc(request):
                     f"Phone: {kyc.phone_number}\n"
                     f"Role: {request.user.profile.role}\n"
                 )
-                email = EmailMessage(subject, msg, settings.EMAIL_HOST_USER, [settings.EMAIL_HOST_USER])
-                email.send(fail_silently=False)
+                record_admin_event('investor_kyc', subject, msg)
             except Exception as email_error:
-                logger.warning(f"Failed to send investor KYC email: {str(email_error)}")
+                logger.warning(f"Failed to record investor KYC notification: {str(email_error)}")
 
             return Response({
                 'success': True,
@@ -117,9 +122,10 @@ def submit_farmer_kyc(request):
             'id_document', 'profile_picture'
         ]
 
+        # Documents may also arrive as completed direct uploads (<field>_upload)
         missing_fields = []
         for field in required_fields:
-            if field not in request.data or not request.data.get(field):
+            if not request.data.get(field) and not request.data.get(f"{field}_upload"):
                 missing_fields.append(field)
 
         if missing_fields:
@@ -152,15 +158,9 @@ def submit_farmer_kyc(request):
                             f"Role: {user.profile.role}\n"
                             f"KYC ID: {kyc.id}\n"
                         )
-                        email = EmailMessage(
-                            subject,
-                            msg,
-                            settings.EMAIL_HOST_USER,
-                            [settings.EMAIL_HOST_USER]
-                        )
-                        email.send(fail_silently=False)
+                        record_admin_event('farmer_kyc', subject, msg)
                     except Exception as email_error:
-                        logger.warning(f"Failed to send farmer KYC email: {str(email_error)}")
+                        logger.warning(f"Failed to record farmer KYC notification: {str(email_error)}")
 
                     return Response({
                         'success': True,
@@ -325,43 +325,52 @@ def get_kyc_logs(request):
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
 def admin_list_pending_kyc(request):
-    """Admin: List all pending KYC submissions"""
+    """
+    Admin: page through pending KYC submissions, investors and farmers
+    merged oldest first. Filters: type (investor/farmer/all), role,
+    submitted_before, submitted_after; paged with cursor and page_size.
+    """
     try:
-        kyc_type = request.GET.get('type', 'all')  
-        
-        data = []
-        
-        if kyc_type in ['investor', 'all']:
-            investor_kycs = InvestorKYC.objects.filter(is_verified=False)
-            for kyc in investor_kycs:
-                serializer = InvestorKYCSerializer(kyc)
-                kyc_data = serializer.data
-                kyc_data['user_info'] = {
-                    'id': kyc.user.id,
-                    'username': kyc.user.username,
-                    'email': kyc.user.email
-                }
-                kyc_data['kyc_type'] = 'investor'
-                data.append(kyc_data)
-        
-        if kyc_type in ['farmer', 'all']:
-            farmer_kycs = FarmerKYC.objects.filter(is_verified=False)
-            for kyc in farmer_kycs:
-                serializer = FarmerKYCSerializer(kyc)
-                kyc_data = serializer.data
-                kyc_data['user_info'] = {
-                    'id': kyc.user.id,
-                    'username': kyc.user.username,
-                    'email': kyc.user.email
-                }
-                kyc_data['kyc_type'] = 'farmer'
-                data.append(kyc_data)
-        
+        kyc_type = request.GET.get('type', 'all')
+        if kyc_type not in ['investor', 'farmer', 'all']:
+            return Response({
+                'success': False,
+                'message': 'Invalid KYC type'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        dates = {}
+        for param in ['submitted_before', 'submitted_after']:
+            value = request.GET.get(param)
+            if value:
+                dates[param] = parse_submitted(value)
+                if dates[param] is None:
+                    return Response({
+                        'success': False,
+                        'message': f'Invalid {param}: use an ISO date or datetime'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            page_size = max(1, min(int(request.GET.get('page_size', 50)), 200))
+        except ValueError:
+            page_size = 50
+
+        cursor = request.GET.get('cursor')
+        cursor = decode_cursor(cursor) if cursor else None
+
+        sources = pending_queue(kyc_type, role=request.GET.get('role'), **dates)
+        items, next_cursor = review_queue_page(sources, cursor, page_size)
+
         return Response({
             'success': True,
-            'data': data
+            'data': serialize_review_items(items),
+            'next': replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor) if next_cursor else None
         }, status=status.HTTP_200_OK)
-        
+
+    except InvalidCursor as e:
+        return Response({
+            'success': False,
+            'message': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
             'success': False,
@@ -404,19 +413,7 @@ def admin_verify_kyc(request, user_id):
                 'message': 'Invalid user role'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        if action == 'approved':
-            kyc.is_verified = True
-            kyc.verification_date = timezone.now()
-            kyc.changes_allowed = allow_changes
-        elif action == 'rejected':
-            kyc.is_verified = False
-            kyc.verification_date = None
-            kyc.changes_allowed = False
-        else:
-            kyc.is_verified = False
-            kyc.verification_date = None
-            kyc.changes_allowed = False
-        
+        apply_decision(kyc, action, allow_changes)
         kyc.save()
         
         KYCVerificationLog.objects.create(
@@ -444,6 +441,37 @@ def admin_verify_kyc(request, user_id):
         }, status=status.HTTP_404_NOT_FOUND if 'not found' in str(e).lower() else status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def admin_bulk_verify_kyc(request):
+    """
+    Admin: approve/reject many users' KYC in one transaction.
+    Body: {"decisions": [{"user_id", "action", "allow_changes"}, ...]}
+    """
+    serializer = KYCBulkVerifySerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        results = bulk_verify(serializer.validated_data['decisions'], request.user)
+    except Exception as e:
+        logger.exception("Error in bulk KYC verification")
+        return Response({
+            'success': False,
+            'message': f'Error verifying KYC: {str(e)}'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    processed = sum(1 for result in results if result['success'])
+    return Response({
+        'success': True,
+        'message': f'{processed} of {len(results)} KYC decisions applied',
+        'data': results
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def request_kyc_change(request):
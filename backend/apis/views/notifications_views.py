@@ -0,0 +1,48 @@
+import logging
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework import status
+from ..models import AdminNotification
+from ..serializers import AdminNotificationSerializer
+
+
+logger = logging.getLogger(__name__)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_notifications(request):
+    """
+    Admin: poll for notification events newer than ``after`` (the last id
+    seen), oldest first, optionally filtered by ``kind``. Without ``after``
+    the latest ``limit`` events are returned.
+    """
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 50)), 200))
+    except ValueError:
+        limit = 50
+
+    queryset = AdminNotification.objects.all()
+    kind = request.GET.get('kind')
+    if kind:
+        queryset = queryset.filter(kind=kind)
+
+    after = request.GET.get('after')
+    if after:
+        try:
+            after = int(after)
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'Invalid after: use the id of the last event seen'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        events = list(queryset.filter(id__gt=after).order_by('id')[:limit])
+    else:
+        events = list(queryset.order_by('-id')[:limit])[::-1]
+
+    return Response({
+        'success': True,
+        'data': AdminNotificationSerializer(events, many=True).data,
+        'last_id': events[-1].id if events else after,
+    }, status=status.HTTP_200_OK)
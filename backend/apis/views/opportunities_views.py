@@ -5,10 +5,12 @@ from rest_framework.response import Response
 from rest_framework import status
 from ..models import  Opportunity
 from ..serializers import (OpportunityCreateSerializer, OpportunitySerializer,  )
-from django.core.paginator import Paginator
+from ..opportunities import (
+    cached_opportunity_response, get_opportunity_stats, normalize_list_params,
+    pending_opportunity_views, record_opportunity_view,
+)
+from django.utils.http import parse_etags
 from rest_framework import status
-from django.db import models
-from django.db.models import Q
 
 
 # OPPORTUNITIES
@@ -20,39 +22,8 @@ def opportunity_list(request):
     Get all opportunities with optional filtering and pagination
     """
     try:
-        opportunities = Opportunity.objects.filter(is_active=True)
-        
-        # Type filter
-        opportunity_type = request.GET.get('type', None)
-        if opportunity_type:
-            opportunities = opportunities.filter(type=opportunity_type)
-        
-        # Search filter
-        search = request.GET.get('search', None)
-        if search:
-            opportunities = opportunities.filter(
-                Q(title__icontains=search) |
-                Q(organization__icontains=search) |
-                Q(description__icontains=search)
-            )
-        
-        # Pagination
-        page_size = int(request.GET.get('page_size', 20))
-        page = int(request.GET.get('page', 1))
-        
-        paginator = Paginator(opportunities, page_size)
-        page_obj = paginator.get_page(page)
-        
-        serializer = OpportunitySerializer(page_obj, many=True)
-        
-        return Response({
-            'results': serializer.data,
-            'count': paginator.count,
-            'next': page_obj.has_next(),
-            'previous': page_obj.has_previous(),
-            'current_page': page,
-            'total_pages': paginator.num_pages
-        })
+        params = normalize_list_params(request.GET)
+        return Response(cached_opportunity_response('list', params))
     
     except Exception as e:
         return Response(
@@ -67,15 +38,15 @@ def opportunity_detail(request, pk):
     Get a single opportunity by ID
     """
     try:
-        opportunity = get_object_or_404(Opportunity, pk=pk, is_active=True)
-        opportunity.increment_views()
-        serializer = OpportunitySerializer(opportunity)
-        return Response(serializer.data)
-    except Opportunity.DoesNotExist:
-        return Response(
-            {'error': 'Opportunity not found'}, 
-            status=status.HTTP_404_NOT_FOUND
-        )
+        data = cached_opportunity_response('detail', {'pk': int(pk)})
+        if data is None:
+            return Response(
+                {'error': 'Opportunity not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        record_opportunity_view(request, data['id'])
+        return Response({**data, 'views': data['views'] + pending_opportunity_views(data['id'])})
     except Exception as e:
         return Response(
             {'error': f'An error occurred: {str(e)}'}, 
@@ -176,34 +147,21 @@ def opportunity_delete(request, pk):
 @permission_classes([AllowAny])
 def opportunity_stats(request):
     """
-    Get general statistics about opportunities
+    Get general statistics about opportunities.
+    Served from a cached snapshot; clients revalidate with If-None-Match.
     """
     try:
-        active_opportunities = Opportunity.objects.filter(is_active=True)
-        
-        total_opportunities = active_opportunities.count()
-        total_views = active_opportunities.aggregate(
-            total=models.Sum('views')
-        )['total'] or 0
-        total_applicants = active_opportunities.aggregate(
-            total=models.Sum('applicants')
-        )['total'] or 0
-        
-        # Get opportunities by type
-        type_stats = {}
-        for choice in Opportunity.OPPORTUNITY_TYPES:
-            type_key = choice[0]
-            type_label = choice[1]
-            count = active_opportunities.filter(type=type_key).count()
-            if count > 0:  # Only include types with opportunities
-                type_stats[type_label] = count
-        
-        return Response({
-            'total_opportunities': total_opportunities,
-            'total_views': total_views,
-            'total_applicants': total_applicants,
-            'opportunities_by_type': type_stats
-        })
+        snapshot = get_opportunity_stats()
+        etag = snapshot['etag']
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(snapshot['stats'])
+
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, max-age=60'
+        return response
     
     except Exception as e:
         return Response(
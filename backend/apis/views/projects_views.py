@@ -1,17 +1,25 @@
-from django.core.mail import EmailMessage
 import os
 from django.shortcuts import get_object_or_404
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
+from ..authentication import ClaimsJWTAuthentication
+from ..authz import get_auth_context
 from ..permissions import CanViewProject, IsVerifiedFarmer
 from ..models import  InvestorKYC, NDAAgreement, Project, UserProfile
-from ..serializers import  NDAAgreementSerializer, ProjectCreateSerializer, ProjectSerializer
+from ..serializers import  NDAAgreementSerializer, ProjectCreateSerializer, ProjectSerializer, signed_proposal_url
 from django.views.decorators.clickjacking import xframe_options_exempt
-from django.http import FileResponse, Http404
-from django.db.models import Sum, Count
+from django.views.decorators.http import require_http_methods
+from django.http import Http404
+from backend.storage_backends import MediaStorage
+from ..nda import enqueue_nda_render, nda_is_current, store_nda_pdf
+from ..notifications import record_admin_event
+from ..pagination import RankKeysetPagination, paginate_projects
+from ..search import search as search_queryset
+from ..streaming import stream_storage_object
+from django.db.models import Count, Q, Sum
 from datetime import timedelta
 from django.utils import timezone
 import logging
@@ -44,16 +52,10 @@ def create_project(request):
                     f"Project ID: {project.id}\n"
                 )
 
-                email = EmailMessage(
-                    subject,
-                    msg,
-                    settings.EMAIL_HOST_USER,
-                    [settings.EMAIL_HOST_USER],  
-                )
-                email.send(fail_silently=False)
+                record_admin_event('project', subject, msg)
 
             except Exception as email_error:
-                logger.warning(f"Failed to send admin notification: {str(email_error)}")
+                logger.warning(f"Failed to record admin notification: {str(email_error)}")
 
             return Response({
                 'success': True,
@@ -75,12 +77,12 @@ def create_project(request):
 
 
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
 @permission_classes([IsAuthenticated, CanViewProject])
 def list_projects(request):
-    """List all approved projects (viewable by all authenticated users)"""
-    projects = Project.objects.filter(status='approved').order_by('-created_at')
-    serializer = ProjectSerializer(projects, many=True, context={'request': request})
-    return Response(serializer.data)
+    """List approved projects, newest first (cursor-paginated)"""
+    projects = Project.objects.filter(status='approved').select_related('farmer')
+    return paginate_projects(request, projects, ProjectSerializer)
 
 
 @api_view(['GET'])
@@ -95,52 +97,96 @@ def project_detail(request, project_id):
 
 
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
+@permission_classes([IsAuthenticated])
+def project_watermark_status(request, project_id):
+    """
+    Poll the progress of the background watermarking job for a project
+    (project owner or admin only)
+    """
+    project = get_object_or_404(Project, id=project_id)
+
+    if project.farmer_id != request.user.id and not request.user.is_staff:
+        return Response({'error': 'You can only view the status of your own projects'},
+            status=status.HTTP_403_FORBIDDEN)
+
+    return Response({
+        'project_id': project.id,
+        'watermark_status': project.watermark_status,
+        'attempts': project.watermark_attempts,
+        'error': project.watermark_error or None,
+        'watermarked_proposal': signed_proposal_url(project),
+    })
+
+
+@api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
 @permission_classes([IsAuthenticated, IsVerifiedFarmer])
 def farmer_projects(request):
     """
-    List all projects for the authenticated farmer
+    List all projects for the authenticated farmer (cursor-paginated)
     """
-    if not hasattr(request.user, 'profile') or request.user.profile.role != 'Farmer':
+    if not get_auth_context(request).is_farmer:
         return Response({'error': 'User is not a farmer'}, 
             status=status.HTTP_403_FORBIDDEN)
     
-    projects = Project.objects.filter(farmer=request.user).order_by('-created_at')
-    serializer = ProjectSerializer(projects, many=True, context={'request': request})
-    return Response(serializer.data)
+    projects = Project.objects.filter(farmer=request.user).select_related('farmer')
+    return paginate_projects(request, projects, ProjectSerializer)
+
+
+@api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
+@permission_classes([IsAuthenticated, IsVerifiedFarmer])
+def farmer_project_counts(request):
+    """
+    Count the authenticated farmer's projects per status in one aggregate
+    query, so dashboards don't have to page through every project
+    """
+    if not get_auth_context(request).is_farmer:
+        return Response({'error': 'User is not a farmer'}, 
+            status=status.HTTP_403_FORBIDDEN)
+
+    counts = Project.objects.filter(farmer=request.user).aggregate(
+        total=Count('id'),
+        **{key: Count('id', filter=Q(status=key)) for key, _ in Project.STATUS_CHOICES}
+    )
+    return Response({'success': True, 'data': counts}, status=status.HTTP_200_OK)
 
 
 @xframe_options_exempt
+@require_http_methods(['GET', 'HEAD'])
 def serve_watermarked_proposal(request, filename):
-    full_path = os.path.join(settings.MEDIA_ROOT, 'proposals', 'watermarked', filename)
+    """
+    Stream a watermarked proposal from MediaStorage with Range and
+    conditional GET support so PDF viewers can load it incrementally
+    """
+    name = f"proposals/watermarked/{filename}"
 
-    if not os.path.exists(full_path):
+    if not Project.objects.filter(watermarked_proposal=name).exists():
         raise Http404("Watermarked proposal not found.")
 
-    return FileResponse(open(full_path, 'rb'), content_type='application/pdf')
+    return stream_storage_object(request, MediaStorage(), name, 'application/pdf', filename=filename)
 
 @api_view(['GET'])
+@authentication_classes([ClaimsJWTAuthentication])
 @permission_classes([IsAuthenticated, CanViewProject])
 def search_projects(request):
     """
-    Search projects with multiple filters
+    Search approved projects (cursor-paginated).
+    ``search`` runs a ranked full-text query, best matches first;
+    without it results are newest first.
     """
-    projects = Project.objects.filter(status='approved')
+    projects = Project.objects.filter(status='approved').select_related('farmer')
     
-    # Multiple filter options
     farmer_id = request.query_params.get('farmer_id')
-    project_type = request.query_params.get('type')
-    location = request.query_params.get('location')
+    search = request.query_params.get('search', '').strip()
     
     if farmer_id:
         projects = projects.filter(farmer_id=farmer_id)
-    if project_type:
-        projects = projects.filter(project_type=project_type)
-    if location:
-        projects = projects.filter(location__icontains=location)
+    if search:
+        return paginate_projects(request, search_queryset(projects, search), ProjectSerializer, RankKeysetPagination)
     
-    projects = projects.order_by('-created_at')
-    serializer = ProjectSerializer(projects, many=True, context={'request': request})
-    return Response(serializer.data)
+    return paginate_projects(request, projects, ProjectSerializer)
 
 
 @api_view(['GET'])
@@ -202,12 +248,12 @@ def get_recommended_projects(request):
     projects_due_soon = Project.objects.filter(
         status='approved',
         deadline__range=[today, deadline_cutoff]
-    ).order_by('deadline')
+    ).select_related('farmer').order_by('deadline')
 
     projects_within_budget = Project.objects.filter(
         status='approved',
         target_amount__lte=annual_income
-    ).order_by('deadline')
+    ).select_related('farmer').order_by('deadline')
 
     # Serialize separately
     due_soon_serialized = ProjectSerializer(projects_due_soon, many=True, context={'request': request})
@@ -223,16 +269,6 @@ def get_recommended_projects(request):
 
 # NDA VIEW
 
-from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.units import inch
-from io import BytesIO
-import os
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated]) 
 def submit_nda(request):
@@ -256,6 +292,7 @@ def submit_nda(request):
     serializer = NDAAgreementSerializer(data=data)
     if serializer.is_valid():
         nda = serializer.save()
+        enqueue_nda_render(nda)
         return Response({
             'message': 'NDA successfully submitted',
             'nda_id': nda.id
@@ -288,21 +325,14 @@ def check_nda_status(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-from django.http import HttpResponse
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
-from rest_framework import status
-from io import BytesIO
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.units import inch
-import urllib.request
-
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def download_nda(request):
+    """
+    Stream the user's signed NDA PDF, rendered in the background when the
+    NDA was submitted. The content hash is the ETag, so a cached copy is
+    revalidated without touching storage.
+    """
     try:
         user_profile = request.user.profile
         if user_profile.role != 'Investor':
@@ -312,124 +342,23 @@ def download_nda(request):
         if not nda:
             return Response({'error': 'No NDA found for this user'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Generate PDF
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="NDA_{nda.full_name}_{nda.date_signed}.pdf"'
-
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-
-        # Define styles
-        base_styles = getSampleStyleSheet()
-        normal_style = ParagraphStyle(
-            name='CustomNormal',
-            parent=base_styles['Normal'],
-            fontSize=12,
-            leading=15
-        )
-        title_style = ParagraphStyle(
-            name='CustomTitle',
-            parent=base_styles['Title'],
-            fontSize=20,
-            leading=24,
-            alignment=1 
+        if not nda.pdf:
+            # Background render hasn't run yet
+            store_nda_pdf(nda)
+        elif not nda_is_current(nda):
+            # Serve the stored copy while the new template renders
+            enqueue_nda_render(nda)
+
+        return stream_storage_object(
+            request,
+            nda.pdf.storage,
+            nda.pdf.name,
+            'application/pdf',
+            filename=f"NDA_{nda.full_name}_{nda.date_signed}.pdf",
+            etag=f'"{nda.pdf_sha256}"',
+            disposition='attachment',
         )
 
-        story = []
-
-        # Title
-        story.append(Paragraph("NON-DISCLOSURE AGREEMENT", title_style))
-        story.append(Spacer(1, 12))
-
-        nda_content = f"""
-            <b>1. Purpose</b><br/>
-            The purpose of this Agreement is to prevent unauthorized use, disclosure, or reproduction of confidential information and intellectual property belonging to project owners (Farmers or Agricultural Entrepreneurs) listed on the Platform.<br/><br/>
-
-            <b>2. Definitions</b><br/>
-            <b>2.1 Confidential Information</b><br/>
-            Includes all business proposals, documentation, business plans, financial projections, technological concepts, sustainable methods, or any materials uploaded by project owners, whether marked as confidential or not.<br/><br/>
-            <b>2.2 Intellectual Property (IP)</b><br/>
-            Includes all trademarks, copyrights, trade secrets, processes, techniques, ideas, inventions, and other proprietary content disclosed through proposal documents or listed projects.<br/><br/>
-
-            <b>3. Obligations of Recipient</b><br/>
-            3.1 Recipient agrees not to copy, reproduce, disclose, reverse-engineer, exploit, or use any part of the Confidential Information or IP for personal or commercial gain without express written consent of the rightful owner.<br/>
-            3.2 Recipient shall not implement, replicate, or attempt to profit from any idea, concept, or structure disclosed through the Platform's proposals.<br/>
-            3.3 Recipient agrees not to share, distribute, or disclose any content to third parties, including colleagues, partners, or competing platforms.<br/>
-            3.4 Recipient agrees to use all reasonable means to protect and maintain the confidentiality and integrity of such information.<br/><br/>
-
-            <b>4. Access Limitations</b><br/>
-            4.1 Only investors who have signed this NDA via digital e-signature may view watermarked PDF proposals on a read-only basis through the Platform.<br/>
-            4.2 Farmers are restricted from accessing or viewing other users' proposals or project documents.<br/><br/>
-
-            <b>5. Ownership & IPR</b><br/>
-            5.1 All Confidential Information and associated Intellectual Property remains the sole property of the original project owner.<br/>
-            5.2 This Agreement does not transfer any ownership rights to the Recipient, nor does it grant any license or rights beyond those expressly stated.<br/><br/>
-
-            <b>6. Watermarking & Content Protection</b><br/>
-            6.1 All uploaded proposals are automatically embedded with "Agriconnect" watermarks using PyPDF2 and displayed in a secure PDF format.<br/>
-            6.2 This protection is enforced to prevent unauthorized reproduction or sharing of materials.<br/><br/>
-
-            <b>7. Legal Enforcement</b><br/>
-            7.1 Any breach of this Agreement, including misuse, unauthorized implementation, or disclosure of confidential material, will result in immediate legal action.<br/>
-            7.2 The Platform reserves the right to suspend, terminate, or permanently ban users in breach of this Agreement and seek damages, injunctive relief, and/or prosecution.<br/><br/>
-
-            <b>8. E-Signature & Acceptance</b><br/>
-            By signing electronically, the Recipient acknowledges that:<br/>
-            • They have read and understood this Agreement<br/>
-            • They agree to be legally bound by its terms<br/>
-            • They accept that a violation may result in legal liability.<br/><br/>
-
-            <b>9. Governing Law</b><br/>
-            This Agreement shall be governed by and construed in accordance with the laws of the Republic of Ghana, according to the Copyright Act, 2005 (Act 690), the Patents Act, 2003 (Act 657), the Trademarks Act, 2004 (Act 664), the Industrial Designs Act, 2003 (Act 660), and the Protection Against Unfair Competition Act, 2000 (Act 589), without applying any rules that might direct the use of another jurisdiction's laws.<br/><br/>
-        """
-
-        content = f"""
-        This Non-Disclosure Agreement is entered into on {nda.date_signed} by and between 
-        <b>Agriconnect</b>, an agricultural non-governmental platform, and the undersigned 
-        individual <b>{nda.full_name}</b>.
-        
-        {nda_content}
-        
-        <br/><br/>
-        
-        <b>Signatory Information:</b><br/>
-        Full Name: {nda.full_name}<br/>
-        Email: {nda.email}<br/>
-        Company: {nda.company or 'N/A'}<br/>
-        Date Signed: {nda.date_signed}<br/>
-        IP Address: {nda.ip_address}<br/>
-        Submitted At: {nda.submitted_at.strftime('%Y-%m-%d %H:%M:%S')}<br/>
-        
-        <br/><br/>
-        
-        <b>Electronic Signature:</b><br/>
-        This document has been electronically signed by {nda.full_name} on {nda.date_signed}.
-        """
-
-        story.append(Paragraph(content, normal_style))
-
-        # Add the signature if available from S3 URL
-        if nda.signature and nda.signature.url:
-            try:
-                story.append(Spacer(1, 12))
-                story.append(Paragraph("<b>Digital Signature:</b>", normal_style))
-
-                # Load the image from the S3 URL
-                with urllib.request.urlopen(nda.signature.url) as url_response:
-                    img_data = url_response.read()
-                    img_stream = BytesIO(img_data)
-                    signature_img = Image(img_stream, width=3*inch, height=1*inch)
-                    story.append(signature_img)
-            except Exception as e:
-                story.append(Paragraph(f"Signature image not available: {str(e)}", normal_style))
-
-        doc.build(story)
-        pdf = buffer.getvalue()
-        buffer.close()
-        response.write(pdf)
-
-        return response
-
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -0,0 +1,147 @@
+import math
+import os
+from functools import lru_cache
+from io import BytesIO
+import logging
+
+from django.conf import settings
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.lib.colors import gray
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import ContentStream, DictionaryObject, NameObject
+
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_TEXT = "Agriconnect"
+WATERMARK_FONT = "DynaPuff"
+
+# Font size as a fraction of the page diagonal (80pt on US letter)
+WATERMARK_SCALE = 0.08
+
+# Page sizes most proposals use; stamps for these are built up front
+COMMON_PAGE_SIZES = [letter, A4]
+
+
+@lru_cache(maxsize=1)
+def register_watermark_font():
+    """Register the DynaPuff font with reportlab (once per process)"""
+    font_path = os.path.join(settings.BASE_DIR, "apis", "fonts", "DynaPuff.ttf")
+    if not os.path.exists(font_path):
+        raise FileNotFoundError(f"Font not found at {font_path}")
+
+    pdfmetrics.registerFont(TTFont(WATERMARK_FONT, font_path))
+    return WATERMARK_FONT
+
+
+@lru_cache(maxsize=64)
+def get_watermark_stamp(text, width, height, rotation=0, left=0, bottom=0):
+    """
+    Return a ready-to-merge ``text`` stamp page for a page whose mediabox
+    starts at (``left``, ``bottom``) and measures ``width`` x ``height``
+    points, with the given ``/Rotate`` value. The text is scaled to the
+    page diagonal. Stamps are cached per process, keyed on the text too,
+    so the font is parsed and the canvas rendered only once per stamp.
+    """
+    register_watermark_font()
+
+    font_size = WATERMARK_SCALE * math.hypot(width, height)
+
+    watermark_stream = BytesIO()
+    c = canvas.Canvas(watermark_stream, pagesize=(left + width, bottom + height))
+    c.setFont(WATERMARK_FONT, font_size)
+    c.setFillColor(gray)
+    c.setFillAlpha(0.4)
+    c.translate(left + width / 2, bottom + height / 2)
+    # Viewers turn the page clockwise by /Rotate, so counter it here to
+    # keep the stamp at 45 degrees on screen
+    c.rotate(45 + rotation)
+    c.drawCentredString(0, 0, text)
+    c.save()
+
+    watermark_stream.seek(0)
+    reader = PdfReader(watermark_stream)
+    stamp = reader.pages[0]
+
+    # Also resolves the lazily-loaded objects, so the cached page is only
+    # ever read from when merged
+    _prefix_stamp_resources(stamp, reader)
+
+    return stamp
+
+
+def _prefix_stamp_resources(stamp, reader):
+    """
+    Rename the stamp's resources (/F1 -> /WmF1, ...) in its resource
+    dictionary and content stream. reportlab names them like most PDFs
+    do, and PyPDF2 renames a clashing resource with a random suffix on
+    every merge, so without this the output would differ between runs.
+    """
+    resources = stamp[NameObject("/Resources")].get_object()
+    renames = {}
+    for category, entries in list(resources.items()):
+        entries = entries.get_object()
+        if not isinstance(entries, DictionaryObject):
+            continue
+        prefixed = DictionaryObject()
+        for key in entries:
+            renames[key] = NameObject(f"/Wm{key[1:]}")
+            prefixed[renames[key]] = entries.raw_get(key)
+        resources[NameObject(category)] = prefixed
+    stamp[NameObject("/Resources")] = resources
+
+    content = ContentStream(stamp.get_contents(), reader)
+    for operands, _ in content.operations:
+        for i, operand in enumerate(operands):
+            if isinstance(operand, NameObject) and operand in renames:
+                operands[i] = renames[operand]
+    stamp[NameObject("/Contents")] = content
+
+
+def stamp_for_page(page):
+    """Look up the cached stamp matching ``page``'s mediabox and rotation"""
+    mediabox = page.mediabox
+    return get_watermark_stamp(
+        WATERMARK_TEXT,
+        round(float(mediabox.width)),
+        round(float(mediabox.height)),
+        int(page.get("/Rotate") or 0) % 360,
+        round(float(mediabox.left)),
+        round(float(mediabox.bottom)),
+    )
+
+
+def warm_watermark_cache():
+    """Register the font and prebuild stamps for the common page sizes"""
+    for width, height in COMMON_PAGE_SIZES:
+        for rotation in (0, 90):
+            get_watermark_stamp(WATERMARK_TEXT, round(width), round(height), rotation, 0, 0)
+
+
+def watermark_pdf(source, destination):
+    """
+    Stamp every page of the PDF in ``source`` and write the result to
+    ``destination`` (both binary file-like objects). Objects are read
+    from ``source`` on demand and the output is written straight to
+    ``destination``, so no whole-document byte buffers are built.
+    Returns the number of pages written.
+    """
+    source.seek(0)
+    reader = PdfReader(source)
+    writer = PdfWriter()
+
+    page_count = 0
+    for i, page in enumerate(reader.pages):
+        try:
+            page.merge_page(stamp_for_page(page))
+        except Exception as e:
+            logger.warning(f"Failed to watermark page {i}: {e}")
+        writer.add_page(page)
+        page_count += 1
+
+    writer.write(destination)
+    destination.flush()
+    return page_count
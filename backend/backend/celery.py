@@ -0,0 +1,15 @@
+"""
+Celery application for the backend project.
+
+Workers are started with ``celery -A backend worker`` and the periodic
+schedule with ``celery -A backend beat``.
+"""
+
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+app = Celery('backend')
+app.config_from_object('django.conf:settings', namespace='CELERY')
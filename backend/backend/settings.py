@@ -16,6 +16,8 @@ from datetime import timedelta
 import os
 from urllib.parse import urlparse
 from celery.schedules import crontab
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 
 load_dotenv()
 
@@ -48,6 +50,9 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=240),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    # Tokens carry role/KYC claims for apis.authentication.ClaimsJWTAuthentication
+    "TOKEN_OBTAIN_SERIALIZER": "apis.serializers.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "apis.serializers.ClaimsTokenRefreshSerializer",
 }
 
 
@@ -61,6 +66,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'apis',
@@ -99,13 +105,90 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER') == 'True'
+CELERY_IMPORTS = (
+    'apis.mailer',
+    'apis.nda',
+    'apis.notifications',
+    'apis.opportunities',
+    'apis.otp',
+    'apis.proposals',
+    'apis.uploads',
+)
+
+# Admin notification digests (see apis/notifications.py); 0 mails every event on its own
+ADMIN_DIGEST_INTERVAL = int(os.environ.get('ADMIN_DIGEST_INTERVAL', 15))  # minutes
+ADMIN_NOTIFICATION_RETENTION_DAYS = 30  # days digested events stay on the polling endpoint
+
 CELERY_BEAT_SCHEDULE = {
     'cleanup-expired-opportunities': {
-        'task': 'backend.opportunities.cleanup_expired_opportunities',
-        'schedule': crontab(hour=1, minute=0),  
+        'task': 'apis.opportunities.cleanup_expired_opportunities',
+        'schedule': crontab(hour=1, minute=0),
+    },
+    'requeue-stalled-watermarks': {
+        'task': 'apis.proposals.requeue_stalled_watermarks',
+        'schedule': crontab(minute='*/15'),
+    },
+    'abort-stale-direct-uploads': {
+        'task': 'apis.uploads.abort_stale_uploads',
+        'schedule': crontab(minute=30),
+    },
+    'flush-opportunity-views': {
+        'task': 'apis.opportunities.flush_opportunity_views',
+        'schedule': crontab(minute='*'),
+    },
+    'purge-expired-otps': {
+        'task': 'apis.otp.purge_expired_otps',
+        'schedule': crontab(minute=15),
     },
+    'send-queued-emails': {
+        'task': 'apis.mailer.send_queued_emails',
+        'schedule': crontab(minute='*'),
+    },
+}
+if ADMIN_DIGEST_INTERVAL:
+    CELERY_BEAT_SCHEDULE['send-admin-digest'] = {
+        'task': 'apis.notifications.send_admin_digest',
+        'schedule': timedelta(minutes=ADMIN_DIGEST_INTERVAL),
+    }
+
+# Shared cache (also the buffer for opportunity view counts). The backend is
+# pluggable through CACHE_BACKEND; tests that need it override it with local memory.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.environ.get('CACHE_URL', 'redis://localhost:6379/1'),
+    }
 }
 
+# Login OTPs (see apis/otp.py); OTP_BACKEND is 'database' or 'cache'
+OTP_BACKEND = os.environ.get('OTP_BACKEND', 'database')
+OTP_TTL = 5 * 60  # seconds a code stays valid
+OTP_MAX_ATTEMPTS = 5  # wrong guesses before the code is discarded
+
+# Per-user role/KYC authorization context (see apis/authz.py); 0 disables caching
+AUTH_CONTEXT_CACHE_TIMEOUT = 30
+
+# Public opportunity list/detail response cache (see apis/response_cache.py)
+RESPONSE_CACHE_TTL = 60  # seconds a cached response is served as fresh
+RESPONSE_CACHE_STALE_TTL = 5 * 60  # further seconds it may be served while rebuilding
+
+# Opportunity view counting (see apis/opportunities.py)
+OPPORTUNITY_VIEW_DEDUP_WINDOW = 30 * 60  # seconds before the same client counts again
+OPPORTUNITY_STATS_CACHE_TIMEOUT = 5 * 60  # seconds; writes invalidate the snapshot sooner
+
+# Proposal watermarking (see apis/proposals.py)
+WATERMARK_MAX_RETRIES = 3
+WATERMARK_RETRY_BACKOFF = 30  # seconds, doubled on every retry
+WATERMARK_STALL_TIMEOUT = timedelta(minutes=30)
+WATERMARK_SPOOL_MAX_MEMORY = 5 * 1024 * 1024  # bytes kept in RAM before spilling to disk
+
+# Signed NDA PDFs (see apis/nda.py)
+NDA_RENDER_MAX_RETRIES = 3
+NDA_RENDER_RETRY_BACKOFF = 30  # seconds, doubled on every retry
+NDA_PDF_CLEANUP_DELAY = 60 * 60  # seconds a replaced PDF is kept for downloads still streaming it
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -191,6 +274,14 @@ EMAIL_PORT = 465
 EMAIL_USE_SSL=True
 EMAIL_HOST_USER=os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD=os.getenv('EMAIL_HOST_PASSWORD')
+# SMTP by default; set EMAIL_BACKEND to the console or file backend in development
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', os.path.join(BASE_DIR, 'sent_emails'))
+
+# Outbound email queue (see apis/mailer.py)
+EMAIL_QUEUE_MAX_ATTEMPTS = 5  # failed sends before a message is dead-lettered
+EMAIL_QUEUE_RETRY_BACKOFF = 60  # seconds, doubled on every retry
+EMAIL_QUEUE_RETENTION_DAYS = 7  # days sent messages are kept
 
 
 
@@ -209,8 +300,10 @@ STATICFILES_DIRS = [
 TIME_ZONE='Africa/Johannesburg'
 
 FILE_UPLOAD_PERMISSIONS = 0o644
-FILE_UPLOAD_MAX_MEMORY_SIZE = 26214400  
-DATA_UPLOAD_MAX_MEMORY_SIZE = 26214400  
+# Large files go straight to storage through uploads/initiate/, so keep
+# whatever still comes through Django small in memory (spills to disk)
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440
 
 JAZZMIN_SETTINGS = {
     "site_title": "Agriconnect Admin",
@@ -223,6 +316,7 @@ JAZZMIN_SETTINGS = {
     "copyright": "Agriconnect",
     "custom_css": "custom_admin.css", 
     "icons": {
+        "apis.directupload": "fas fa-cloud-upload-alt",
         "apis.farmerkyc": "fa-solid fa-tractor",
         "apis.investorkyc": "fas fa-briefcase",
         "apis.kycverificationlog": "fas fa-check-circle",
@@ -254,6 +348,35 @@ AWS_STORAGE_BUCKET_NAME = 'agriconnect-storage'
 AWS_S3_ENDPOINT_URL = 'https://sgp1.digitaloceanspaces.com'
 AWS_S3_OBJECT_PARAMETERS = {'CacheControl': 'max-age=86400'}
 AWS_LOCATION = 'media' 
+# Spool downloaded files to disk past 5 MB and upload large files in
+# 8 MB multipart chunks instead of holding them in memory
+AWS_S3_MAX_MEMORY_SIZE = 5 * 1024 * 1024
+AWS_S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+)
+# Timeouts, retries and connection pool for every storage client
+AWS_S3_CLIENT_CONFIG = Config(
+    connect_timeout=5,
+    read_timeout=30,
+    retries={'max_attempts': 4, 'mode': 'standard'},
+    max_pool_connections=20,
+)
+STORAGE_STREAM_CHUNK_SIZE = 64 * 1024  # bytes per chunk when streaming files through Django
+
+# Storage fetch pool (see apis/storage_fetch.py)
+STORAGE_FETCH_WORKERS = 8  # concurrent reads for multi-object fetches
+STORAGE_FETCH_CACHE_MAX_BLOB = 256 * 1024  # bytes; larger objects are never cached
+STORAGE_FETCH_CACHE_MAX_BYTES = 16 * 1024 * 1024  # total size of the in-process LRU
+
+# Presigned download URLs (see apis/signed_urls.py)
+SIGNED_URL_EXPIRY = 300  # seconds
+SIGNED_URL_REFRESH_MARGIN = 60  # stop reusing a cached URL this many seconds before it expires
+
+# Direct-to-storage multipart uploads (see apis/uploads.py)
+DIRECT_UPLOAD_URL_EXPIRY = 3600  # seconds each presigned part URL stays valid
+DIRECT_UPLOAD_ATTACH_WINDOW = 24 * 3600  # seconds a completed upload may wait to be attached before it is deleted
 DEFAULT_FILE_STORAGE = 'backend.storage_backends.MediaStorage'
 MEDIA_URL = f'https://{AWS_STORAGE_BUCKET_NAME}.sgp1.digitaloceanspaces.com/media/'
 
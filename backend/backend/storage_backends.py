@@ -1,6 +1,21 @@
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
 from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name, safe_join
+
+
+def object_key(storage, name):
+    """The bucket key an S3 storage keeps ``name`` under, location prefix included"""
+    try:
+        return safe_join(storage.location, clean_name(name))
+    except ValueError:
+        raise SuspiciousOperation(f"Attempted access to '{name}' denied.")
+
 
 class MediaStorage(S3Boto3Storage):
     location = 'media'
     file_overwrite = False
-    default_acl = 'public-read'
\ No newline at end of file
+    default_acl = 'private'
+    querystring_auth = True
+    # Every presigned URL is short-lived, not just the ones from apis/signed_urls.py
+    querystring_expire = settings.SIGNED_URL_EXPIRY
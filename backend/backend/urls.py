@@ -20,8 +20,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 urlpatterns = [
+    # The API's own admin/... endpoints must resolve before the admin
+    # site, whose catch-all view would otherwise redirect them to login
+    path('', include('apis.urls')),
     path('admin/', admin.site.urls),
-    path('', include('apis.urls'))
 ]
 
 if settings.DEBUG:
@@ -29,9 +29,12 @@ type Props = {
   projects: Project[],
   error: string | null,
   onProjectClick?: (project: Project) => void; 
+  hasMore?: boolean,
+  loadingMore?: boolean,
+  onLoadMore?: () => void;
 }
 
-export default function AllProjects({loading, forbidden, projects, error, onProjectClick}: Props) {
+export default function AllProjects({loading, forbidden, projects, error, onProjectClick, hasMore, loadingMore, onLoadMore}: Props) {
   const navigate = useNavigate();
 
   const handleProjectClick = (project: Project) => {
@@ -97,6 +100,18 @@ export default function AllProjects({loading, forbidden, projects, error, onProj
             ))}
           </div>
           
+          {hasMore && onLoadMore && (
+            <div className="mt-8 text-center">
+              <button
+                onClick={onLoadMore}
+                disabled={loadingMore}
+                className="px-6 py-2 rounded-lg bg-limeTxt text-bgColor font-semibold disabled:opacity-60"
+              >
+                {loadingMore ? "Loading..." : "Load more projects"}
+              </button>
+            </div>
+          )}
+
           <div className="mt-8 text-center">
             <p className="text-white/60 text-sm">
               Showing {projects.length} project{projects.length !== 1 ? 's' : ''}
@@ -47,6 +47,8 @@ export default function InvestorDashboard(){
   const [loadings, setLoadings] = useState(true);
   const [errors, setErrors] = useState<string | null>(null);
   const [forbidden, setForbidden] = useState(false);
+  const [nextUrl, setNextUrl] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
 
   useEffect(() => {
@@ -77,7 +79,8 @@ export default function InvestorDashboard(){
 
         if (!res.ok) throw new Error(data.message || "Failed to fetch projects");
 
-        setProjects(data);
+        setProjects(data.results || []);
+        setNextUrl(data.next || null);
       } catch (err: any) {
         if (!forbidden) {
           setErrors(err.message || "An error occurred");
@@ -90,6 +93,29 @@ export default function InvestorDashboard(){
     fetchProjects();
   }, []);
 
+  const loadMoreProjects = async () => {
+    if (!nextUrl) return;
+    setLoadingMore(true);
+
+    try {
+      const res = await fetch(nextUrl, {
+        headers: {
+          Authorization: `Bearer ${localStorage.getItem("ACCESS_TOKEN") || ""}`
+        }
+      });
+
+      const data = await res.json();
+      if (!res.ok) throw new Error(data.message || "Failed to fetch projects");
+
+      setProjects((prev) => [...prev, ...(data.results || [])]);
+      setNextUrl(data.next || null);
+    } catch (err: any) {
+      setErrors(err.message || "An error occurred");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     const handleResize = () => {
       if (window.innerWidth >= 1024) {
@@ -116,7 +142,7 @@ export default function InvestorDashboard(){
   const mainContent: MainContentMap = {
     Dashboard: <InvestorHome />,
     NDA: <NDA />,
-    'All Projects': <AllProjects loading={loadings} error={errors} projects={projects} forbidden={forbidden}/>,
+    'All Projects': <AllProjects loading={loadings} error={errors} projects={projects} forbidden={forbidden} hasMore={!!nextUrl} loadingMore={loadingMore} onLoadMore={loadMoreProjects}/>,
     'Your Profile': <UserProfile />
   }
 
@@ -4,7 +4,7 @@ import { API_URL } from '../Utils/constants';
 import FarmerProjectsAccordion from './FarmerProjectAccordion';
 import TotalAmount from './TotalAmount';
 import { useEffect, useState } from 'react';
-import type { Project } from './FarmerProjectAccordion';
+import type { Project, ProjectCounts } from './FarmerProjectAccordion';
 import { User } from 'lucide-react';
 
 export default function FarmerHome() {
@@ -12,25 +12,47 @@ export default function FarmerHome() {
   const [projects, setProjects] = useState<Project[]>([]);
   const [projectLoading, setLoading] = useState(true);
   const [projectError, setError] = useState<string | null>(null);
+  const [counts, setCounts] = useState<ProjectCounts | null>(null);
+  const [nextUrl, setNextUrl] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   const API_ENDPOINTS = {
     allProjects: `${API_URL}/projects/`,
     farmerProjects: `${API_URL}/farmer/projects/`,
+    farmerProjectCounts: `${API_URL}/farmer/projects/counts/`,
   };
 
   useEffect(() => {
     fetchProjects();
   }, []);
 
+  const authHeaders = () => {
+    const token = localStorage.getItem('ACCESS_TOKEN');
+    return {
+      'Content-Type': 'application/json',
+      ...(token && { 'Authorization': `Bearer ${token}` })
+    };
+  };
+
+  // Per-status totals come from one aggregate request instead of loading every page
+  const fetchCounts = async () => {
+    try {
+      const response = await fetch(API_ENDPOINTS.farmerProjectCounts, { headers: authHeaders() });
+      if (response.ok) {
+        const data = await response.json();
+        setCounts(data.data);
+      }
+    } catch {
+      setCounts(null);
+    }
+  };
+
   const fetchProjects = async () => {
     try {
       setLoading(true);
       setError(null);
-      const token = localStorage.getItem('ACCESS_TOKEN');
-      const headers = {
-        'Content-Type': 'application/json',
-        ...(token && { 'Authorization': `Bearer ${token}` })
-      };
+      const headers = authHeaders();
+      fetchCounts();
 
       let response = await fetch(API_ENDPOINTS.farmerProjects, { headers });
       if (!response.ok) {
@@ -51,6 +73,7 @@ export default function FarmerHome() {
       const data = await response.json();
       const projectsData = Array.isArray(data) ? data : (data.data || data.results || []);
       setProjects(projectsData);
+      setNextUrl(data.next || null);
     } catch (err: any) {
       if (err.message.includes('403') || err.message.includes('401') || 
         err.message.includes('verification') || err.message.includes('not verified')) {
@@ -64,8 +87,27 @@ export default function FarmerHome() {
     }
   };
 
-  function filterProjectsByStatus(status: string){
-    return projects.filter(p => p.status?.toLowerCase() === status.toLowerCase());
+  const loadMoreProjects = async () => {
+    if (!nextUrl) return;
+    setLoadingMore(true);
+
+    try {
+      const response = await fetch(nextUrl, { headers: authHeaders() });
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+      const data = await response.json();
+      setProjects((prev) => [...prev, ...(data.results || [])]);
+      setNextUrl(data.next || null);
+    } catch (err: any) {
+      setError(err.message || 'Failed to fetch projects');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  function countByStatus(status: string){
+    return counts?.[status] ?? projects.filter(p => p.status?.toLowerCase() === status.toLowerCase()).length;
   }
 
   if (loading) {
@@ -106,28 +148,28 @@ export default function FarmerHome() {
   const sections = [
     {
       title: 'Approved',
-      count: filterProjectsByStatus('approved').length,
+      count: countByStatus('approved'),
       status: 'approved',
       bgColor: 'text-limeTxt/80',
       textColor: 'text-blue-400',
     },
     {
       title: 'Pending',
-      count: filterProjectsByStatus('pending').length,
+      count: countByStatus('pending'),
       status: 'pending',
       bgColor: 'text-limeTxt/80',
       textColor: 'text-yellow-400',
     },
     {
       title: 'Rejected',
-      count: filterProjectsByStatus('rejected').length,
+      count: countByStatus('rejected'),
       status: 'rejected',
       bgColor: 'text-limeTxt/80',
       textColor: 'text-red-400',
     },
     {
       title: 'Active',
-      count: filterProjectsByStatus('approved').length,
+      count: countByStatus('approved'),
       status: 'approved',
       bgColor: 'text-limeTxt/80',
       textColor: 'text-blue-400',
@@ -188,7 +230,7 @@ export default function FarmerHome() {
                 <h3 className="text-base sm:text-lg font-medium text-limeTxt mb-1 sm:mb-2">
                   Total Projects
                 </h3>
-                <p className="text-xl sm:text-2xl font-bold text-white">{projects.length} project</p>
+                <p className="text-xl sm:text-2xl font-bold text-white">{counts?.total ?? projects.length} project</p>
               </div>
               
               <div className="grid grid-cols-2 gap-3 sm:gap-4">
@@ -215,7 +257,11 @@ export default function FarmerHome() {
               projectError={projectError} 
               projectLoading={projectLoading} 
               projects={projects}
+              counts={counts}
               fetchProjects={fetchProjects}
+              hasMore={!!nextUrl}
+              loadingMore={loadingMore}
+              onLoadMore={loadMoreProjects}
             />
           </div>
           <div className="bg-white/10 backdrop-blur-sm rounded-2xl p-4 sm:p-6 border border-white/20">
@@ -23,14 +23,23 @@ export interface Project {
   watermarked_proposal: string;
 }
 
+export interface ProjectCounts {
+  total: number;
+  [status: string]: number;
+}
+
 interface Props{
   projects: Project[]
+  counts?: ProjectCounts | null,
   projectLoading: boolean,
   projectError: string | null,
-  fetchProjects: ()=>void
+  fetchProjects: ()=>void,
+  hasMore?: boolean,
+  loadingMore?: boolean,
+  onLoadMore?: () => void
 }
 
-export default function FarmerProjectsAccordion({ projects, projectLoading, projectError, fetchProjects} : Props) {
+export default function FarmerProjectsAccordion({ projects, counts, projectLoading, projectError, fetchProjects, hasMore, loadingMore, onLoadMore} : Props) {
 
   const [selectedIndex, setSelectedIndex] = useState<number | null>(null);
   const navigate = useNavigate()
@@ -58,10 +67,14 @@ export default function FarmerProjectsAccordion({ projects, projectLoading, proj
     return projects.filter(p => p.status?.toLowerCase() === status.toLowerCase());
   }
 
+  function countByStatus(status: string){
+    return counts?.[status] ?? filterProjectsByStatus(status).length;
+  }
+
   const sections = [
     {
       title: 'Total Projects',
-      count: projects.length,
+      count: counts?.total ?? projects.length,
       icon: <FileText className="w-5 h-5 text-blue-600" />,
       status: 'total',
       projects,
@@ -71,7 +84,7 @@ export default function FarmerProjectsAccordion({ projects, projectLoading, proj
     },
     {
       title: 'Approved Projects',
-      count: filterProjectsByStatus('approved').length,
+      count: countByStatus('approved'),
       icon: <CheckCircle className="w-5 h-5 text-green-600" />,
       status: 'approved',
       projects: filterProjectsByStatus('approved'),
@@ -80,7 +93,7 @@ export default function FarmerProjectsAccordion({ projects, projectLoading, proj
     },
     {
       title: 'Pending Projects',
-      count: filterProjectsByStatus('pending').length,
+      count: countByStatus('pending'),
       icon: <Clock className="w-5 h-5 text-yellow-600" />,
       status: 'pending',
       projects: filterProjectsByStatus('pending'),
@@ -89,7 +102,7 @@ export default function FarmerProjectsAccordion({ projects, projectLoading, proj
     },
     {
       title: 'Rejected Projects',
-      count: filterProjectsByStatus('rejected').length,
+      count: countByStatus('rejected'),
       icon: <XCircle className="w-5 h-5 text-red-600" />,
       status: 'rejected',
       projects: filterProjectsByStatus('rejected'),
@@ -180,6 +193,17 @@ export default function FarmerProjectsAccordion({ projects, projectLoading, proj
                       </div>
                     ))
                   )}
+                  {hasMore && onLoadMore && (
+                    <div className="pt-2 text-center">
+                      <button
+                        onClick={onLoadMore}
+                        disabled={loadingMore}
+                        className="px-4 py-2 bg-bgColor text-limeTxt rounded-lg text-sm disabled:opacity-60"
+                      >
+                        {loadingMore ? 'Loading...' : 'Load more projects'}
+                      </button>
+                    </div>
+                  )}
                 </div>
               )}
             </div>